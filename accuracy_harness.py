@@ -0,0 +1,383 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from benchmark_detection import build_bots
+from correlation_engine import FFTMatcher
+from detectors import TemplateDetector
+from template_sets import SharedGray, TemplateSet
+
+GOLDEN_LABELS = "golden_labels.json"
+BALOOT_STATES = ["PLAY_BALOOT", "GREEN_PARTICIPATE", "RETURN_GREEN", "RETURN_GREY", "LEAVE_GAME"]
+GIFT_BUTTONS = ["CLAIM", "AGREE", "BACK"]
+# Fraction of the frame width the baloot bot ignores on the right (see hybrid_button_detection)
+BALOOT_WORKING_WIDTH = 0.75
+DEFAULT_TOLERANCE = 0.02
+BOX_MARGIN = 10
+PATH_TOLERANCE = 40
+# The floating gift popup draws its buttons 1.1-1.2x larger than the chat popup the templates were cut from
+POPUP_VARIANT_FACTORS = (1.1, 1.2)
+
+
+def with_variants(states, factors):
+    """
+    Config value for a bot's `detectors`: each state's template set gains its
+    default resized by every factor, so the multi-variant coarse -> refine
+    path runs on the labelled frames (templates/manifest.json ships none yet).
+    """
+    def build(bot):
+        detectors = dict(bot.detectors)
+        for state in states:
+            detector = detectors.get(state)
+            if detector is None:
+                continue
+            name, gray = detector.template_set.variants[0]
+            variants = [(name, gray)] + [
+                (f"{name}@{factor}", cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_LINEAR))
+                for factor in factors]
+            detectors[state] = TemplateDetector(state, TemplateSet(state, variants), detector.prefilter,
+                                                detector.settings)
+        return detectors
+    return build
+
+
+# Detector configurations: {name: {bot: {attribute: value}}}, applied on top of the defaults;
+# a callable value is called with the bot to build the attribute
+CONFIGS = {
+    "baseline": {},
+    "single_scale": {
+        "baloot": {"template_scales": [1.0]},
+        "gift": {"giftbox_scales": [1.0]},
+    },
+    "three_scales": {
+        "baloot": {"template_scales": [1.0, 0.95, 1.05]},
+        "gift": {"giftbox_scales": [0.9, 1.0, 1.1]},
+    },
+    "multi_scale_buttons": {
+        "gift": {"button_scales": [0.9, 1.0, 1.1, 1.2]},
+    },
+    "fft_backend": {
+        "baloot": {"shared_gray": SharedGray(matcher=FFTMatcher())},
+        "gift": {"shared_gray": SharedGray(matcher=FFTMatcher())},
+    },
+    "multi_variant": {
+        "baloot": {"detectors": with_variants(BALOOT_STATES, POPUP_VARIANT_FACTORS)},
+        "gift": {"detectors": with_variants(GIFT_BUTTONS, POPUP_VARIANT_FACTORS)},
+    },
+}
+# States each configuration must find through an added (non-default) variant at least once
+VARIANT_CHECKS = {"multi_variant": ["CLAIM"]}
+
+
+def load_labels(path):
+    """Return [(frame_path, label)] with frame paths resolved next to the labels file"""
+    with open(path) as f:
+        data = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for label in data["frames"]:
+        frame = label["frame"]
+        entries.append((frame if os.path.isabs(frame) else os.path.join(base, frame), label))
+    return entries
+
+
+def inside_box(point, box, margin=BOX_MARGIN):
+    x, y, w, h = box
+    return x - margin <= point[0] <= x + w + margin and y - margin <= point[1] <= y + h + margin
+
+
+def path_matches(predicted, expected, tolerance=PATH_TOLERANCE):
+    """Both path endpoints within tolerance, in either direction"""
+    if predicted is None or len(predicted) < 2:
+        return False, None
+    start, end = np.asarray(predicted[0], float), np.asarray(predicted[-1], float)
+    exp_start, exp_end = np.asarray(expected[0], float), np.asarray(expected[-1], float)
+    error = min(
+        max(np.linalg.norm(start - exp_start), np.linalg.norm(end - exp_end)),
+        max(np.linalg.norm(start - exp_end), np.linalg.norm(end - exp_start)),
+    )
+    return error <= tolerance, float(error)
+
+
+@contextlib.contextmanager
+def applied_config(bots, config):
+    """Temporarily set detector attributes on the bots"""
+    saved = []
+    for bot_name, overrides in config.items():
+        bot = bots.get(bot_name)
+        if bot is None:
+            continue
+        for attr, value in overrides.items():
+            saved.append((bot, attr, getattr(bot, attr)))
+            setattr(bot, attr, value(bot) if callable(value) else value)
+    try:
+        yield
+    finally:
+        for bot, attr, value in reversed(saved):
+            setattr(bot, attr, value)
+
+
+def detect_all(bots, frame):
+    """
+    Run every per-state detector on one frame.
+    Returns ({state: (x, y) or None}, predicted gift path, {detector: seconds},
+    {state: variant} for the template states found).
+    """
+    predictions = {}
+    timings = {}
+    variants = {}
+    path = None
+    baloot = bots.get("baloot")
+    gift = bots.get("gift")
+
+    if baloot:
+        working = frame[:, :int(frame.shape[1] * BALOOT_WORKING_WIDTH)]
+        for state in BALOOT_STATES:
+            start = time.perf_counter()
+            result = baloot.detect_single_template_match(working, state)
+            timings[state] = time.perf_counter() - start
+            predictions[state] = result.location if result else None
+            if result:
+                variants[state] = result.variant
+
+    if gift:
+        for btn in GIFT_BUTTONS:
+            start = time.perf_counter()
+            result = gift.detect_button(frame, btn)
+            timings[btn] = time.perf_counter() - start
+            predictions[btn] = result.location if result else None
+            if result:
+                variants[btn] = result.variant
+        start = time.perf_counter()
+        giftbox = gift.detect_giftbox(frame)
+        timings["GIFTBOX"] = time.perf_counter() - start
+        predictions["GIFTBOX"] = giftbox.location if giftbox else None
+        if giftbox:
+            start = time.perf_counter()
+            path = gift.detect_path_in_giftbox(frame, giftbox)
+            timings["PATH"] = time.perf_counter() - start
+
+    return predictions, path, timings, variants
+
+
+def score_frame(label, predictions, path, counts):
+    """Accumulate TP/FP/FN and localisation errors per state into counts"""
+    expected = {}
+    for obj in label.get("objects", []):
+        expected.setdefault(obj["state"], []).append(obj)
+
+    for state, point in predictions.items():
+        c = counts.setdefault(state, {"tp": 0, "fp": 0, "fn": 0, "errors": []})
+        objects = expected.get(state, [])
+        if point is None:
+            c["fn"] += len(objects)
+            continue
+        hit = next((o for o in objects if inside_box(point, o["box"])), None)
+        if hit:
+            c["tp"] += 1
+            c["fn"] += len(objects) - 1
+            c["errors"].append(float(np.hypot(point[0] - hit["center"][0], point[1] - hit["center"][1])))
+        else:
+            c["fp"] += 1
+            c["fn"] += len(objects)
+
+    if label.get("path"):
+        c = counts.setdefault("PATH", {"tp": 0, "fp": 0, "fn": 0, "errors": []})
+        ok, error = path_matches(path, label["path"])
+        if ok:
+            c["tp"] += 1
+            c["errors"].append(error)
+        elif path is not None:
+            c["fp"] += 1
+            c["fn"] += 1
+        else:
+            c["fn"] += 1
+
+
+def summarise_counts(c):
+    tp, fp, fn = c["tp"], c["fp"], c["fn"]
+    return {
+        "tp": tp, "fp": fp, "fn": fn,
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        "loc_error_px": round(float(np.mean(c["errors"])), 2) if c["errors"] else None,
+    }
+
+
+def evaluate(bots, entries, config, repeat=1):
+    counts = {}
+    variant_hits = {}
+    per_detector_ms = {}
+    frame_ms = []
+    with applied_config(bots, config):
+        defaults = {state: detector.template_set.variants[0][0]
+                    for bot in bots.values() for state, detector in bot.detectors.items()}
+        for frame_path, label in entries:
+            frame = cv2.imread(frame_path)
+            if frame is None:
+                print(f"⚠️ Could not load frame: {frame_path}")
+                continue
+            for i in range(repeat):
+                predictions, path, timings, variants = detect_all(bots, frame)
+                frame_ms.append(sum(timings.values()) * 1000)
+                for name, seconds in timings.items():
+                    per_detector_ms.setdefault(name, []).append(seconds * 1000)
+                if i == 0:
+                    score_frame(label, predictions, path, counts)
+                    for state, variant in variants.items():
+                        kind = "default" if variant == defaults.get(state) else variant
+                        hits = variant_hits.setdefault(state, {})
+                        hits[kind] = hits.get(kind, 0) + 1
+
+    total = {"tp": 0, "fp": 0, "fn": 0, "errors": []}
+    for c in counts.values():
+        for key in total:
+            total[key] += c[key]
+
+    lat = np.asarray(frame_ms)
+    return {
+        "overall": summarise_counts(total),
+        "states": {state: summarise_counts(c) for state, c in sorted(counts.items())},
+        "variant_hits": variant_hits,
+        "latency": {
+            "frame_p50_ms": round(float(np.percentile(lat, 50)), 3) if lat.size else None,
+            "frame_p95_ms": round(float(np.percentile(lat, 95)), 3) if lat.size else None,
+            "frame_mean_ms": round(float(lat.mean()), 3) if lat.size else None,
+            "detectors_mean_ms": {k: round(float(np.mean(v)), 3) for k, v in sorted(per_detector_ms.items())},
+        },
+    }
+
+
+def accuracy_losses(baseline, result, tolerance):
+    """Precision/recall drops beyond tolerance, overall and per state"""
+    losses = []
+    scopes = [("overall", baseline["overall"], result["overall"])]
+    scopes += [(s, baseline["states"][s], result["states"].get(s)) for s in baseline["states"]]
+    for scope, base, cur in scopes:
+        if cur is None:
+            continue
+        for metric in ("precision", "recall"):
+            if base[metric] is not None and (cur[metric] or 0) < base[metric] - tolerance:
+                losses.append(f"{scope} {metric} {base[metric]:.3f} -> {cur[metric] or 0:.3f}")
+    return losses
+
+
+def check_configs(results, baseline_name, tolerance):
+    """Fail every configuration that is faster than the baseline but loses accuracy"""
+    baseline = results[baseline_name]
+    failures = {}
+    for name, result in results.items():
+        if name == baseline_name:
+            continue
+        if result["latency"]["frame_mean_ms"] >= baseline["latency"]["frame_mean_ms"]:
+            continue
+        losses = accuracy_losses(baseline, result, tolerance)
+        if losses:
+            failures[name] = losses
+    return failures
+
+
+def check_variants(results, checks=VARIANT_CHECKS):
+    """Fail every configuration whose listed states were never found through an added variant"""
+    failures = {}
+    for name, states in checks.items():
+        result = results.get(name)
+        if result is None:
+            continue
+        missing = [state for state in states
+                   if not any(kind != "default" for kind in result["variant_hits"].get(state, {}))]
+        if missing:
+            failures[name] = [f"{state} never found through an added variant" for state in missing]
+    return failures
+
+
+def print_results(results):
+    print(f"\n{'config':<22}{'precision':>10}{'recall':>8}{'loc px':>8}{'mean ms':>9}{'p95 ms':>9}")
+    for name, r in results.items():
+        o = r["overall"]
+        print(f"{name:<22}{o['precision'] or 0:>10.3f}{o['recall'] or 0:>8.3f}{o['loc_error_px'] or 0:>8.1f}"
+              f"{r['latency']['frame_mean_ms']:>9.1f}{r['latency']['frame_p95_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score detector configurations on accuracy and speed together")
+    parser.add_argument("--labels", default=GOLDEN_LABELS, help="Labels JSON (golden or synthetic_frames.py output)")
+    parser.add_argument("--configs", help="Extra configurations as JSON: {name: {bot: {attribute: value}}}")
+    parser.add_argument("--only", nargs="*", help="Evaluate only these configurations (baseline is always run)")
+    parser.add_argument("--baseline-config", default="baseline")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed passes per frame")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed precision/recall drop for a faster configuration")
+    parser.add_argument("--output", "-o", help="Write the JSON report here")
+    parser.add_argument("--verbose", action="store_true", help="Print per-state scores")
+    args = parser.parse_args()
+
+    configs = dict(CONFIGS)
+    if args.configs:
+        with open(args.configs) as f:
+            configs.update(json.load(f))
+    if args.baseline_config not in configs:
+        print(f"❌ Unknown baseline configuration: {args.baseline_config}")
+        sys.exit(2)
+    if args.only:
+        configs = {k: v for k, v in configs.items() if k in args.only or k == args.baseline_config}
+
+    entries = load_labels(args.labels)
+    frames = {}
+    for frame_path, _ in entries[:1]:
+        frames[frame_path] = cv2.imread(frame_path)
+    if not entries or any(img is None for img in frames.values()):
+        print("❌ No usable labelled frames")
+        sys.exit(2)
+    print(f"🎯 Scoring {len(configs)} configurations on {len(entries)} labelled frames...")
+
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            bots = build_bots(frames)
+        for name, config in configs.items():
+            with contextlib.redirect_stdout(devnull):
+                results[name] = evaluate(bots, entries, config, args.repeat)
+    for bot in bots.values():
+        bot.debug_writer.close()
+        bot.event_log.close()
+
+    print_results(results)
+    if args.verbose:
+        for name, r in results.items():
+            print(f"\n{name}:")
+            for state, s in r["states"].items():
+                print(f"   {state:<18} tp={s['tp']} fp={s['fp']} fn={s['fn']} "
+                      f"loc={s['loc_error_px']} ms={r['latency']['detectors_mean_ms'].get(state)} "
+                      f"variants={r['variant_hits'].get(state, {})}")
+
+    failures = check_configs(results, args.baseline_config, args.tolerance)
+    variant_failures = check_variants(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            # Config values may be objects (matchers, variant builders): written by repr
+            json.dump({"labels": args.labels, "configs": configs, "results": results,
+                       "failures": failures, "variant_failures": variant_failures}, f, indent=2, default=repr)
+        print(f"\n📄 Report saved to: {args.output}")
+
+    if failures:
+        print(f"\n❌ Faster configurations lost accuracy beyond {args.tolerance:.0%}:")
+        for name, losses in failures.items():
+            for loss in losses:
+                print(f"   → {name}: {loss}")
+    if variant_failures:
+        print("\n❌ The multi-variant path did not produce the expected detections:")
+        for name, losses in variant_failures.items():
+            for loss in losses:
+                print(f"   → {name}: {loss}")
+    if failures or variant_failures:
+        sys.exit(1)
+    print(f"\n✅ No faster configuration lost more than {args.tolerance:.0%} precision/recall")
+
+
+if __name__ == "__main__":
+    main()
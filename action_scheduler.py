@@ -0,0 +1,86 @@
+import time
+
+# Seconds before the same (state, location bucket) may be clicked again
+DEFAULT_ACTION_COOLDOWN = 2.0
+ACTION_COOLDOWNS = {
+    "CLAIM": 10.0,
+    "RETURN_GREEN": 5.0,
+}
+# A click stays in flight until its button disappears from an analysed frame,
+# or this many seconds pass (then it may be retried)
+IN_FLIGHT_TIMEOUT = 4.0
+# Canonical pixels per location bucket: small jitter keeps the same key
+LOCATION_BUCKET = 40
+
+
+class ActionScheduler:
+    """
+    Deduplicate clicks per (state, location bucket).
+    check() refuses a target that is still in flight (clicked, page not yet
+    re-rendered) or inside its cooldown; started() records a click; observe()
+    settles in-flight clicks whose button is no longer visible.
+    """
+
+    def __init__(self, cooldowns=None, default_cooldown=DEFAULT_ACTION_COOLDOWN,
+                 in_flight_timeout=IN_FLIGHT_TIMEOUT, bucket=LOCATION_BUCKET):
+        self.cooldowns = dict(ACTION_COOLDOWNS if cooldowns is None else cooldowns)
+        self.default_cooldown = default_cooldown
+        self.in_flight_timeout = in_flight_timeout
+        self.bucket = bucket
+        self.reset()
+
+    def reset(self):
+        self.last_action = {}
+        self.in_flight = {}
+        self.allowed = 0
+        self.dropped = {"in_flight": 0, "cooldown": 0}
+
+    def key(self, state, location):
+        if location is None:
+            return state, None, None
+        return state, int(location[0]) // self.bucket, int(location[1]) // self.bucket
+
+    def check(self, state, location):
+        """None when the click may go ahead, else (reason, seconds until it may)"""
+        key = self.key(state, location)
+        now = time.monotonic()
+
+        started = self.in_flight.get(key)
+        if started is not None:
+            remaining = started + self.in_flight_timeout - now
+            if remaining > 0:
+                self.dropped["in_flight"] += 1
+                return "in_flight", remaining
+            del self.in_flight[key]
+
+        last = self.last_action.get(key)
+        if last is not None:
+            remaining = last + self.cooldowns.get(state, self.default_cooldown) - now
+            if remaining > 0:
+                self.dropped["cooldown"] += 1
+                return "cooldown", remaining
+
+        self.allowed += 1
+        return None
+
+    def started(self, state, location):
+        key = self.key(state, location)
+        now = time.monotonic()
+        self.last_action[key] = now
+        self.in_flight[key] = now
+
+    def observe(self, visible):
+        """visible: (state, location) pairs detected in the latest analysed frame"""
+        if not self.in_flight:
+            return
+        seen = {self.key(state, location) for state, location in visible}
+        for key in [k for k in self.in_flight if k not in seen]:
+            del self.in_flight[key]
+
+    def snapshot(self):
+        return {
+            "actions_allowed": self.allowed,
+            "actions_dropped_in_flight": self.dropped["in_flight"],
+            "actions_dropped_cooldown": self.dropped["cooldown"],
+            "actions_in_flight": len(self.in_flight),
+        }
@@ -0,0 +1,86 @@
+import time
+import cv2
+from buffer_pool import BufferPool
+
+POLL_MIN_INTERVAL = 0.15
+POLL_MAX_INTERVAL = 3.0
+POLL_DECAY = 1.5
+
+# Mean absolute difference (0-255) between consecutive frame thumbnails
+FRAME_CHANGE_THRESHOLD = 4.0
+STATIC_FRAME_THRESHOLD = 0.5
+THUMBNAIL_SIZE = (160, 90)
+
+
+class AdaptivePollScheduler:
+    """
+    Choose the delay before the next capture from recent screen activity.
+    Polls fast after actions or large frame changes and backs off
+    exponentially toward max_interval while the screen is static.
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 decay=POLL_DECAY, change_threshold=FRAME_CHANGE_THRESHOLD,
+                 static_threshold=STATIC_FRAME_THRESHOLD, pool=None):
+        self.pool = pool or BufferPool()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decay = decay
+        self.change_threshold = change_threshold
+        self.static_threshold = static_threshold
+        self.reset()
+
+    def reset(self):
+        self.interval = self.min_interval
+        self.last_thumbnail = None
+        self.last_diff = None
+        self.frames = 0
+        self.skipped = 0
+
+    def on_action(self):
+        """An action was performed: expect the screen to change soon"""
+        self.interval = self.min_interval
+
+    def on_frame(self, frame):
+        """Update the interval from the difference with the previous frame"""
+        self.frames += 1
+        if frame.ndim == 3:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.pool.get("poll:gray", frame.shape[:2]))
+        else:
+            gray = frame
+        # Two thumbnail buffers alternate, so the previous one survives this frame
+        w, h = THUMBNAIL_SIZE
+        thumbnail = cv2.resize(gray, THUMBNAIL_SIZE, dst=self.pool.get(f"poll:thumbnail:{self.frames % 2}", (h, w)),
+                               interpolation=cv2.INTER_AREA)
+
+        if self.last_thumbnail is None:
+            self.last_diff = None
+            self.interval = self.min_interval
+        else:
+            diff = cv2.absdiff(thumbnail, self.last_thumbnail, dst=self.pool.get("poll:diff", (h, w)))
+            self.last_diff = cv2.mean(diff)[0]
+            if self.last_diff >= self.change_threshold:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.decay, self.max_interval)
+
+        self.last_thumbnail = thumbnail
+        return self.last_diff
+
+    def is_static(self):
+        """True when the last frame is practically identical to the one before"""
+        return self.last_diff is not None and self.last_diff < self.static_threshold
+
+    def mark_skipped(self):
+        self.skipped += 1
+
+    def sleep(self):
+        time.sleep(self.interval)
+
+    def snapshot(self):
+        return {
+            "poll_interval": round(self.interval, 3),
+            "frame_diff": None if self.last_diff is None else round(self.last_diff, 2),
+            "polled_frames": self.frames,
+            "skipped_frames": self.skipped,
+        }
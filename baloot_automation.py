@@ -12,12 +12,55 @@ import os
 import re
 import pytesseract
 from PIL import Image
-from datetime import datetime
 import pyautogui
-import shutil
+from screen_state_machine import ScreenStateMachine
+from colour_prefilter import ColourPrefilter
+from correlation_engine import add_match_arguments, create_matcher
+from buffer_pool import BufferPool
+from template_sets import SharedGray, load_template_sets
+from detectors import Detection, FrameContext, TemplateDetector
+from frame_transform import FrameTransform, scale_templates
+from coordinate_calibration import CoordinateCalibration
+from action_scheduler import ActionScheduler
+from click_verifier import ClickVerifier, CLICK_RETRIES, capture_clip, crop, padded_box
+from scene_classifier import SceneClassifier, BALOOT_SCENE_DETECTORS, restrict_to_scene
+from detection_config import TEMPLATE_SCALES, TEMPLATE_THRESHOLD
+from adaptive_polling import AdaptivePollScheduler, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_DECAY
+from debug_artifacts import DebugArtifactWriter
+from flight_recorder import FlightRecorder
+from event_log import EventLog, add_event_log_arguments, default_event_log_path, stage_durations_ms
+from tick_profiler import TickProfiler, PROFILE_TICKS
+from perf_metrics import MetricsRegistry, InstrumentedDriver, add_metrics_arguments, start_metrics_export, default_instance_name
+import argparse
+
+# Seconds of continuous WAITING before the loop backs off
+FAILURE_PAUSE_AFTER = 25
+STUCK_STATE_AFTER = 60
+
+# Overlay performance section refresh period (seconds)
+PERF_HUD_INTERVAL = 1.0
+HUD_STAGES = ["capture", "decode", "detect", "scene", "prefilter", "convert", "match", "ocr", "click", "verify"]
+
+# Default template per state; extra variants come from templates/manifest.json
+BUTTON_TEMPLATE_FILES = {
+    "PLAY_BALOOT": "play_baloot_template.png",
+    "RETURN_GREEN": "return_template.png",
+    "RETURN_GREY": "return_grey_template.png",
+    "LEAVE_GAME": "leave_game_template.png",
+    "GREEN_PARTICIPATE": "green_participate_template.png"
+}
+
+# Scenes confirmed by a detection on an unrecognised frame (--learn-scenes);
+# RETURN_* outranks LEAVE_GAME, so a LEAVE_GAME hit means no end-of-hand panel
+LEARNED_SCENES = {
+    "LEAVE_GAME": "table",
+    "RETURN_GREEN": "end_of_hand",
+    "RETURN_GREY": "end_of_hand",
+}
+
 
 class RobustBalootAutomation:
-    def __init__(self):
+    def __init__(self, driver=None, mouse=None, instance=None, event_log=None):
         self.chrome_options = Options()
         self.chrome_options.add_argument("--start-maximized")
         self.chrome_options.add_argument("--disable-web-security")
@@ -26,10 +69,13 @@ class RobustBalootAutomation:
         self.chrome_options.add_argument("--disable-extensions")
         self.chrome_options.add_argument("--no-sandbox")
         self.chrome_options.add_argument("--disable-dev-shm-usage")
-        self.driver = webdriver.Chrome(
+        self.metrics = MetricsRegistry(instance)
+        driver = driver or webdriver.Chrome(
             service=Service(ChromeDriverManager().install()),
             options=self.chrome_options
         )
+        self.driver = InstrumentedDriver(driver, self.metrics)
+        self.mouse = mouse or pyautogui
         self.canvas = None
         self.canvas_rect = None
         self.debug_overlay_id = "baloot_debug_overlay"
@@ -38,33 +84,42 @@ class RobustBalootAutomation:
         self.debug_folder = "debug_screenshots"
         if not os.path.exists(self.debug_folder):
             os.makedirs(self.debug_folder)
+        self.debug_writer = DebugArtifactWriter(self.debug_folder)
+        self.buffer_pool = BufferPool()
+        self.flight_recorder = FlightRecorder(self.debug_writer, pool=self.buffer_pool)
+        self.profiler = TickProfiler(self.debug_writer)
+        self.event_log = event_log or EventLog(default_event_log_path("baloot", self.metrics.instance), self.metrics.instance)
+        self.last_frame = None
 
         self.ocr_available = self.test_ocr()
-
-        self.templates = self.load_templates()
+        self.hud_last_update = time.monotonic()
+        self.hud_last_frames = 0
+
+        self.frame_transform = FrameTransform(pool=self.buffer_pool)
+        self.calibration = CoordinateCalibration(self.driver, self.mouse)
+        self.click_verifier = ClickVerifier(self.capture_region)
+        self.action_scheduler = ActionScheduler()
+        self.templates = scale_templates(self.load_templates())
+        self.template_sets = load_template_sets(BUTTON_TEMPLATE_FILES, states=list(self.templates))
+        self.shared_gray = SharedGray(pool=self.buffer_pool)
+        self.colour_prefilter = ColourPrefilter(self.templates, pool=self.buffer_pool)
+        self.template_scales = list(TEMPLATE_SCALES)
+        self.template_threshold = TEMPLATE_THRESHOLD
+        self.detectors = {
+            state: TemplateDetector(state, template_set, self.colour_prefilter,
+                                    lambda: (self.template_scales, self.template_threshold))
+            for state, template_set in self.template_sets.items()
+        }
+        self.state_machine = ScreenStateMachine()
+        self.poll_scheduler = AdaptivePollScheduler(pool=self.buffer_pool)
+        self.scene_classifier = SceneClassifier.default(pool=self.buffer_pool)
+        self.learn_scenes = False
 
 
-    def cleanup_debug_folder(self):
-        """Delete all files in debug_screenshots folder"""
-        try:
-            for filename in os.listdir(self.debug_folder):
-                file_path = os.path.join(self.debug_folder, filename)
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-            self.update_debug_overlay("🗑️ Debug folder cleared.")
-        except Exception as e:
-            self.update_debug_overlay(f"❌ Failed to clear debug folder: {e}")
     def load_templates(self):
         """Load template images for button matching."""
-        template_files = {
-            "PLAY_BALOOT": "play_baloot_template.png",
-            "RETURN_GREEN": "return_template.png",      
-            "RETURN_GREY": "return_grey_template.png",  
-            "LEAVE_GAME": "leave_game_template.png",
-            "GREEN_PARTICIPATE": "green_participate_button.png"  
-        }
         templates = {}
-        for state, filename in template_files.items():
+        for state, filename in BUTTON_TEMPLATE_FILES.items():
             if os.path.exists(filename):
                 template = cv2.imread(filename, cv2.IMREAD_COLOR)
                 if template is not None:
@@ -86,86 +141,138 @@ class RobustBalootAutomation:
         except Exception:
             return False
 
-    def get_timestamp(self):
-        """Get formatted timestamp for files and logs"""
-        return datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    def save_debug_screenshot(self, action, detection_result=None):
-        """Save screenshot with detection annotations for debugging"""
-        timestamp = self.get_timestamp()
-        filename = f"{self.debug_folder}/{timestamp}_{action}.png"
-        try:
-            self.driver.save_screenshot(filename)
-            if detection_result and detection_result.get("button_location"):
-                self.annotate_screenshot(filename, detection_result)
-            self.update_debug_overlay(f"Debug screenshot: {filename}")
-            return filename
-        except Exception as e:
-            self.update_debug_overlay(f"Screenshot error: {e}")
-            return None
-
-    def annotate_screenshot(self, screenshot_path, detection_result):
-        """Add annotations to show what was detected"""
+    def dump_flight_recorder(self, reason, capture_now=False):
+        """Persist the frames leading up to a failure (or a manual request)"""
+        if capture_now:
+            frame = self.capture_frame()
+            self.flight_recorder.record(frame, {"state": "MANUAL"})
+        folder = self.flight_recorder.dump(reason)
+        if folder:
+            self.update_debug_overlay(f"📼 Flight recording saved: {self.debug_folder}/{folder}")
+        else:
+            self.update_debug_overlay("📼 Flight recorder empty or writer busy, nothing saved")
+        return folder
+
+    def start_profiling(self, reason="manual"):
+        """Profile the next ticks of the automation loop"""
+        if self.profiler.start(reason=reason):
+            self.update_debug_overlay(f"🧪 Profiling the next {self.profiler.remaining} ticks...")
+        else:
+            self.update_debug_overlay("🧪 Profiler already running")
+
+    def report_profile(self, folder):
+        if folder:
+            self.update_debug_overlay(f"🧪 Profile saved: {self.debug_folder}/{folder}")
+
+    def check_calibration(self):
+        """Re-measure the screen/page mapping if the window moved, resized or the capture size changed"""
         try:
-            img = cv2.imread(screenshot_path)
-            if img is None:
-                return
-            x, y = detection_result["button_location"]
-            state = detection_result.get("state", "UNKNOWN")
-            confidence = detection_result.get("confidence", 0)
-
-            cv2.circle(img, (x, y), 15, (0, 0, 255), -1)
-            cv2.circle(img, (x, y), 25, (255, 255, 255), 3)
-
-            label = f"{state} ({confidence:.2f})"
-            cv2.putText(img, label, (x - 50, y - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            cv2.putText(img, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-
-            cv2.imwrite(screenshot_path, img)
+            if self.calibration.check(self.frame_transform.frame_size):
+                snapshot = self.calibration.snapshot()
+                self.event_log.emit("calibration", **snapshot)
+                self.update_debug_overlay(f"📐 Calibrated ({snapshot['source']}): viewport at "
+                                          f"{snapshot['viewport_origin']}, {snapshot['frame_per_css']} px/css")
         except Exception as e:
-            self.update_debug_overlay(f"Annotation error: {e}")
+            self.event_log.emit("error", where="calibration", message=str(e))
 
-    def click_button_at_position(self, x, y, detection_result):
-        """Click using PyAutoGUI with screen offset correction"""
+    def click_button_at_position(self, x, y, detection_result, attempt=0, box=None):
+        """
+        Click using PyAutoGUI at the calibrated screen position (x, y in
+        canonical frame space), then confirm the button reacted. A button that
+        moved without reacting is clicked again where it is now; one still in
+        place is left to the action scheduler rather than clicked twice.
+        """
+        canonical_x, canonical_y = x, y
+        box = box or detection_result.box
+        region = self.click_region(box)
+        before = None
+        if attempt == 0:
+            self.action_scheduler.started(detection_result.state, (x, y))
+        x, y = self.frame_transform.to_frame(x, y)
+        self.check_calibration()
+        client_x, client_y = self.calibration.to_client(x, y)
         self.update_debug_overlay(f"Clicking at canvas coordinates ({x}, {y})")
         self.update_automation_status("CLICKING")
 
-        self.show_click_indicator(x, y, "red", 3000)
-
-        self.save_debug_screenshot("before_click", detection_result)
+        self.flight_recorder.note("click", x=x, y=y, state=detection_result.state)
 
         try:
-            window_pos = self.driver.get_window_position()
-            canvas_x = self.canvas_rect['x']
-            canvas_y = self.canvas_rect['y']
-
-            screen_x = window_pos['x'] + canvas_x + x
-            screen_y = window_pos['y'] + canvas_y + y
-
-            chrome_top_bar_height = 130
-            screen_y += chrome_top_bar_height
+            click_start = time.perf_counter()
+            screen_x, screen_y = self.calibration.to_screen(x, y)
 
             self.update_debug_overlay(f"Absolute screen coords: ({screen_x}, {screen_y})")
 
-            pyautogui.moveTo(screen_x, screen_y, duration=0.2)
+            self.mouse.moveTo(screen_x, screen_y, duration=0.2)
             time.sleep(0.05)
-            pyautogui.mouseDown()
+            # Reference for the verifier: the button as it is now, hovered, not
+            # the detection frame (which is 40 s old on the RETURN_GREEN path)
+            if region is not None:
+                before = self.capture_region(region)
+            self.mouse.mouseDown()
             time.sleep(0.05)
-            pyautogui.mouseUp()
-
-            self.show_click_indicator(x, y, "lime", 2000)
-            self.update_debug_overlay("✅ REAL mouse click successful!")
-            time.sleep(2)
-            self.save_debug_screenshot("after_click")
+            self.mouse.mouseUp()
+            click_seconds = time.perf_counter() - click_start
+            self.metrics.observe("click", click_seconds)
+            self.metrics.inc("clicks")
+            self.event_log.emit("action", action="click", state=detection_result.state, x=x, y=y,
+                                screen_x=screen_x, screen_y=screen_y, click_ms=round(click_seconds * 1000, 3))
+
+            self.update_debug_overlay("✅ REAL mouse click sent")
         except Exception as e:
             self.update_debug_overlay(f"❌ PyAutoGUI click failed: {e}")
-            self.show_click_indicator(x, y, "orange", 2000)
-            self.fallback_click(x, y)
+            self.event_log.emit("error", where="click", message=str(e), x=x, y=y)
+            self.fallback_click(client_x, client_y)
+
+        # Indicators are drawn only after verification so they never show up in the checked region
+        report = self.verify_click(detection_result, region, before, box)
+        confirmed = report is None or report["confirmed"]
+        self.show_click_indicator(client_x, client_y, "lime" if confirmed else "orange", 2000)
+        if not confirmed and report["moved"] and attempt < CLICK_RETRIES:
+            dx, dy = report["moved"]
+            self.update_debug_overlay("🔁 Button moved without reacting, clicking it again...")
+            self.click_button_at_position(canonical_x + dx, canonical_y + dy, detection_result, attempt + 1,
+                                          (box[0] + dx, box[1] + dy, box[2], box[3]))
+
+    def click_region(self, box):
+        """Padded canonical region the verifier watches around a button box, or None"""
+        if box is None or self.last_frame is None:
+            return None
+        h, w = self.last_frame.shape[:2]
+        return padded_box(box, (w, h))
+
+    def capture_region(self, box):
+        """Capture one canonical-space box, clipped by CDP when available, else from a full capture"""
+        try:
+            frame_box = self.frame_transform.box_to_frame(box)
+            scale = self.calibration.frame_per_css * self.frame_transform.scale
+            with self.metrics.time("capture:roi"):
+                return capture_clip(self.driver, self.calibration.box_to_client(frame_box), scale)
+        except Exception:
+            frame = self.capture_frame()
+            return crop(frame, box) if frame is not None else None
+
+    def verify_click(self, detection_result, region, before, box):
+        """Watch the clicked region until it differs from before; returns the verifier report"""
+        if region is None or before is None or not before.size:
+            time.sleep(2)
+            return None
+        template_gray = None
+        template = self.templates.get(detection_result.state)
+        if template is not None:
+            template_gray = cv2.resize(cv2.cvtColor(template, cv2.COLOR_BGR2GRAY), (box[2], box[3]))
+
+        with self.metrics.time("verify"):
+            report = self.click_verifier.verify(region, before, template_gray)
+        self.event_log.emit("click_verify", state=detection_result.state, **report)
+        if report["confirmed"]:
+            self.update_debug_overlay(f"✅ Click confirmed in {report['latency_ms']:.0f}ms ({report['reason']})")
+        else:
+            self.update_debug_overlay(f"⚠️ No reaction after {report['latency_ms']:.0f}ms"
+                                      f"{' (button moved)' if report['moved'] else ''}")
+        return report
 
     def fallback_click(self, x, y):
-        """Fallback: use JavaScript dispatch if PyAutoGUI fails"""
+        """Fallback: use JavaScript dispatch (client coordinates) if PyAutoGUI fails"""
         try:
             self.update_debug_overlay("⚠️ Fallback: Using JavaScript click")
             script = f"""
@@ -179,8 +286,10 @@ class RobustBalootAutomation:
             arguments[0].dispatchEvent(evt);
             """
             self.driver.execute_script(script, self.canvas)
+            self.event_log.emit("action", action="js_click", x=x, y=y)
         except Exception as e:
             self.update_debug_overlay(f"❌ JS click also failed: {e}")
+            self.event_log.emit("error", where="js_click", message=str(e), x=x, y=y)
 
     def start_game(self):
         """Initialize game and UI overlays"""
@@ -199,6 +308,7 @@ class RobustBalootAutomation:
             """, self.canvas)
 
             print(f"Canvas position: {self.canvas_rect}")
+            print(f"Coordinate calibration: {self.calibration.calibrate()}")
 
             self.create_debug_overlay()
             self.create_control_panel()
@@ -249,6 +359,12 @@ class RobustBalootAutomation:
         stopBtn.onclick = () => {{ window.automationControl = {{action:'STOP'}}; }};
         panel.appendChild(stopBtn);
 
+        const profileBtn = document.createElement('button');
+        profileBtn.textContent = '🧪 PROFILE';
+        profileBtn.style.cssText = 'width:100%; background:#8e44ad; color:white; border:none; padding:8px; border-radius:8px; margin-bottom:15px; cursor:pointer; font-size:12px;';
+        profileBtn.onclick = () => {{ window.automationControl = {{action:'PROFILE'}}; }};
+        panel.appendChild(profileBtn);
+
         const info = document.createElement('div');
         info.innerHTML = '<small style="color:#bdc3c7;">Hybrid Detection:<br>• Template Matching<br>• OCR & Visual Fallback</small>';
         info.style.cssText = 'text-align:center; font-size:11px;';
@@ -296,6 +412,12 @@ class RobustBalootAutomation:
         status.style.cssText = 'color:white; background:rgba(255,255,255,0.1); padding:5px; margin-bottom:12px; text-align:center; border-radius:5px;';
         overlay.appendChild(status);
 
+        const perf = document.createElement('div');
+        perf.id = '{self.debug_overlay_id}_perf';
+        perf.style.cssText = 'color:#ffd966; white-space:pre; padding:5px; margin-bottom:12px; background:rgba(255,217,102,0.08); border:1px solid #554400; border-radius:5px;';
+        perf.textContent = '⚡ waiting for frames...';
+        overlay.appendChild(perf);
+
         const logs = document.createElement('div');
         logs.id = '{self.debug_overlay_id}_logs';
         logs.style.cssText = 'max-height:250px; overflow-y:auto; padding:8px; background:rgba(0,0,0,0.7); border:1px solid #333; border-radius:5px;';
@@ -363,6 +485,37 @@ class RobustBalootAutomation:
         except:
             pass
 
+    def update_perf_hud(self, force=False):
+        """Refresh the overlay performance section, at most once per PERF_HUD_INTERVAL"""
+        now = time.monotonic()
+        elapsed = now - self.hud_last_update
+        if not force and elapsed < PERF_HUD_INTERVAL:
+            return
+        analysed = self.metrics.counter_total("frames_analysed")
+        fps = (analysed - self.hud_last_frames) / elapsed if elapsed > 0 else 0.0
+        self.hud_last_update = now
+        self.hud_last_frames = analysed
+
+        # Last frame's time per stage, with per-template matches and conversions summed
+        stages = {}
+        for stage, seconds in dict(self.metrics.frame_durations).items():
+            group = stage.split(":")[0]
+            stages[group] = stages.get(group, 0.0) + seconds
+        split = " · ".join(f"{name} {stages[name] * 1000:.0f}ms" for name in HUD_STAGES if name in stages)
+
+        polled = self.poll_scheduler.frames
+        skip_ratio = self.poll_scheduler.skipped / polled if polled else 0.0
+
+        text = (f"⚡ {fps:.1f} fps | skip {skip_ratio:.0%}"
+                f" | {self.state_machine.screen} for {self.state_machine.seconds_since_change():.0f}s\n"
+                f"⏱️ {split or 'no timings yet'}")
+        try:
+            self.driver.execute_script(
+                "const el = document.getElementById(arguments[0]); if (el) el.textContent = arguments[1];",
+                f"{self.debug_overlay_id}_perf", text)
+        except:
+            pass
+
     def update_automation_status(self, status):
         """Update control panel status color"""
         colors = {"RUNNING": "#27ae60", "STOPPED": "#e74c3c", "WAITING": "#f39c12", "CLICKING": "#9b59b6"}
@@ -446,19 +599,46 @@ class RobustBalootAutomation:
 
         return best_match if best_match else {"found": False}
 
-    def hybrid_button_detection(self, screenshot_path):
+
+    def capture_frame(self):
+        """Grab the viewport as a BGR image in canonical frame space without touching the disk"""
+        try:
+            with self.metrics.time("capture"):
+                png = self.driver.get_screenshot_as_png()
+            with self.metrics.time("decode"):
+                frame = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+            # imdecode has no dst=; at canonical width this array is the frame itself
+            self.buffer_pool.count("decoded")
+            with self.metrics.time("convert:canonical"):
+                return self.frame_transform.apply(frame)
+        except Exception as e:
+            self.update_debug_overlay(f"Screenshot error: {e}")
+            self.event_log.emit("error", where="capture", message=str(e))
+            return None
+
+    def hybrid_button_detection(self, screenshot):
         """
         Detect buttons using hybrid methods with strict priority order.
-        Returns the highest-priority button found.
+        Only states reachable from the current screen are checked, with a
+        periodic full scan to resync; a confidently classified scene narrows
+        that to the scene's own states. Accepts a screenshot path or a BGR frame.
+        Returns the highest-priority button found as a Detection.
         """
-        img = cv2.imread(screenshot_path)
+        if isinstance(screenshot, np.ndarray):
+            img = screenshot
+        elif screenshot:
+            img = cv2.imread(screenshot)
+        else:
+            img = None
         if img is None:
-            return {"state": "ERROR", "confidence": 0, "reason": "Screenshot failed"}
+            return Detection("ERROR", reason="Screenshot failed")
+
+        with self.metrics.time("scene"):
+            scene = self.scene_classifier.classify(img)
 
         img_height, img_width = img.shape[:2]
         exclude_x = int(img_width * 0.75)
         working_img = img[:, :exclude_x]
-        hsv_img = cv2.cvtColor(working_img, cv2.COLOR_BGR2HSV)
 
         priority_order = [
             "PLAY_BALOOT",
@@ -468,10 +648,24 @@ class RobustBalootAutomation:
             "LEAVE_GAME"
         ]
 
-        for state in priority_order:
-            result = self.detect_single_template_match(working_img, state)
-            if result["found"]:
-                result["reason"] = f"Template Match ({state})"
+        candidates, full_scan = self.state_machine.next_detectors(priority_order)
+        if scene and not full_scan:
+            candidates = restrict_to_scene(priority_order, scene, BALOOT_SCENE_DETECTORS)
+
+        with self.metrics.time("prefilter"):
+            candidates = self.colour_prefilter.choose(working_img, candidates, min(self.template_scales))
+
+        ctx = FrameContext(working_img, self.shared_gray, self.metrics.time, scene)
+        ctx.full_scan = full_scan
+        for state in candidates:
+            if state not in self.detectors:
+                continue
+            result = ctx.detect(self.detectors[state])
+            if result:
+                result.reason = f"Template Match ({state})"
+                self.state_machine.observe(state)
+                if self.learn_scenes and not scene and state in LEARNED_SCENES:
+                    self.scene_classifier.learn(img, LEARNED_SCENES[state])
                 return result
 
         # If no templates matched, fall back to OCR + Visual (optional fallback)
@@ -484,54 +678,24 @@ class RobustBalootAutomation:
         #     return ocr_result
 
         # Visual Fallback (Optional)
-        # visual_result = self.detect_with_visual(working_img, hsv_img)
+        # visual_result = self.detect_with_visual(working_img, cv2.cvtColor(working_img, cv2.COLOR_BGR2HSV))
         # if visual_result["found"]:
         #     return visual_result
 
-        return {"state": "WAITING", "confidence": 0, "reason": "No buttons detected"}
+        self.state_machine.observe("WAITING")
+        waiting = Detection("WAITING", reason="No buttons detected")
+        waiting.context = ctx
+        return waiting
+
     def detect_single_template_match(self, img, state):
         """
         Detect a single button by its state using multi-scale template matching.
-        Returns result only if confidence > threshold.
+        Skipped when the frame lacks the template's colour; a match must also
+        carry that colour. The Detection is found only if confidence > threshold.
         """
-        if state not in self.templates:
-            return {"found": False}
-
-        template = self.templates[state]
-        template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-        h, w = template_gray.shape
-
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        best_confidence = 0
-        best_location = None
-
-        scales = [1.0, 0.95, 1.05, 0.9, 1.1]
-        for scale in scales:
-            scaled_w = int(w * scale)
-            scaled_h = int(h * scale)
-            if scaled_h > img_gray.shape[0] or scaled_w > img_gray.shape[1]:
-                continue
-
-            resized_template = cv2.resize(template_gray, (scaled_w, scaled_h))
-            res = cv2.matchTemplate(img_gray, resized_template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(res)
-
-            if max_val > best_confidence:
-                best_confidence = max_val
-                center_x = max_loc[0] + scaled_w // 2
-                center_y = max_loc[1] + scaled_h // 2
-                best_location = (center_x, center_y)
-
-        if best_confidence >= 0.75:
-            return {
-                "found": True,
-                "state": state,
-                "confidence": best_confidence,
-                "button_location": best_location
-            }
-
-        return {"found": False}
+        if state not in self.detectors:
+            return Detection(state)
+        return FrameContext(img, self.shared_gray, self.metrics.time).detect(self.detectors[state])
 
     def detect_with_ocr(self, img):
         """OCR-based detection for Arabic text"""
@@ -549,7 +713,7 @@ class RobustBalootAutomation:
                 if 3000 < area < 50000:
                     x, y, w, h = cv2.boundingRect(cnt)
                     roi = img[y:y+h, x:x+w]
-                    text = self.extract_text_from_region(roi)
+                    text = self.read_region_text(roi)
                     match = self.fuzzy_match_text(text)
                     if match:
                         cx, cy = x + w//2, y + h//2
@@ -563,9 +727,10 @@ class RobustBalootAutomation:
             return {"found": False}
         except Exception as e:
             self.update_debug_overlay(f"OCR error: {e}")
+            self.event_log.emit("error", where="ocr", message=str(e))
             return {"found": False}
 
-    def extract_text_from_region(self, region):
+    def read_region_text(self, region):
         """Preprocess and extract text using Tesseract"""
         try:
             gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
@@ -578,7 +743,8 @@ class RobustBalootAutomation:
                 texts = []
                 for cfg in configs:
                     try:
-                        txt = pytesseract.image_to_string(pil_img, lang='ara+eng', config=cfg)
+                        with self.metrics.time("ocr"):
+                            txt = pytesseract.image_to_string(pil_img, lang='ara+eng', config=cfg)
                         if txt.strip():
                             texts.append(txt.strip())
                     except:
@@ -633,52 +799,101 @@ class RobustBalootAutomation:
     def automation_loop(self):
         self.update_debug_overlay("🤖 Automation loop started...")
         self.update_automation_status("RUNNING")
-        consecutive_failures = 0
+        self.poll_scheduler.reset()
+        failure_since = None
         last_state = None
-        state_repetition = 0
+        state_since = time.time()
+        result = None
 
         while self.automation_running:
+            self.report_profile(self.profiler.tick())
             cmd = self.check_control_commands()
             if cmd and cmd.get('action') == 'STOP':
                 self.automation_running = False
                 break
             elif cmd and cmd.get('action') == 'SCREENSHOT':
-                self.save_debug_screenshot("manual")
+                self.dump_flight_recorder("manual", capture_now=True)
+                continue
+            elif cmd and cmd.get('action') == 'PROFILE':
+                self.start_profiling()
                 continue
 
             self.update_automation_status("DETECTING")
-            temp_screenshot = f"{self.debug_folder}/temp_analysis.png"
-            self.driver.save_screenshot(temp_screenshot)
-
-            result = self.hybrid_button_detection(temp_screenshot)
-            current_state = result.get("state", "ERROR")
-            confidence = result.get("confidence", 0)
-
-            if current_state == last_state:
-                state_repetition += 1
+            # Close the previous capture's allocation count, reused frames included
+            self.buffer_pool.next_frame()
+            self.metrics.set_gauges(self.buffer_pool.snapshot())
+            self.metrics.start_frame()
+            frame = self.capture_frame()
+            if frame is not None:
+                self.last_frame = frame
+                self.poll_scheduler.on_frame(frame)
+
+            # Nothing moved since the last empty frame: reuse its result
+            reused = frame is not None and result is not None and result.state == "WAITING" \
+                and self.poll_scheduler.is_static()
+            if reused:
+                self.poll_scheduler.mark_skipped()
             else:
-                state_repetition = 0
+                with self.metrics.time("detect"):
+                    result = self.hybrid_button_detection(frame)
+                self.metrics.inc("frames_analysed")
+            self.flight_recorder.record(frame, result, poll_interval=self.poll_scheduler.interval)
+            current_state = result.state
+            confidence = result.confidence if result else 0
+            self.metrics.set_state(current_state)
+            self.metrics.set_gauges(self.poll_scheduler.snapshot())
+            self.metrics.set_gauges(self.state_machine.snapshot())
+            self.event_log.emit(
+                "detection", state=current_state, confidence=confidence, reused=bool(reused),
+                screen=self.state_machine.screen, scene=result.context and result.context.scene,
+                full_scan=result.context and result.context.full_scan, location=result.location if result else None,
+                frame_diff=self.poll_scheduler.last_diff,
+                stages_ms=stage_durations_ms(self.metrics.frame_durations),
+            )
+
+            now = time.time()
+            if current_state != last_state:
+                self.event_log.emit("transition", from_state=last_state, to_state=current_state,
+                                    after_s=round(now - state_since, 3))
+                state_since = now
             last_state = current_state
 
-            self.update_debug_overlay(f"🎯 Detected: {current_state} (conf: {confidence:.2f})")
+            self.update_debug_overlay(
+                f"🎯 Detected: {current_state} (conf: {confidence:.2f}) | Screen: {self.state_machine.screen}"
+                f" | Poll: {self.poll_scheduler.interval:.2f}s"
+            )
+
+            # Drop repeat clicks on a button whose last click is still being processed
+            location = result.location if result else None
+            self.action_scheduler.observe([(current_state, location)] if location else [])
+            blocked = self.action_scheduler.check(current_state, location) if location else None
+            self.metrics.set_gauges(self.action_scheduler.snapshot())
+
+            if blocked:
+                reason, remaining = blocked
+                failure_since = None
+                self.event_log.emit("action_skipped", state=current_state, reason=reason,
+                                    seconds=round(remaining, 3), location=location)
+                self.update_debug_overlay(f"⏭️ {current_state}: {reason.replace('_', ' ')} ({remaining:.1f}s left)")
 
-            if current_state == "GREEN_PARTICIPATE":
+            elif current_state == "GREEN_PARTICIPATE":
                 self.update_debug_overlay("🟢 Green Participate detected! Clicking now...")
-                x, y = result["button_location"]
+                x, y = result.location
                 self.click_button_at_position(x, y, result)
-                consecutive_failures = 0
-                time.sleep(3)
+                failure_since = None
+                self.poll_scheduler.on_action()
 
             elif current_state == "PLAY_BALOOT":
                 self.update_debug_overlay("🎮 Play Baloot detected! Clicking...")
-                x, y = result["button_location"]
+                x, y = result.location
                 self.click_button_at_position(x, y, result)
-                consecutive_failures = 0
-                time.sleep(4)
+                failure_since = None
+                self.poll_scheduler.on_action()
 
             elif current_state == "RETURN_GREEN":
                 self.update_debug_overlay("🟡 Green Return: waiting 40s before clicking...")
                 self.update_automation_status("WAITING")
+                self.event_log.emit("wait", reason="return_green", seconds=40)
                 for i in range(40):
                     if not self.automation_running:
                         break
@@ -686,51 +901,49 @@ class RobustBalootAutomation:
                     if i % 10 == 0:
                         self.update_debug_overlay(f"⏳ Waiting... {40-i}s remaining")
                 if self.automation_running:
-                    x, y = result["button_location"]
+                    x, y = result.location
                     self.click_button_at_position(x, y, result)
-                time.sleep(3)
+                self.poll_scheduler.on_action()
 
             elif current_state == "RETURN_GREY":
                 self.update_debug_overlay("⚪ Grey Return detected! Clicking immediately...")
-                x, y = result["button_location"]
+                x, y = result.location
                 self.click_button_at_position(x, y, result)
-                consecutive_failures = 0
-                time.sleep(3)
+                failure_since = None
+                self.poll_scheduler.on_action()
 
             elif current_state == "LEAVE_GAME":
                 self.update_debug_overlay("🚪 Leave Game detected! Returning to menu...")
-                x, y = result["button_location"]
+                x, y = result.location
                 self.click_button_at_position(x, y, result)
-                consecutive_failures = 0
-                time.sleep(4)
+                failure_since = None
+                self.poll_scheduler.on_action()
 
             elif current_state == "WAITING":
-                consecutive_failures += 1
-                if state_repetition > 10:
+                failure_since = failure_since or now
+                if now - state_since > STUCK_STATE_AFTER:
                     self.update_debug_overlay("🔄 Possible stuck state. Taking a break...")
+                    self.dump_flight_recorder("stuck_state")
+                    self.event_log.emit("wait", reason="stuck_state", seconds=10)
                     time.sleep(10)
-                    state_repetition = 0
-                if consecutive_failures >= 5:
+                    state_since = time.time()
+                if now - failure_since >= FAILURE_PAUSE_AFTER:
                     self.update_debug_overlay("⚠️ Too many failures. Pausing 30s...")
-                    self.save_debug_screenshot("failure_pause")
+                    self.dump_flight_recorder("failure_pause")
+                    self.event_log.emit("wait", reason="failure_pause", seconds=30)
                     time.sleep(30)
-                    consecutive_failures = 0
-                else:
-                    time.sleep(3)
+                    failure_since = None
 
             else:
-                consecutive_failures += 1
-                self.update_debug_overlay(f"❌ Unknown state: {result.get('reason', 'N/A')}")
+                failure_since = failure_since or now
+                self.update_debug_overlay(f"❌ Unknown state: {result.reason or 'N/A'}")
+                self.event_log.emit("wait", reason="unknown_state", seconds=5, detail=result.reason)
                 time.sleep(5)
 
-            try:
-                if os.path.exists(temp_screenshot):
-                    os.remove(temp_screenshot)
-            except:
-                pass
-
-            time.sleep(1)
+            self.update_perf_hud()
+            self.poll_scheduler.sleep()
 
+        self.report_profile(self.profiler.stop())
         self.update_automation_status("STOPPED")
         self.update_debug_overlay("🛑 Automation stopped.")
 
@@ -739,7 +952,6 @@ class RobustBalootAutomation:
             self.start_game()
             method = "Hybrid (Template + OCR)" if self.templates else "OCR + Visual"
             self.update_debug_overlay(f"Ready! Mode: {method}")
-            self.save_debug_screenshot("startup")
 
             while True:
                 cmd = self.check_control_commands()
@@ -747,6 +959,8 @@ class RobustBalootAutomation:
                     act = cmd.get('action')
                     if act == 'START' and not self.automation_running:
                         self.automation_running = True
+                        self.state_machine.reset()
+                        self.action_scheduler.reset()
                         self.automation_loop()
                     elif act == 'STOP':
                         self.automation_running = False
@@ -755,7 +969,9 @@ class RobustBalootAutomation:
                         self.update_debug_overlay("🚨 Emergency Stop!")
                         break
                     elif act == 'SCREENSHOT':
-                        self.save_debug_screenshot("manual_request")
+                        self.dump_flight_recorder("manual_request", capture_now=True)
+                    elif act == 'PROFILE':
+                        self.start_profiling()
 
                 if not self.automation_running:
                     time.sleep(0.5)
@@ -763,15 +979,35 @@ class RobustBalootAutomation:
             self.update_debug_overlay("👋 Stopped by user (Ctrl+C)")
         except Exception as e:
             self.update_debug_overlay(f"💥 Critical error: {e}")
-            self.save_debug_screenshot("critical_error")
+            self.flight_recorder.note("error", message=str(e))
+            self.event_log.emit("error", where="critical", message=str(e))
+            self.dump_flight_recorder("critical_error", capture_now=True)
         finally:
-            self.cleanup_debug_folder()
+            if self.scene_classifier.learned:
+                self.scene_classifier.save()
+                print(f"📚 Learned {self.scene_classifier.learned} scene thumbnails: {self.scene_classifier.coverage()}")
+            self.debug_writer.close()
+            self.event_log.close()
             self.update_debug_overlay("🔚 Session ended.")
             input("\nPress Enter to close browser...")
             self.driver.quit()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Robust Baloot Automation")
+    parser.add_argument("--profile-ticks", type=int, default=PROFILE_TICKS,
+                        help="Loop ticks profiled by the PROFILE button")
+    parser.add_argument("--profile", action="store_true", help="Profile the first ticks after START")
+    parser.add_argument("--poll-min", type=float, default=POLL_MIN_INTERVAL, help="Fastest capture interval (s)")
+    parser.add_argument("--poll-max", type=float, default=POLL_MAX_INTERVAL, help="Slowest capture interval (s)")
+    parser.add_argument("--poll-decay", type=float, default=POLL_DECAY, help="Back-off factor while the screen is static")
+    parser.add_argument("--learn-scenes", action="store_true",
+                        help="Add table/end-of-hand thumbnails confirmed by detections to the scene library")
+    add_metrics_arguments(parser)
+    add_event_log_arguments(parser)
+    add_match_arguments(parser)
+    args = parser.parse_args()
+
     print("="*60)
     print("🎮 ROBUST BALOOT AUTOMATION SYSTEM")
     print("="*60)
@@ -781,7 +1017,7 @@ def main():
     print("  • Interactive START/STOP Panel")
     print("  • Debug Screenshots & Logs")
     print("  • Auto Recovery from Errors")
-    print("\n📁 Debug screenshots will be saved in 'debug_screenshots/'")
+    print("\n📁 Failure recordings will be saved in 'debug_screenshots/'")
 
     try:
         import cv2
@@ -798,8 +1034,22 @@ def main():
         return
 
     input("\n📌 Press Enter to start...")
-    bot = RobustBalootAutomation()
-    bot.run_with_controls()
+    instance = args.instance or default_instance_name()
+    event_log = EventLog(args.event_log or default_event_log_path("baloot", instance), instance,
+                         max_bytes=int(args.event_log_max_mb * 1024 * 1024), backups=args.event_log_backups)
+    bot = RobustBalootAutomation(instance=instance, event_log=event_log)
+    bot.shared_gray.matcher = create_matcher(args.match_backend, args.fft_workers)
+    bot.poll_scheduler = AdaptivePollScheduler(args.poll_min, args.poll_max, args.poll_decay, pool=bot.buffer_pool)
+    bot.profiler.ticks = args.profile_ticks
+    bot.learn_scenes = args.learn_scenes
+    if args.profile:
+        bot.profiler.start(reason="startup")
+    exporter = start_metrics_export(bot.metrics, args.metrics_port, args.metrics_json, args.metrics_interval)
+    try:
+        bot.run_with_controls()
+    finally:
+        if exporter:
+            exporter.stop()
 
 
 if __name__ == "__main__":
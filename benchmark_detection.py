@@ -0,0 +1,286 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import cv2
+import numpy as np
+from replay_driver import ReplayDriver
+from correlation_engine import MATCH_BACKEND, MATCH_BACKENDS, FFT_WORKERS, create_matcher
+from detectors import Detection, to_records
+
+DEFAULT_FRAME_PATTERNS = ["test*.png", "screenshot_v3.png", "Screenshot_v1.png"]
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.10
+GIFT_BUTTONS = ["CLAIM", "AGREE", "BACK"]
+
+
+def collect_frames(patterns):
+    """Load every frame matching the glob patterns, keyed by path"""
+    frames = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if path in frames:
+                continue
+            img = cv2.imread(path)
+            if img is None:
+                print(f"⚠️ Could not load frame: {path}")
+                continue
+            frames[path] = img
+    return frames
+
+
+def build_bots(frames):
+    """Create both bots on a replay driver, skipping any that cannot be imported"""
+    bots = {}
+    replay_frames = list(frames.items())
+    try:
+        from baloot_automation import RobustBalootAutomation
+        driver = ReplayDriver(replay_frames)
+        bots["baloot"] = RobustBalootAutomation(driver=driver, mouse=driver.mouse)
+    except Exception as e:
+        print(f"⚠️ Baloot detectors unavailable: {e}")
+    try:
+        from gift_automation import BalootGiftBoxAutomation
+        bots["gift"] = BalootGiftBoxAutomation(driver=ReplayDriver(replay_frames))
+    except Exception as e:
+        print(f"⚠️ Gift detectors unavailable: {e}")
+    return bots
+
+
+def build_cases(bots, frames):
+    """
+    Return {detector_name: [(frame_path, callable), ...]}.
+    Inputs that need a previous detection (the gift path) are prepared here, untimed.
+    """
+    cases = {}
+    baloot = bots.get("baloot")
+    gift = bots.get("gift")
+
+    def hybrid(frame):
+        baloot.state_machine.reset()
+        return baloot.hybrid_button_detection(frame)
+
+    for path, frame in frames.items():
+        if baloot:
+            cases.setdefault("hybrid_button_detection", []).append(
+                (path, lambda f=frame: hybrid(f)))
+        if gift:
+            for btn in GIFT_BUTTONS:
+                cases.setdefault(f"detect_button[{btn}]", []).append(
+                    (path, lambda f=frame, b=btn: gift.detect_button(f, b)))
+            cases.setdefault("detect_giftbox", []).append(
+                (path, lambda f=frame: gift.detect_giftbox(f)))
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                giftbox_info = gift.detect_giftbox(frame)
+            if giftbox_info:
+                cases.setdefault("detect_path_in_giftbox", []).append(
+                    (path, lambda f=frame, g=giftbox_info: gift.detect_path_in_giftbox(f, g)))
+    return cases
+
+
+def pool_allocations(bots):
+    """Buffer pool allocations so far, summed over the bots"""
+    return sum(bot.buffer_pool.allocations for bot in bots.values() if hasattr(bot, "buffer_pool"))
+
+
+def time_calls(calls, repeat):
+    """Run every call `repeat` times; returns per-call latencies in ms and the call results"""
+    latencies = []
+    outputs = []
+    for _ in range(repeat):
+        for _, fn in calls:
+            start = time.perf_counter_ns()
+            output = fn()
+            latencies.append((time.perf_counter_ns() - start) / 1e6)
+            outputs.append(output)
+    return latencies, outputs
+
+
+def summarise_detections(outputs):
+    """Hit rate and mean confidence of the Detection results, batched into one structured array"""
+    records = to_records([o for o in outputs if isinstance(o, Detection)])
+    if not records.size:
+        return {}
+    return {
+        "found_rate": round(float(records["found"].mean()), 4),
+        "mean_confidence": round(float(records["confidence"].mean()), 4),
+    }
+
+
+def measure_allocations(calls):
+    """Peak traced bytes and net allocated blocks per call, using tracemalloc"""
+    peaks = []
+    blocks = []
+    tracemalloc.start()
+    try:
+        for _, fn in calls:
+            tracemalloc.reset_peak()
+            before_bytes = tracemalloc.get_traced_memory()[0]
+            before_snapshot = tracemalloc.take_snapshot()
+            fn()
+            after_snapshot = tracemalloc.take_snapshot()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before_bytes)
+            diff = after_snapshot.compare_to(before_snapshot, "filename")
+            blocks.append(sum(max(0, stat.count_diff) for stat in diff))
+    finally:
+        tracemalloc.stop()
+    return peaks, blocks
+
+
+def summarise(latencies, peaks, blocks):
+    lat = np.asarray(latencies)
+    total_s = lat.sum() / 1000.0
+    return {
+        "calls": int(lat.size),
+        "mean_ms": round(float(lat.mean()), 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "max_ms": round(float(lat.max()), 3),
+        "throughput_per_s": round(lat.size / total_s, 2) if total_s > 0 else None,
+        "alloc_peak_kib": round(float(np.mean(peaks)) / 1024, 1) if peaks else None,
+        "alloc_blocks": round(float(np.mean(blocks)), 1) if blocks else None,
+    }
+
+
+def run_benchmark(frames, repeat=DEFAULT_REPEAT, measure_allocs=True, detectors=None,
+                  backend=MATCH_BACKEND, workers=FFT_WORKERS):
+    bots = build_bots(frames)
+    for bot in bots.values():
+        bot.shared_gray.matcher = create_matcher(backend, workers)
+    cases = build_cases(bots, frames)
+    results = {}
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, calls in cases.items():
+            if detectors and not any(name.startswith(d) for d in detectors):
+                continue
+            # Warm up caches and lazy initialisation outside the timed loop
+            for _, fn in calls:
+                fn()
+            allocated = pool_allocations(bots)
+            latencies, outputs = time_calls(calls, repeat)
+            allocated = pool_allocations(bots) - allocated
+            peaks, blocks = measure_allocations(calls) if measure_allocs else ([], [])
+            results[name] = summarise(latencies, peaks, blocks)
+            results[name]["frames"] = len(calls)
+            results[name]["pool_allocs_per_call"] = round(allocated / len(latencies), 2)
+            results[name].update(summarise_detections(outputs))
+
+    for bot in bots.values():
+        for name in ("debug_writer", "event_log"):
+            writer = getattr(bot, name, None)
+            if writer:
+                writer.close()
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "repeat": repeat,
+            "match_backend": backend,
+            "fft_workers": workers,
+            "frames": sorted(frames),
+        },
+        "detectors": results,
+    }
+
+
+def compare_runs(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare two benchmark reports.
+    Returns a list of regression messages (empty when nothing got slower).
+    """
+    regressions = []
+    for name, base in baseline["detectors"].items():
+        cur = current["detectors"].get(name)
+        if cur is None:
+            regressions.append(f"{name}: missing from current run")
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if base[key] and cur[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {base[key]:.2f} -> {cur[key]:.2f} ms (+{(cur[key] / base[key] - 1) * 100:.0f}%)")
+        if base.get("throughput_per_s") and cur.get("throughput_per_s") \
+                and cur["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {base['throughput_per_s']:.1f} -> {cur['throughput_per_s']:.1f} /s")
+    return regressions
+
+
+def print_report(report):
+    print(f"\n{'detector':<28}{'p50':>9}{'p95':>9}{'p99':>9}{'/s':>9}{'KiB':>9}{'blocks':>8}{'pool':>7}")
+    for name, r in report["detectors"].items():
+        print(f"{name:<28}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['throughput_per_s'] or 0:>9.1f}{r['alloc_peak_kib'] or 0:>9.0f}{r['alloc_blocks'] or 0:>8.0f}"
+              f"{r.get('pool_allocs_per_call', 0):>7.2f}")
+
+
+def print_regressions(regressions, tolerance):
+    if regressions:
+        print(f"\n❌ {len(regressions)} performance regression(s) beyond {tolerance * 100:.0f}%:")
+        for msg in regressions:
+            print(f"   → {msg}")
+    else:
+        print(f"\n✅ No regressions beyond {tolerance * 100:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detectors over recorded screenshots")
+    parser.add_argument("--frames", nargs="*", default=[], help="Extra frame glob patterns")
+    parser.add_argument("--only-frames", action="store_true", help="Ignore the bundled screenshots")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed passes over every frame")
+    parser.add_argument("--detectors", nargs="*", help="Only run detectors whose name starts with these")
+    parser.add_argument("--backend", choices=MATCH_BACKENDS, default=MATCH_BACKEND, help="Template correlation backend")
+    parser.add_argument("--fft-workers", type=int, default=FFT_WORKERS, help="Threads for the FFT backend")
+    parser.add_argument("--no-allocs", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", "-o", help="Write the JSON report here")
+    parser.add_argument("--baseline", "-b", help="Compare this run against an earlier JSON report")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two reports without running")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    if args.diff:
+        with open(args.diff[0]) as f:
+            baseline = json.load(f)
+        with open(args.diff[1]) as f:
+            current = json.load(f)
+        regressions = compare_runs(baseline, current, args.tolerance)
+        print_regressions(regressions, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+    patterns = list(args.frames) if args.only_frames else DEFAULT_FRAME_PATTERNS + list(args.frames)
+    frames = collect_frames(patterns)
+    if not frames:
+        print("❌ No frames found")
+        sys.exit(2)
+    print(f"🖼️ Benchmarking over {len(frames)} frames x {args.repeat} passes ({args.backend} backend)...")
+
+    report = run_benchmark(frames, args.repeat, not args.no_allocs, args.detectors, args.backend, args.fft_workers)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_runs(baseline, report, args.tolerance)
+        print_regressions(regressions, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+import numpy as np
+
+# Resolutions kept per buffer name, so alternating between two canvas sizes
+# (e.g. a resized window) does not reallocate every frame
+RESOLUTIONS_PER_BUFFER = 2
+
+
+class BufferPool:
+    """
+    Per-resolution scratch arrays for the detection path, reused across
+    frames. get() returns the same array for a name, shape and dtype, so
+    OpenCV dst=/result= and NumPy out= calls write in place; a buffer is only
+    allocated when the canvas (or a template) takes a size not seen recently.
+    Allocations are counted per frame so a steady state of zero can be checked;
+    arrays that must outlive the frame are allocated by their owner and
+    reported with count(), so the gauges show every per-frame allocation.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+        self.unpooled = {}
+        self.allocations = 0
+        self.frames = 0
+        self.frame_allocations = 0
+        self.last_frame_allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        shape = tuple(int(v) for v in shape)
+        key = (shape, np.dtype(dtype))
+        sizes = self.buffers.setdefault(name, OrderedDict())
+        buf = sizes.get(key)
+        if buf is None:
+            buf = np.empty(shape, dtype)
+            sizes[key] = buf
+            if len(sizes) > RESOLUTIONS_PER_BUFFER:
+                sizes.popitem(last=False)
+            self.allocations += 1
+            self.frame_allocations += 1
+        else:
+            sizes.move_to_end(key)
+        return buf
+
+    def count(self, name):
+        """Record an array allocated outside the pool (kept past the frame, or a call without out=)"""
+        self.unpooled[name] = self.unpooled.get(name, 0) + 1
+        self.allocations += 1
+        self.frame_allocations += 1
+
+    def next_frame(self):
+        """Close the allocation count of the previous frame"""
+        self.frames += 1
+        self.last_frame_allocations = self.frame_allocations
+        self.frame_allocations = 0
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for sizes in self.buffers.values() for buf in sizes.values())
+
+    def snapshot(self):
+        return {
+            "buffer_allocations": self.allocations,
+            "buffer_allocations_last_frame": self.last_frame_allocations,
+            "buffer_unpooled": sum(self.unpooled.values()),
+            "buffer_pool_kib": round(self.nbytes / 1024, 1),
+        }
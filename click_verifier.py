@@ -0,0 +1,131 @@
+import base64
+import time
+import cv2
+import numpy as np
+
+# Re-capture the clicked button every VERIFY_INTERVAL seconds for up to VERIFY_TIMEOUT
+VERIFY_INTERVAL = 0.05
+VERIFY_TIMEOUT = 0.6
+# Pixels captured around the button box so a template can still slide a little
+VERIFY_MARGIN = 8
+# Mean absolute grayscale difference (0-255) that counts as the button reacting
+ROI_CHANGE_THRESHOLD = 12.0
+# Below this match score the button is considered gone
+TEMPLATE_GONE_THRESHOLD = 0.6
+# Extra clicks when the button shows no reaction but has moved (the click missed it)
+CLICK_RETRIES = 1
+# Template shift (canonical pixels) beyond which the button counts as moved
+BUTTON_MOVED_PX = 3
+
+
+def padded_box(box, frame_size=None, margin=VERIFY_MARGIN):
+    """(x, y, w, h) grown by margin and clipped to frame_size (w, h)"""
+    x, y, w, h = box
+    x0, y0 = max(0, x - margin), max(0, y - margin)
+    x1, y1 = x + w + margin, y + h + margin
+    if frame_size:
+        x1, y1 = min(x1, frame_size[0]), min(y1, frame_size[1])
+    return x0, y0, max(1, x1 - x0), max(1, y1 - y0)
+
+
+def crop(frame, box):
+    x, y, w, h = box
+    return frame[y:y + h, x:x + w]
+
+
+def capture_clip(driver, client_box, scale=1.0):
+    """
+    Capture only client_box (x, y, w, h in CSS pixels) with CDP
+    Page.captureScreenshot; the image is scaled by `scale`. Returns BGR or None.
+    """
+    x, y, w, h = client_box
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", {
+        "format": "png",
+        "clip": {"x": x, "y": y, "width": w, "height": h, "scale": scale},
+        "captureBeyondViewport": False,
+    })
+    data = base64.b64decode(result["data"])
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+class ClickVerifier:
+    """
+    Confirms a click by re-capturing only the button region until it changes
+    or the template stops matching there. capture(box) must return the region
+    (x, y, w, h in canonical frame pixels) as a BGR image, or None. An
+    unconfirmed report says whether the button moved, the only case where
+    clicking again at the same spot would not just repeat the same click.
+    """
+
+    def __init__(self, capture, interval=VERIFY_INTERVAL, timeout=VERIFY_TIMEOUT,
+                 change_threshold=ROI_CHANGE_THRESHOLD, gone_threshold=TEMPLATE_GONE_THRESHOLD):
+        self.capture = capture
+        self.interval = interval
+        self.timeout = timeout
+        self.change_threshold = change_threshold
+        self.gone_threshold = gone_threshold
+        self.confirmed = 0
+        self.unconfirmed = 0
+
+    @staticmethod
+    def locate(gray, template_gray):
+        """(match score, top-left) of the template in gray, or (None, None) when it does not fit"""
+        if template_gray is None or template_gray.shape[0] > gray.shape[0] or template_gray.shape[1] > gray.shape[1]:
+            return None, None
+        _, score, _, loc = cv2.minMaxLoc(cv2.matchTemplate(gray, template_gray, cv2.TM_CCOEFF_NORMED))
+        return float(score), loc
+
+    def compare(self, before_gray, after, template_gray=None):
+        """Return (reason or None, mean abs diff, match score, match top-left)"""
+        after_gray = cv2.cvtColor(after, cv2.COLOR_BGR2GRAY) if after.ndim == 3 else after
+        if after_gray.shape != before_gray.shape:
+            after_gray = cv2.resize(after_gray, (before_gray.shape[1], before_gray.shape[0]))
+        diff = float(cv2.absdiff(before_gray, after_gray).mean())
+        if diff >= self.change_threshold:
+            return "changed", diff, None, None
+        score, loc = self.locate(after_gray, template_gray)
+        if score is not None and score < self.gone_threshold:
+            return "template_gone", diff, score, loc
+        return None, diff, score, loc
+
+    def verify(self, box, before, template_gray=None):
+        """
+        Poll the region around box until it reacts. before is the region
+        captured just before the click (same box). Returns a report dict;
+        "moved" is the button's (dx, dy) when it shifted without reacting.
+        """
+        before_gray = cv2.cvtColor(before, cv2.COLOR_BGR2GRAY) if before.ndim == 3 else before
+        _, before_loc = self.locate(before_gray, template_gray)
+        start = time.monotonic()
+        deadline = start + self.timeout
+        attempts = 0
+        reason, diff, score, loc = None, None, None, None
+        while True:
+            attempts += 1
+            after = self.capture(box)
+            if after is not None and after.size:
+                reason, diff, score, loc = self.compare(before_gray, after, template_gray)
+                if reason:
+                    break
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.interval)
+
+        moved = None
+        if not reason and loc is not None and before_loc is not None:
+            dx, dy = loc[0] - before_loc[0], loc[1] - before_loc[1]
+            if max(abs(dx), abs(dy)) > BUTTON_MOVED_PX:
+                moved = (dx, dy)
+        if reason:
+            self.confirmed += 1
+        else:
+            self.unconfirmed += 1
+        return {
+            "confirmed": reason is not None,
+            "moved": moved,
+            "reason": reason or "no_change",
+            "latency_ms": round((time.monotonic() - start) * 1000, 3),
+            "captures": attempts,
+            "diff": round(diff, 2) if diff is not None else None,
+            "match": round(score, 3) if score is not None else None,
+        }
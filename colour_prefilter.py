@@ -0,0 +1,178 @@
+import cv2
+import numpy as np
+from buffer_pool import BufferPool
+
+# HSV ranges (OpenCV hue 0..180) for the colours that identify buttons
+COLOUR_CLASSES = {
+    "green": ((35, 80, 60), (85, 255, 255)),
+    "grey": ((0, 0, 60), (180, 40, 220)),
+    # Brown/gold of the gift box
+    "warm": ((5, 60, 40), (35, 255, 255)),
+}
+# A template has a colour signature when this share of its pixels is one class
+SIGNATURE_MIN_FRACTION = 0.2
+# Some window of the frame (or the matched box) must hold at least this share
+# of the template's own colour fraction, otherwise the template is ruled out
+PRESENCE_RATIO = 0.5
+# Colour statistics are computed on a frame downscaled by this factor
+PREFILTER_DOWNSCALE = 4
+# States whose name fixes their colour: only that class may become their
+# signature, so a background colour (the beige card around a button) cannot
+COLOUR_STATES = {
+    "RETURN_GREEN": "green",
+    "RETURN_GREY": "grey",
+    "GREEN_PARTICIPATE": "green",
+}
+# Same button in different colours: only the one whose colour the frame holds
+# is matched, unless the other comes within this presence margin
+COLOUR_ALTERNATIVES = [("RETURN_GREEN", "RETURN_GREY")]
+COLOUR_DECISION_MARGIN = 0.2
+
+
+def colour_fractions(img):
+    """Share of the BGR image's pixels in each colour class"""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    return {name: float(np.count_nonzero(cv2.inRange(hsv, lo, hi))) / (hsv.shape[0] * hsv.shape[1])
+            for name, (lo, hi) in COLOUR_CLASSES.items()}
+
+
+class ColourStats:
+    """
+    Integral images of the colour-class masks of one frame, built lazily per
+    class, so the pixel count of any box costs four lookups. All arrays live in
+    the pool and are overwritten by the next frame's statistics.
+    """
+
+    def __init__(self, frame, downscale=PREFILTER_DOWNSCALE, pool=None):
+        self.downscale = downscale
+        self.pool = pool or BufferPool()
+        h, w = frame.shape[:2]
+        size = (max(1, w // downscale), max(1, h // downscale))
+        # Nearest sampling: pixel shares survive it and it is ~20x cheaper than INTER_AREA
+        small = cv2.resize(frame, size, dst=self.pool.get("prefilter:small", (size[1], size[0], 3)),
+                           interpolation=cv2.INTER_NEAREST)
+        self.hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV, dst=self.pool.get("prefilter:hsv", small.shape))
+        self.integrals = {}
+
+    def integral(self, colour):
+        if colour not in self.integrals:
+            lo, hi = COLOUR_CLASSES[colour]
+            mask = cv2.inRange(self.hsv, lo, hi, dst=self.pool.get(f"prefilter:mask:{colour}", self.hsv.shape[:2]))
+            np.floor_divide(mask, 255, out=mask)
+            rows, cols = mask.shape
+            self.integrals[colour] = cv2.integral(
+                mask, sum=self.pool.get(f"prefilter:integral:{colour}", (rows + 1, cols + 1), np.int32), sdepth=cv2.CV_32S)
+        return self.integrals[colour]
+
+    def box_fraction(self, colour, box):
+        """Colour share inside (x, y, w, h) given in full-frame pixels"""
+        ii = self.integral(colour)
+        rows, cols = ii.shape[0] - 1, ii.shape[1] - 1
+        x, y, w, h = box
+        x0 = min(max(0, x // self.downscale), cols)
+        y0 = min(max(0, y // self.downscale), rows)
+        x1 = min(max(x0 + 1, (x + w) // self.downscale), cols)
+        y1 = min(max(y0 + 1, (y + h) // self.downscale), rows)
+        area = (x1 - x0) * (y1 - y0)
+        if area <= 0:
+            return 0.0
+        total = ii[y1, x1] - ii[y0, x1] - ii[y1, x0] + ii[y0, x0]
+        return float(total) / area
+
+    def max_window_fraction(self, colour, size):
+        """Highest colour share over every window of size (w, h) full-frame pixels"""
+        ii = self.integral(colour)
+        w = max(1, size[0] // self.downscale)
+        h = max(1, size[1] // self.downscale)
+        if h >= ii.shape[0] or w >= ii.shape[1]:
+            return self.box_fraction(colour, (0, 0, (ii.shape[1] - 1) * self.downscale, (ii.shape[0] - 1) * self.downscale))
+        sums = self.pool.get(f"prefilter:windows:{w}x{h}", (ii.shape[0] - h, ii.shape[1] - w), ii.dtype)
+        np.subtract(ii[h:, w:], ii[:-h, w:], out=sums)
+        sums -= ii[h:, :-w]
+        sums += ii[:-h, :-w]
+        return float(sums.max()) / (w * h)
+
+
+class ColourPrefilter:
+    """
+    Rules templates out before matchTemplate when their colour mass is absent
+    from the frame, picks RETURN_GREEN or RETURN_GREY from the frame's colours
+    before either is matched, and checks that a match has the template's
+    colour. Templates without a clear colour signature always pass.
+    """
+
+    def __init__(self, templates, ratio=PRESENCE_RATIO, downscale=PREFILTER_DOWNSCALE, pool=None):
+        self.ratio = ratio
+        self.downscale = downscale
+        self.pool = pool or BufferPool()
+        self.signatures = {}
+        for state, template in templates.items():
+            if template is None or template.ndim != 3:
+                continue
+            fractions = colour_fractions(template)
+            colour = COLOUR_STATES.get(state) or max(fractions, key=fractions.get)
+            if fractions[colour] >= SIGNATURE_MIN_FRACTION:
+                h, w = template.shape[:2]
+                self.signatures[state] = (colour, fractions[colour], (w, h))
+            elif state in COLOUR_STATES:
+                print(f"⚠️ {state} template is only {fractions[colour]:.0%} {colour}: no colour check for it")
+        self.last_frame = None
+        self.last_stats = None
+        self.skipped = 0
+        self.rejected = 0
+        self.decided = 0
+
+    @classmethod
+    def from_files(cls, template_files, **kwargs):
+        return cls({state: cv2.imread(path) for state, path in template_files.items()}, **kwargs)
+
+    def stats(self, frame):
+        """Colour statistics for frame, reused while the same array is passed in"""
+        if frame is not self.last_frame:
+            self.last_frame = frame
+            self.last_stats = ColourStats(frame, self.downscale, self.pool)
+        return self.last_stats
+
+    def presence(self, frame, state, scale=1.0):
+        """Best window share of the state's colour relative to its template (1.0 without a signature)"""
+        signature = self.signatures.get(state)
+        if signature is None:
+            return 1.0
+        colour, fraction, (w, h) = signature
+        return self.stats(frame).max_window_fraction(colour, (int(w * scale), int(h * scale))) / fraction
+
+    def allows(self, frame, state, scale=1.0):
+        """False when no window the size of the (scaled) template holds its colour"""
+        if self.presence(frame, state, scale) >= self.ratio:
+            return True
+        self.skipped += 1
+        return False
+
+    def choose(self, frame, states, scale=1.0):
+        """
+        Drop the colour alternatives (RETURN_GREEN/RETURN_GREY) the frame's
+        colours rule out, keeping the order of states. Both stay when neither
+        colour clearly dominates.
+        """
+        dropped = set()
+        for group in COLOUR_ALTERNATIVES:
+            present = [state for state in group if state in states and state in self.signatures]
+            if len(present) < 2:
+                continue
+            ratios = {state: min(1.0, self.presence(frame, state, scale)) for state in present}
+            best = max(present, key=ratios.get)
+            losers = [state for state in present if ratios[best] - ratios[state] >= COLOUR_DECISION_MARGIN]
+            dropped.update(losers)
+            self.decided += len(losers)
+        return [state for state in states if state not in dropped]
+
+    def verify(self, frame, state, box):
+        """False when the matched box (x, y, w, h) lacks the template's colour"""
+        signature = self.signatures.get(state)
+        if signature is None:
+            return True
+        colour, fraction, _ = signature
+        if self.stats(frame).box_fraction(colour, box) >= fraction * self.ratio:
+            return True
+        self.rejected += 1
+        return False
@@ -0,0 +1,135 @@
+# Used only when the browser reports no window metrics at all (old hard-coded offset)
+FALLBACK_CHROME_HEIGHT = 130
+
+WINDOW_PROBE_SCRIPT = """
+return {
+    screenX: window.screenX, screenY: window.screenY,
+    outerWidth: window.outerWidth, outerHeight: window.outerHeight,
+    innerWidth: window.innerWidth, innerHeight: window.innerHeight,
+    devicePixelRatio: window.devicePixelRatio || 1,
+    screenWidth: window.screen.width
+};
+"""
+
+
+class CoordinateCalibration:
+    """
+    Maps captured-frame pixels to page (clientX/Y) and screen coordinates.
+
+    The viewport origin on screen comes from the window bounds (CDP
+    Browser.getWindowForTarget, else window.screenX/Y) and the browser chrome
+    around the viewport (outer minus inner size, Page.getLayoutMetrics when
+    available). Frame pixels per CSS pixel come from the capture width, and
+    screen units per CSS pixel from the mouse library's screen size. The result
+    is cached per window rect and frame size and redone when either changes.
+    """
+
+    def __init__(self, driver, mouse=None):
+        self.driver = driver
+        self.mouse = mouse
+        self.window_rect = None
+        self.frame_size = None
+        self.viewport_origin = (0.0, 0.0)
+        self.frame_per_css = 1.0
+        self.screen_per_css = 1.0
+        self.source = None
+        self.calibrations = 0
+
+    def _window_rect(self):
+        try:
+            rect = self.driver.get_window_rect()
+            return rect["x"], rect["y"], rect["width"], rect["height"]
+        except Exception:
+            pos = self.driver.get_window_position()
+            return pos["x"], pos["y"], None, None
+
+    def _cdp(self, cmd, params=None):
+        try:
+            return self.driver.execute_cdp_cmd(cmd, params or {})
+        except Exception:
+            return None
+
+    def check(self, frame_size=None):
+        """Recalibrate if the window moved/resized or the capture size changed; True if it did"""
+        rect = self._window_rect()
+        if rect == self.window_rect and (frame_size is None or frame_size == self.frame_size) and self.source:
+            return False
+        self.calibrate(rect, frame_size or self.frame_size)
+        return True
+
+    def calibrate(self, rect=None, frame_size=None):
+        rect = rect or self._window_rect()
+        try:
+            probe = self.driver.execute_script(WINDOW_PROBE_SCRIPT) or {}
+        except Exception:
+            probe = {}
+
+        left, top = probe.get("screenX", rect[0]), probe.get("screenY", rect[1])
+        outer_w, outer_h = probe.get("outerWidth", rect[2]), probe.get("outerHeight", rect[3])
+        inner_w, inner_h = probe.get("innerWidth"), probe.get("innerHeight")
+        source = "js"
+
+        window = self._cdp("Browser.getWindowForTarget")
+        if window and "bounds" in window:
+            bounds = window["bounds"]
+            left, top = bounds.get("left", left), bounds.get("top", top)
+            outer_w, outer_h = bounds.get("width", outer_w), bounds.get("height", outer_h)
+            source = "cdp"
+        metrics = self._cdp("Page.getLayoutMetrics")
+        if metrics:
+            viewport = metrics.get("cssVisualViewport") or metrics.get("visualViewport") or {}
+            inner_w = viewport.get("clientWidth", inner_w)
+            inner_h = viewport.get("clientHeight", inner_h)
+
+        if inner_w and inner_h and outer_w and outer_h:
+            # Chrome draws equal side and bottom borders; everything else is above the viewport
+            border = max(0.0, (outer_w - inner_w) / 2.0)
+            self.viewport_origin = (left + border, top + max(0.0, outer_h - inner_h - border))
+        else:
+            self.viewport_origin = (rect[0], rect[1] + FALLBACK_CHROME_HEIGHT)
+            source = "fallback"
+
+        if frame_size and inner_w:
+            self.frame_per_css = frame_size[0] / float(inner_w)
+        else:
+            self.frame_per_css = float(probe.get("devicePixelRatio", 1) or 1)
+        self.screen_per_css = 1.0
+        screen_width = probe.get("screenWidth")
+        size = getattr(self.mouse, "size", None)
+        if screen_width and callable(size):
+            try:
+                self.screen_per_css = size()[0] / float(screen_width)
+            except Exception:
+                pass
+
+        self.window_rect = rect
+        self.frame_size = frame_size
+        self.source = source
+        self.calibrations += 1
+        return self.snapshot()
+
+    def to_client(self, x, y):
+        """Captured-frame pixels -> clientX/clientY for dispatched events"""
+        return int(round(x / self.frame_per_css)), int(round(y / self.frame_per_css))
+
+    def box_to_client(self, box):
+        """Captured-frame (x, y, w, h) -> CSS pixel box"""
+        x, y, w, h = box
+        return (x / self.frame_per_css, y / self.frame_per_css,
+                max(1.0, w / self.frame_per_css), max(1.0, h / self.frame_per_css))
+
+    def to_screen(self, x, y):
+        """Captured-frame pixels -> screen coordinates for the OS mouse"""
+        cx, cy = x / self.frame_per_css, y / self.frame_per_css
+        ox, oy = self.viewport_origin
+        return int(round((ox + cx) * self.screen_per_css)), int(round((oy + cy) * self.screen_per_css))
+
+    def snapshot(self):
+        return {
+            "source": self.source,
+            "window_rect": self.window_rect,
+            "frame_size": self.frame_size,
+            "viewport_origin": [round(v, 1) for v in self.viewport_origin],
+            "frame_per_css": round(self.frame_per_css, 4),
+            "screen_per_css": round(self.screen_per_css, 4),
+        }
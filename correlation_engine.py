@@ -0,0 +1,214 @@
+import os
+from collections import OrderedDict
+import cv2
+import numpy as np
+from buffer_pool import BufferPool
+
+try:
+    import scipy.fft as fft_lib
+except ImportError:
+    fft_lib = None
+
+MATCH_BACKENDS = ("opencv", "fft")
+MATCH_BACKEND = "opencv"
+FFT_WORKERS = os.cpu_count() or 1
+# Frames (full, coarse, refine crops) whose transforms are kept at once
+FRAME_CACHE_SIZE = 3
+# Template spectra kept, per (template, padded frame shape)
+TEMPLATE_CACHE_SIZE = 64
+# Windows with less variance than this (gray levels squared) score 0
+MIN_WINDOW_VARIANCE = 1e-3
+
+
+def fast_len(n):
+    return fft_lib.next_fast_len(n, real=True) if fft_lib else cv2.getOptimalDFTSize(n)
+
+
+def rfft2(a, shape, workers):
+    if fft_lib:
+        return fft_lib.rfft2(a, s=shape, workers=workers)
+    return np.fft.rfft2(a, s=shape)
+
+
+def irfft2(a, shape, workers):
+    if fft_lib:
+        return fft_lib.irfft2(a, s=shape, workers=workers)
+    return np.fft.irfft2(a, s=shape)
+
+
+def result_buffer(pool, template, frame_shape):
+    """Pool buffer for one template's result map, or None to let the backend allocate"""
+    if pool is None:
+        return None
+    h, w = template.shape[:2]
+    return pool.get(f"match:{id(template)}", (frame_shape[0] - h + 1, frame_shape[1] - w + 1), np.float32)
+
+
+class OpenCVMatcher:
+    """cv2.matchTemplate per template (the reference backend)"""
+
+    name = "opencv"
+
+    def reset(self):
+        pass
+
+    def match_maps(self, gray, templates, pool=None):
+        """
+        TM_CCOEFF_NORMED result map for each template (None where it does not
+        fit). With a pool the maps are written into its buffers, valid until
+        the same template is matched again.
+        """
+        maps = []
+        for template in templates:
+            h, w = template.shape[:2]
+            if h > gray.shape[0] or w > gray.shape[1]:
+                maps.append(None)
+                continue
+            result = result_buffer(pool, template, gray.shape)
+            maps.append(cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED, result=result))
+        return maps
+
+
+class FrameSpectrum:
+    """One frame's FFT and integral images, shared by every template matched against it"""
+
+    def __init__(self, gray, workers, pool):
+        h, w = gray.shape
+        self.size = (h, w)
+        self.shape = (fast_len(h), fast_len(w))
+        self.pool = pool
+        centred = pool.get("fft:centred", (h, w), np.float32)
+        np.copyto(centred, gray)
+        # Templates are zero-mean, so removing the frame mean leaves the
+        # correlation unchanged and keeps float32 rounding small
+        centred -= centred.mean()
+        # The spectrum and integral images are cached with the frame (several
+        # frames of one size may be cached at once), so they are counted, not pooled
+        self.spectrum = rfft2(centred, self.shape, workers)
+        self.sums, self.squares = cv2.integral2(gray, sdepth=cv2.CV_64F)
+        pool.count("fft:spectrum")
+        pool.count("fft:integral")
+        self.variances = {}
+
+    def window_variance(self, h, w):
+        """n * variance of every h x w window (valid positions only), shared by same-size templates"""
+        if (h, w) not in self.variances:
+            self.variances[(h, w)] = self._window_variance(h, w)
+            self.pool.count("fft:variance")
+        return self.variances[(h, w)]
+
+    def _window_variance(self, h, w):
+        H, W = self.size
+        rows, cols = H - h + 1, W - w + 1
+
+        def box(table):
+            out = np.subtract(table[h:h + rows, w:w + cols], table[:rows, w:w + cols])
+            out -= table[h:h + rows, :cols]
+            out += table[:rows, :cols]
+            return out
+
+        s1, s2 = box(self.sums), box(self.squares)
+        s1 *= s1
+        s1 *= 1.0 / (h * w)
+        s2 -= s1
+        return s2
+
+
+class FFTMatcher:
+    """
+    Normalised cross-correlation (TM_CCOEFF_NORMED) for many templates
+    against one frame transform. The frame's FFT and integral images are
+    computed once; each template costs one spectrum product, and all inverse
+    transforms run as a single batched call across FFT_WORKERS threads.
+    """
+
+    name = "fft"
+
+    def __init__(self, workers=FFT_WORKERS):
+        self.workers = workers
+        self.frames = OrderedDict()
+        self.templates = OrderedDict()
+
+    def reset(self):
+        self.frames.clear()
+
+    def frame(self, gray, pool):
+        key = id(gray)
+        cached = self.frames.get(key)
+        if cached is not None and cached[0] is gray:
+            self.frames.move_to_end(key)
+            return cached[1]
+        spectrum = FrameSpectrum(gray, self.workers, pool)
+        self.frames[key] = (gray, spectrum)
+        if len(self.frames) > FRAME_CACHE_SIZE:
+            self.frames.popitem(last=False)
+        return spectrum
+
+    def template(self, template, shape):
+        """(conjugate spectrum of the zero-mean template, its sum of squares)"""
+        key = (id(template), shape)
+        cached = self.templates.get(key)
+        if cached is not None and cached[0] is template:
+            self.templates.move_to_end(key)
+            return cached[1], cached[2]
+        centred = template.astype(np.float32)
+        centred -= centred.mean()
+        spectrum = np.conj(rfft2(centred, shape, self.workers))
+        energy = float(np.square(centred, dtype=np.float64).sum())
+        self.templates[key] = (template, spectrum, energy)
+        if len(self.templates) > TEMPLATE_CACHE_SIZE:
+            self.templates.popitem(last=False)
+        return spectrum, energy
+
+    def match_maps(self, gray, templates, pool=None):
+        # Without a pool every buffer is a fresh array, as from the OpenCV backend
+        pool = pool or BufferPool()
+        frame = self.frame(gray, pool)
+        H, W = frame.size
+        maps = [None] * len(templates)
+        fitting = [i for i, t in enumerate(templates) if t.shape[0] <= H and t.shape[1] <= W]
+        if not fitting:
+            return maps
+
+        entries = [self.template(templates[i], frame.shape) for i in fitting]
+        shape = (len(entries),) + frame.spectrum.shape
+        products = pool.get(f"fft:products:{shape}", shape, frame.spectrum.dtype)
+        for k, (spectrum, _) in enumerate(entries):
+            np.multiply(frame.spectrum, spectrum, out=products[k])
+        # The inverse transform has no out=; its one batched output is counted
+        correlations = irfft2(products, frame.shape, self.workers)
+        pool.count("fft:correlations")
+
+        for k, i in enumerate(fitting):
+            h, w = templates[i].shape[:2]
+            energy = entries[k][1]
+            numerator = correlations[k, :H - h + 1, :W - w + 1]
+            result = result_buffer(pool, templates[i], gray.shape)
+            result.fill(0)
+            if energy <= 0:
+                maps[i] = result
+                continue
+            variance = frame.window_variance(h, w)
+            denominator = np.maximum(variance, 0, out=pool.get("fft:denominator", variance.shape, np.float64))
+            denominator *= energy
+            np.sqrt(denominator, out=denominator)
+            valid = np.greater(variance, MIN_WINDOW_VARIANCE * h * w, out=pool.get("fft:valid", variance.shape, bool))
+            np.divide(numerator, denominator, out=result, where=valid)
+            np.clip(result, -1.0, 1.0, out=result)
+            maps[i] = result
+        return maps
+
+
+def create_matcher(backend=MATCH_BACKEND, workers=FFT_WORKERS):
+    if backend == "fft":
+        return FFTMatcher(workers)
+    if backend == "opencv":
+        return OpenCVMatcher()
+    raise ValueError(f"Unknown match backend: {backend}")
+
+
+def add_match_arguments(parser):
+    """Shared CLI flags for both bots"""
+    parser.add_argument("--match-backend", choices=MATCH_BACKENDS, default=MATCH_BACKEND,
+                        help="Template correlation: OpenCV per template, or one shared frame FFT for all")
+    parser.add_argument("--fft-workers", type=int, default=FFT_WORKERS, help="Threads for the FFT backend")
@@ -0,0 +1,198 @@
+import os
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+import cv2
+
+DEBUG_IMAGE_FORMAT = "jpg"
+DEBUG_IMAGE_QUALITY = 80
+DEBUG_MAX_FILES = 500
+DEBUG_MAX_BYTES = 200 * 1024 * 1024
+DEBUG_QUEUE_SIZE = 32
+
+
+def annotate_frame(img, detection):
+    """Draw a found Detection (location, state, confidence) and a timestamp on a BGR image"""
+    if detection:
+        x, y = detection.location
+        cv2.circle(img, (x, y), 15, (0, 0, 255), -1)
+        cv2.circle(img, (x, y), 25, (255, 255, 255), 3)
+
+        label = f"{detection.state} ({detection.confidence:.2f})"
+        cv2.putText(img, label, (x - 50, y - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    cv2.putText(img, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+    return img
+
+
+class DebugArtifactWriter:
+    """
+    Annotate, encode and write debug images on a background thread.
+    Keeps the folder under a file count and byte quota by deleting the
+    oldest artifacts first. The submit_*() calls never block: when the queue
+    is full the artifact is dropped and counted.
+    """
+
+    def __init__(self, folder, image_format=DEBUG_IMAGE_FORMAT, quality=DEBUG_IMAGE_QUALITY,
+                 max_files=DEBUG_MAX_FILES, max_bytes=DEBUG_MAX_BYTES, queue_size=DEBUG_QUEUE_SIZE):
+        self.folder = folder
+        self.image_format = image_format.lower().lstrip(".")
+        self.quality = quality
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        os.makedirs(self.folder, exist_ok=True)
+
+        self.files = deque()
+        self.total_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self.evicted = 0
+        self._scan_existing()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name="debug-artifact-writer", daemon=True)
+        self.thread.start()
+
+    def _scan_existing(self):
+        """Account for artifacts left by earlier sessions, oldest first"""
+        existing = []
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                existing.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(existing):
+            self.files.append((path, size))
+            self.total_bytes += size
+
+    def _encode_params(self, quality=None):
+        quality = self.quality if quality is None else quality
+        if self.image_format in ("jpg", "jpeg"):
+            return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        if self.image_format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+        if self.image_format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, 3]
+        return []
+
+    def encode(self, img, quality=None):
+        """Encode an image in the writer's format; returns the encoded bytes or None"""
+        try:
+            ok, buf = cv2.imencode(f".{self.image_format}", img, self._encode_params(quality))
+        except cv2.error:
+            return None
+        return buf.tobytes() if ok else None
+
+    def _put(self, job):
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def submit(self, action, frame, detection=None):
+        """
+        Queue a frame for annotation and encoding.
+        Returns the path it will be written to, or None if it was dropped.
+        """
+        if frame is None:
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        path = os.path.join(self.folder, f"{timestamp}_{action}.{self.image_format}")
+        if not self._put(("frame", path, (frame, detection))):
+            return None
+        return path
+
+    def submit_encode(self, frame, done, quality=None):
+        """
+        Queue a frame for encoding only; done(bytes or None) is called on the
+        writer thread. The frame must stay untouched until then.
+        """
+        return self._put(("encode", None, (frame, done, quality)))
+
+    def submit_bytes(self, relative_path, data):
+        """Queue already encoded bytes (images, JSON) for writing under the folder"""
+        path = os.path.join(self.folder, relative_path)
+        if not self._put(("bytes", path, data)):
+            return None
+        return path
+
+    def submit_files(self, files):
+        """
+        Queue several (relative_path, bytes) pairs as a single job. files may
+        be a callable returning them, built on the writer thread after every
+        job queued before it (e.g. pending encodes) has run.
+        """
+        return self._put(("files", None, files))
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                kind, path, payload = job
+                if kind == "frame":
+                    frame, detection = payload
+                    data = self.encode(annotate_frame(frame.copy(), detection))
+                    if data is not None:
+                        self._write(path, data)
+                elif kind == "encode":
+                    frame, done, quality = payload
+                    done(self.encode(frame, quality))
+                elif kind == "files":
+                    files = payload() if callable(payload) else payload
+                    for rel, data in files:
+                        self._write(os.path.join(self.folder, rel), data)
+                else:
+                    self._write(path, payload)
+            except Exception as e:
+                print(f"⚠️ Debug artifact write failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.files.append((path, len(data)))
+        self.total_bytes += len(data)
+        self.written += 1
+        self._enforce_quota()
+
+    def _enforce_quota(self):
+        while self.files and (len(self.files) > self.max_files or self.total_bytes > self.max_bytes):
+            path, size = self.files.popleft()
+            self.total_bytes -= size
+            self.evicted += 1
+            try:
+                os.unlink(path)
+                parent = os.path.dirname(path)
+                if os.path.abspath(parent) != os.path.abspath(self.folder) and not os.listdir(parent):
+                    os.rmdir(parent)
+            except OSError:
+                pass
+
+    def flush(self):
+        """Block until every queued artifact is written"""
+        self.queue.join()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "files": len(self.files),
+            "bytes": self.total_bytes,
+        }
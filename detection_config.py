@@ -0,0 +1,12 @@
+# Default matcher settings of both bots, kept free of browser and input
+# dependencies so offline tools (threshold_sweep.py) can import them
+
+# Baloot bot: multi-scale template matcher (overridable per instance)
+TEMPLATE_SCALES = [1.0, 0.95, 1.05, 0.9, 1.1]
+TEMPLATE_THRESHOLD = 0.75
+
+# Gift bot: popup buttons and the gift box
+GIFTBOX_THRESHOLD = 0.5
+BUTTON_THRESHOLD = 0.7
+GIFTBOX_SCALES = [0.8, 0.9, 1.0, 1.1, 1.2]
+BUTTON_SCALES = [1.0]
@@ -0,0 +1,195 @@
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+from template_sets import no_timer
+
+# One row per detection when results are batched (benchmarks, replays);
+# x, y, w, h are the matched box, -1 when there is none
+DETECTION_DTYPE = np.dtype([
+    ("state", "U20"),
+    ("found", "?"),
+    ("confidence", "f4"),
+    ("x", "i4"),
+    ("y", "i4"),
+    ("w", "i4"),
+    ("h", "i4"),
+])
+# Share of the frame width left of the region where a gift box is preferred
+GIFTBOX_RIGHT_SIDE = 0.6
+# Candidates below this share of the threshold are not considered at all
+GIFTBOX_FLOOR = 0.8
+
+
+class Detection:
+    """
+    Outcome of one detector on one frame. box is (x, y, w, h) in canonical
+    pixels; a Detection is truthy only when something was found, so it can be
+    tested like the None/dict results it replaces.
+    """
+
+    __slots__ = ("state", "found", "confidence", "box", "variant", "scale", "reason", "context")
+
+    def __init__(self, state, found=False, confidence=0.0, box=None, variant=None, scale=None, reason=None):
+        self.state = state
+        self.found = found
+        self.confidence = float(confidence)
+        self.box = box
+        self.variant = variant
+        self.scale = scale
+        self.reason = reason
+        self.context = None
+
+    def __bool__(self):
+        return self.found
+
+    def __repr__(self):
+        return f"Detection({self.state}, found={self.found}, confidence={self.confidence:.3f}, box={self.box})"
+
+    @property
+    def location(self):
+        """Centre of the box, the point that gets clicked"""
+        if self.box is None:
+            return None
+        x, y, w, h = self.box
+        return (x + w // 2, y + h // 2)
+
+    def record(self):
+        """Row for DETECTION_DTYPE"""
+        x, y, w, h = self.box if self.box is not None else (-1, -1, -1, -1)
+        return (self.state, self.found, self.confidence, x, y, w, h)
+
+    def to_dict(self):
+        """Logging form (flight recorder, event details); never built on the detection path"""
+        out = {"state": self.state, "found": self.found, "confidence": round(self.confidence, 4),
+               "location": self.location if self.found else None, "box": self.box}
+        for key in ("variant", "scale", "reason"):
+            value = getattr(self, key)
+            if value is not None:
+                out[key] = value
+        if self.context is not None:
+            out["scene"] = self.context.scene
+            out["full_scan"] = self.context.full_scan
+        return out
+
+
+def to_records(detections):
+    """Batch detections (e.g. one per frame) into a DETECTION_DTYPE structured array"""
+    return np.array([d.record() for d in detections], dtype=DETECTION_DTYPE)
+
+
+class FrameContext:
+    """
+    One analysed frame and what its detectors share: the gray/correlation
+    cache, the stage timer, the scene and every result found so far, so a
+    detector (or the loop) can build on another's result without recomputing it.
+    """
+
+    __slots__ = ("frame", "shared", "timer", "scene", "full_scan", "results")
+
+    def __init__(self, frame, shared, timer=None, scene=None):
+        self.frame = frame
+        self.shared = shared
+        self.timer = timer or no_timer
+        self.scene = scene
+        self.full_scan = None
+        self.results = {}
+
+    def detect(self, detector):
+        """Run detector on this frame once; later calls return the same Detection"""
+        result = self.results.get(detector.state)
+        if result is None:
+            result = detector.detect(self)
+            result.context = self
+            self.results[detector.state] = result
+        return result
+
+
+class Detector(ABC):
+    """Every detector answers detect(ctx) -> Detection for its state"""
+
+    state = None
+
+    @abstractmethod
+    def detect(self, ctx):
+        """Detection for self.state on ctx.frame (found or not, never None)"""
+
+
+class TemplateDetector(Detector):
+    """
+    One button state: colour prefilter, template match over its variants and
+    scales, then threshold and colour verification of the hit.
+    settings() returns the current (scales, threshold), so bots can retune them.
+    """
+
+    def __init__(self, state, template_set, prefilter, settings):
+        self.state = state
+        self.template_set = template_set
+        self.prefilter = prefilter
+        self.settings = settings
+
+    def detect(self, ctx):
+        scales, threshold = self.settings()
+        frame = ctx.frame
+        with ctx.timer("prefilter"):
+            allowed = self.prefilter.allows(frame, self.state, min(scales))
+        if not allowed:
+            return Detection(self.state, reason="prefilter")
+
+        with ctx.timer("convert:gray"):
+            ctx.shared.get(frame)
+        score, box, variant = self.template_set.match(frame, scales, ctx.shared, ctx.timer)
+        found = score >= threshold and self.prefilter.verify(frame, self.state, box)
+        return Detection(self.state, found, score, box, variant)
+
+
+class GiftBoxDetector(Detector):
+    """
+    The gift box after CLAIM: every scale matched in one batch against the
+    shared gray frame; a hit on the right side of the screen is preferred.
+    """
+
+    state = "GIFTBOX"
+
+    def __init__(self, template_set, prefilter, settings, right_side=GIFTBOX_RIGHT_SIDE):
+        self.template_set = template_set
+        self.prefilter = prefilter
+        self.settings = settings
+        self.right_side = right_side
+
+    def detect(self, ctx):
+        scales, threshold = self.settings()
+        frame = ctx.frame
+        with ctx.timer("prefilter"):
+            allowed = self.prefilter.allows(frame, self.state, min(scales))
+        if not allowed:
+            return Detection(self.state, reason="prefilter")
+
+        with ctx.timer("convert:gray"):
+            gray = ctx.shared.get(frame)
+        scaled = [(scale, template) for scale in scales for _, template, _ in self.template_set.scaled(scale)]
+        with ctx.timer("match:GIFTBOX"):
+            maps = ctx.shared.match_maps(gray, [template for _, template in scaled])
+
+        # (score, box, scale) of the best candidate overall and on the right side
+        floor = threshold * GIFTBOX_FLOOR
+        right_x = int(gray.shape[1] * self.right_side) + 1
+        best_any, best_right = None, None
+        for (scale, template), result in zip(scaled, maps):
+            # Skipped when the template is larger than the frame
+            if result is None:
+                continue
+            h, w = template.shape
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val >= floor and (best_any is None or max_val > best_any[0]):
+                best_any = (max_val, (max_loc[0], max_loc[1], w, h), scale)
+            if right_x < result.shape[1]:
+                _, max_val, _, max_loc = cv2.minMaxLoc(result[:, right_x:])
+                if max_val >= floor and (best_right is None or max_val > best_right[0]):
+                    best_right = (max_val, (max_loc[0] + right_x, max_loc[1], w, h), scale)
+
+        best = best_right or best_any
+        if best is None:
+            return Detection(self.state)
+        score, box, scale = best
+        found = score >= threshold and self.prefilter.verify(frame, self.state, box)
+        return Detection(self.state, found, score, box, scale=scale)
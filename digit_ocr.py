@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import sys
+import cv2
+import numpy as np
+
+GLYPH_BANK = "glyph_bank.npz"
+# Labelled numeric fields in real game frames the bank is harvested from
+GLYPH_FIELDS = "glyph_fields.json"
+# Every glyph is compared in a box of this size (w, h), scaled to fit with its aspect ratio kept
+GLYPH_SIZE = (10, 14)
+# Below this cosine score the reading is rejected rather than guessed
+GLYPH_MIN_SCORE = 0.6
+# ...and so is a glyph whose best digit beats the best other digit by less than this
+GLYPH_MIN_MARGIN = 0.05
+# Components smaller than this share of the tallest one are dots (':' or noise)
+DOT_HEIGHT_RATIO = 0.45
+# Colon dots of the small clock fonts are two pixels
+MIN_COMPONENT_AREA = 2
+# A component wider than this times its height is two touching glyphs
+WIDE_GLYPH_RATIO = 1.0
+DIGITS = "0123456789"
+
+
+def parse_roi(text):
+    return tuple(int(v) for v in text.split(","))
+
+
+def binarize(region):
+    """Otsu threshold with the glyphs as foreground (the minority of pixels)"""
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.count_nonzero(binary) > binary.size // 2:
+        binary = 255 - binary
+    return binary
+
+
+def segment(binary):
+    """
+    Split a binarised field into glyphs, left to right.
+    Returns [(x, y, w, h, kind)] where kind is 'glyph' or ':'.
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    boxes = [tuple(int(v) for v in stats[i, :4]) for i in range(1, count) if stats[i, 4] >= MIN_COMPONENT_AREA]
+    if not boxes:
+        return []
+    tallest = max(b[3] for b in boxes)
+    glyphs = [b for b in boxes if b[3] >= tallest * DOT_HEIGHT_RATIO]
+    dots = sorted((b for b in boxes if b[3] < tallest * DOT_HEIGHT_RATIO), key=lambda b: b[0])
+
+    # Components overlapping horizontally belong to one glyph (broken strokes)
+    glyphs.sort(key=lambda b: b[0])
+    merged = []
+    for x, y, w, h in split_wide(binary, glyphs):
+        if merged and x < merged[-1][0] + merged[-1][2] - 1:
+            mx, my, mw, mh, _ = merged[-1]
+            x1, y1 = max(mx + mw, x + w), max(my + mh, y + h)
+            mx, my = min(mx, x), min(my, y)
+            merged[-1] = (mx, my, x1 - mx, y1 - my, "glyph")
+        else:
+            merged.append((x, y, w, h, "glyph"))
+
+    # Two small dots stacked in the same column make a colon
+    dots = [b for b in dots if b[2] < tallest * DOT_HEIGHT_RATIO]
+    used = set()
+    for i, a in enumerate(dots):
+        for j in range(i + 1, len(dots)):
+            b = dots[j]
+            if i in used or j in used:
+                continue
+            if abs((a[0] + a[2] / 2) - (b[0] + b[2] / 2)) <= max(a[2], b[2]):
+                x0, y0 = min(a[0], b[0]), min(a[1], b[1])
+                x1, y1 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+                merged.append((x0, y0, x1 - x0, y1 - y0, ":"))
+                used.update((i, j))
+    merged.sort(key=lambda b: b[0])
+    return merged
+
+
+def split_wide(binary, boxes):
+    """Cut touching glyphs at the emptiest column near the middle of an over-wide component"""
+    out = []
+    pending = list(boxes)
+    while pending:
+        x, y, w, h = pending.pop(0)
+        if w <= h * WIDE_GLYPH_RATIO or w < 4:
+            out.append((x, y, w, h))
+            continue
+        columns = np.count_nonzero(binary[y:y + h, x:x + w], axis=0)
+        lo, hi = w // 4, w - w // 4
+        cut = lo + int(np.argmin(columns[lo:hi]))
+        pending[:0] = [(x, y, cut, h), (x + cut, y, w - cut, h)]
+    return out
+
+
+def glyph_image(binary, box):
+    """One glyph scaled to fit GLYPH_SIZE without stretching, centred on an empty canvas"""
+    w, h = GLYPH_SIZE
+    x, y, bw, bh = box[:4]
+    scale = min(w / bw, h / bh)
+    gw, gh = max(1, min(w, int(round(bw * scale)))), max(1, min(h, int(round(bh * scale))))
+    canvas = np.zeros((h, w), np.uint8)
+    ox, oy = (w - gw) // 2, (h - gh) // 2
+    canvas[oy:oy + gh, ox:ox + gw] = cv2.resize(binary[y:y + bh, x:x + bw], (gw, gh), interpolation=cv2.INTER_AREA)
+    return canvas
+
+
+def glyph_vectors(binary, boxes):
+    """Normalised (zero-mean, unit-norm) vectors for the glyph boxes, one row each"""
+    w, h = GLYPH_SIZE
+    rows = [glyph_image(binary, box) for box in boxes if box[4] == "glyph"]
+    if not rows:
+        return np.zeros((0, w * h), np.float32)
+    vectors = np.asarray(rows, np.float32).reshape(len(rows), -1)
+    vectors -= vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+def rendered_glyphs(labels=DIGITS):
+    """Digits drawn with OpenCV's fonts, a stand-in for labels missing from the harvested bank"""
+    vectors, names = [], []
+    for font in (cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX):
+        for thickness in (1, 2):
+            for label in labels:
+                canvas = np.zeros((40, 30), np.uint8)
+                cv2.putText(canvas, label, (4, 32), font, 1.0, 255, thickness)
+                boxes = segment(canvas)
+                if len(boxes) == 1:
+                    vectors.append(glyph_vectors(canvas, boxes)[0])
+                    names.append(label)
+    return np.asarray(vectors, np.float32), names
+
+
+class GlyphBank:
+    """
+    Labelled glyph vectors, kept sorted by label; classification is one
+    matrix product and a per-label maximum.
+    """
+
+    def __init__(self, vectors=None, labels=None):
+        w, h = GLYPH_SIZE
+        self.vectors = np.asarray(vectors, np.float32) if vectors is not None and len(vectors) else np.zeros((0, w * h), np.float32)
+        self.labels = np.asarray(list(labels or []))
+        self.sort()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def sort(self):
+        order = np.argsort(self.labels, kind="stable")
+        self.vectors, self.labels = self.vectors[order], self.labels[order]
+        self.names, self.starts = np.unique(self.labels, return_index=True)
+
+    def add(self, vectors, labels):
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.labels = np.concatenate([self.labels, np.asarray(list(labels))])
+        self.sort()
+
+    def harvest(self, frame, roi, text):
+        """Add the glyphs of a field whose true text is known; returns how many were added"""
+        binary = binarize(crop(frame, roi))
+        boxes = [b for b in segment(binary) if b[4] == "glyph"]
+        chars = [c for c in text if c.isdigit()]
+        if len(boxes) != len(chars):
+            raise ValueError(f"found {len(boxes)} glyphs for '{text}'")
+        self.add(glyph_vectors(binary, boxes), chars)
+        return len(chars)
+
+    def classify(self, vectors):
+        """
+        Return (labels, scores, margins) for each row of vectors; the margin is
+        how far the best label's score is above the best score of any other label.
+        """
+        per_label = np.maximum.reduceat(vectors @ self.vectors.T, self.starts, axis=1)
+        best = per_label.argmax(axis=1)
+        rows = np.arange(len(best))
+        scores = per_label[rows, best]
+        if per_label.shape[1] < 2:
+            return self.names[best], scores, np.full(len(best), np.inf)
+        runner_up = np.partition(per_label, -2, axis=1)[:, -2]
+        return self.names[best], scores, scores - runner_up
+
+    def save(self, path=GLYPH_BANK):
+        np.savez_compressed(path, vectors=self.vectors, labels=self.labels)
+
+    @classmethod
+    def load(cls, path=GLYPH_BANK):
+        data = np.load(path)
+        return cls(data["vectors"], [str(v) for v in data["labels"]])
+
+    @classmethod
+    def from_fields(cls, fields, skip=None):
+        """Harvest every labelled field (see load_fields) except the one at index skip"""
+        bank = cls()
+        frames = {}
+        for i, field in enumerate(fields):
+            if i == skip:
+                continue
+            frame = frames.get(field["frame"])
+            if frame is None:
+                frame = frames[field["frame"]] = cv2.imread(field["path"])
+            bank.harvest(frame, tuple(field["roi"]), field["text"])
+        return bank
+
+    @classmethod
+    def default(cls):
+        """Harvested bank if present, topped up with rendered glyphs for any missing digit"""
+        bank = cls.load(GLYPH_BANK) if os.path.exists(GLYPH_BANK) else cls()
+        missing = [d for d in DIGITS if d not in set(bank.labels.tolist())]
+        if missing:
+            vectors, labels = rendered_glyphs(missing)
+            if len(labels):
+                bank.add(vectors, labels)
+        return bank
+
+
+_default_bank = None
+
+
+def default_bank():
+    global _default_bank
+    if _default_bank is None:
+        _default_bank = GlyphBank.default()
+    return _default_bank
+
+
+def crop(frame, roi):
+    if roi is None:
+        return frame
+    x, y, w, h = roi
+    return frame[max(0, y):y + h, max(0, x):x + w]
+
+
+def load_fields(path=GLYPH_FIELDS):
+    """Labelled fields [{frame, roi, text, field}], each with the frame's path resolved next to the file"""
+    with open(path) as f:
+        fields = json.load(f)["fields"]
+    base = os.path.dirname(os.path.abspath(path))
+    for field in fields:
+        field["path"] = os.path.join(base, field["frame"])
+    return fields
+
+
+def check_fields(fields):
+    """
+    Leave-one-out check: read each field with a bank harvested from all the
+    others. Returns [(field, text read or None)].
+    """
+    results = []
+    frames = {}
+    for i, field in enumerate(fields):
+        frame = frames.get(field["frame"])
+        if frame is None:
+            frame = frames[field["frame"]] = cv2.imread(field["path"])
+        bank = GlyphBank.from_fields(fields, skip=i)
+        results.append((field, read_digits(frame, tuple(field["roi"]), bank)))
+    return results
+
+
+def read_digits(frame, roi=None, bank=None, min_score=GLYPH_MIN_SCORE, min_margin=GLYPH_MIN_MARGIN):
+    """Text of a fixed-font numeric field (digits and ':'), or None when any glyph is uncertain"""
+    bank = bank or default_bank()
+    region = crop(frame, roi)
+    if region is None or not region.size or not len(bank):
+        return None
+    binary = binarize(region)
+    boxes = segment(binary)
+    if not boxes:
+        return None
+    vectors = glyph_vectors(binary, boxes)
+    if len(vectors):
+        labels, scores, margins = bank.classify(vectors)
+        if scores.min() < min_score or margins.min() < min_margin:
+            return None
+    else:
+        labels = []
+    chars = iter(labels)
+    return "".join(next(chars) if kind == "glyph" else ":" for *_, kind in boxes)
+
+
+def read_number(frame, roi=None, bank=None, min_score=GLYPH_MIN_SCORE, min_margin=GLYPH_MIN_MARGIN):
+    """Integer value of a numeric field (separators ignored), or None"""
+    text = read_digits(frame, roi, bank, min_score, min_margin)
+    digits = "".join(c for c in text or "" if c.isdigit())
+    return int(digits) if digits else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harvest or test the glyph bank for numeric fields")
+    parser.add_argument("image", nargs="?", help="Screenshot to read from")
+    parser.add_argument("--roi", action="append", type=parse_roi, help="Field region X,Y,W,H (repeatable)")
+    parser.add_argument("--harvest", nargs="*", help="True text of each --roi; adds its glyphs to the bank")
+    parser.add_argument("--bank", default=GLYPH_BANK)
+    parser.add_argument("--fields", default=GLYPH_FIELDS, help="Labelled fields for --build and --check")
+    parser.add_argument("--build", action="store_true", help="Rebuild the bank from every labelled field")
+    parser.add_argument("--check", action="store_true", help="Read every labelled field with a bank built from the others")
+    args = parser.parse_args()
+
+    if args.build or args.check:
+        fields = load_fields(args.fields)
+        if args.build:
+            bank = GlyphBank.from_fields(fields)
+            bank.save(args.bank)
+            counts = {str(name): int(n) for name, n in zip(*np.unique(bank.labels, return_counts=True))}
+            print(f"✅ Glyph bank: {len(bank)} glyphs from {len(fields)} fields in {args.bank}: {counts}")
+        if args.check:
+            results = check_fields(fields)
+            correct = sum(text == field["text"] for field, text in results)
+            rejected = sum(text is None for _, text in results)
+            for field, text in results:
+                mark = "✅" if text == field["text"] else ("⏸️" if text is None else "❌")
+                print(f"   {mark} {field['frame']:<18} {field['field']:<12} {field['text']:>6} -> {text!r}")
+            print(f"📊 Leave-one-out: {correct}/{len(results)} exact, {rejected} rejected, "
+                  f"{len(results) - correct - rejected} misread")
+            if correct + rejected < len(results):
+                sys.exit(1)
+        return
+
+    if not args.image or not args.roi:
+        parser.error("an image and at least one --roi are needed (or --build / --check)")
+    frame = cv2.imread(args.image)
+    if frame is None:
+        print(f"❌ Could not load image: {args.image}")
+        sys.exit(2)
+
+    if args.harvest is not None:
+        if len(args.harvest) != len(args.roi):
+            print("❌ Give one text per --roi")
+            sys.exit(2)
+        bank = GlyphBank.load(args.bank) if os.path.exists(args.bank) else GlyphBank()
+        for roi, text in zip(args.roi, args.harvest):
+            try:
+                print(f"   ➕ {text}: {bank.harvest(frame, roi, text)} glyphs")
+            except ValueError as e:
+                print(f"   ⚠️ {text}: {e}")
+        bank.save(args.bank)
+        print(f"✅ Glyph bank: {len(bank)} glyphs ({''.join(sorted(set(bank.labels.tolist())))}) in {args.bank}")
+        return
+
+    bank = GlyphBank.load(args.bank) if os.path.exists(args.bank) else GlyphBank.default()
+    for roi in args.roi:
+        print(f"   {roi}: {read_digits(frame, roi, bank)!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+import numpy as np
+
+EVENT_LOG_FOLDER = "event_logs"
+EVENT_LOG_MAX_BYTES = 10 * 1024 * 1024
+EVENT_LOG_BACKUPS = 5
+EVENT_QUEUE_SIZE = 4096
+
+
+def _json_default(value):
+    """Serialise numpy scalars/arrays found in detection results"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def stage_durations_ms(durations):
+    """Seconds per stage -> rounded milliseconds for the log"""
+    return {stage: round(seconds * 1000, 3) for stage, seconds in durations.items()}
+
+
+class EventLog:
+    """
+    Structured JSONL log of detections, actions, transitions, waits and errors.
+    emit() only puts a dict on a queue; a background thread serialises the
+    events and appends them to size-rotated files (events.jsonl, .1, .2 ...).
+    When the queue is full the event is dropped and counted.
+    """
+
+    def __init__(self, path, instance=None, max_bytes=EVENT_LOG_MAX_BYTES, backups=EVENT_LOG_BACKUPS,
+                 queue_size=EVENT_QUEUE_SIZE):
+        self.path = path
+        self.instance = instance
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.seq = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.file = None
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self.thread.start()
+
+    def emit(self, event_type, **fields):
+        """Queue one event; never blocks the caller"""
+        self.seq += 1
+        event = {"seq": self.seq, "type": event_type, "t": time.monotonic(), "wall": time.time()}
+        if self.instance:
+            event["instance"] = self.instance
+        event.update(fields)
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Drain whatever else is waiting so bursts become one write
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                lines = [json.dumps(e, ensure_ascii=False, default=_json_default) for e in batch if e is not None]
+                if lines:
+                    self._write(lines)
+            except Exception as e:
+                print(f"⚠️ Event log write failed: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                if self.file:
+                    self.file.close()
+                    self.file = None
+                return
+
+    def _write(self, lines):
+        if self.file is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self.file = open(self.path, "ab")
+        size = self.file.tell()
+        chunk = []
+        for line in lines:
+            data = (line + "\n").encode("utf-8")
+            if size and size + len(data) > self.max_bytes:
+                self.file.write(b"".join(chunk))
+                self._rotate()
+                chunk, size = [], 0
+            chunk.append(data)
+            size += len(data)
+            self.written += 1
+        self.file.write(b"".join(chunk))
+        self.file.flush()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.unlink(self.path)
+        self.file = open(self.path, "ab")
+        self.rotations += 1
+
+    def flush(self):
+        """Block until every queued event is on disk"""
+        self.queue.join()
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        self.flush()
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+        }
+
+
+def default_event_log_path(bot_name, instance):
+    """One file per instance, so bots running side by side never share (or rotate) a log"""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", str(instance))
+    return os.path.join(EVENT_LOG_FOLDER, f"{bot_name}_{safe}_events.jsonl")
+
+
+def add_event_log_arguments(parser):
+    """Shared CLI flags for both bots"""
+    parser.add_argument("--event-log", help=f"JSONL event log path (default: {EVENT_LOG_FOLDER}/<bot>_<instance>_events.jsonl)")
+    parser.add_argument("--event-log-max-mb", type=float, default=EVENT_LOG_MAX_BYTES / (1024 * 1024),
+                        help="Rotate the event log after this many MB")
+    parser.add_argument("--event-log-backups", type=int, default=EVENT_LOG_BACKUPS,
+                        help="Rotated event log files to keep")
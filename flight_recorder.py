@@ -0,0 +1,138 @@
+import json
+import queue
+import time
+from collections import deque
+from datetime import datetime
+import cv2
+import numpy as np
+from buffer_pool import BufferPool
+
+FLIGHT_RECORDER_FRAMES = 60
+FLIGHT_RECORDER_SCALE = 0.5
+FLIGHT_RECORDER_QUALITY = 70
+# Downscaled frames waiting for the writer thread to encode them; a frame
+# recorded while all are busy keeps its metadata but no image
+FLIGHT_RECORDER_STAGING = 4
+
+
+def _jsonable(value):
+    """Convert detection results (Detections, tuples, numpy scalars) to JSON friendly values"""
+    if hasattr(value, "to_dict"):
+        return _jsonable(value.to_dict())
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class FlightRecorder:
+    """
+    Keep the last N frames in memory as small compressed images (the
+    writer's format, JPEG by default) with their detection results. Frames
+    are downscaled into a few pooled staging buffers on the loop thread and
+    encoded on the writer thread. Nothing touches the disk until dump() is
+    called on a failure.
+    """
+
+    def __init__(self, writer, capacity=FLIGHT_RECORDER_FRAMES, scale=FLIGHT_RECORDER_SCALE,
+                 quality=FLIGHT_RECORDER_QUALITY, pool=None, staging=FLIGHT_RECORDER_STAGING):
+        self.writer = writer
+        self.pool = pool or BufferPool()
+        self.scale = scale
+        self.quality = quality
+        self.frames = deque(maxlen=capacity)
+        self.free_slots = queue.SimpleQueue()
+        for slot in range(staging):
+            self.free_slots.put(slot)
+        self.dumps = 0
+        self.unencoded = 0
+
+    def record(self, frame, detection=None, **extra):
+        """Add a frame to the ring buffer; its image is encoded in the background"""
+        if frame is None:
+            return
+        entry = {
+            "time": time.time(),
+            "monotonic": time.monotonic(),
+            "detection": _jsonable(detection) if detection is not None else None,
+            "events": [],
+            "image": None,
+        }
+        entry.update(_jsonable(extra))
+        self.frames.append(entry)
+
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            self.unencoded += 1
+            return
+        h, w = frame.shape[:2]
+        size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        staged = self.pool.get(f"flight:staging{slot}", (size[1], size[0]) + frame.shape[2:])
+        if self.scale != 1.0:
+            cv2.resize(frame, size, dst=staged, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(staged, frame)
+
+        def done(data):
+            entry["image"] = data
+            self.free_slots.put(slot)
+
+        if self.writer.submit_encode(staged, done, self.quality):
+            # The encoded image stays in the ring buffer (written as is on dump), so it is counted, not pooled
+            self.pool.count("flight:image")
+        else:
+            self.free_slots.put(slot)
+            self.unencoded += 1
+
+    def note(self, event, **fields):
+        """Attach an event (click, wait, error...) to the most recent frame"""
+        if not self.frames:
+            return
+        fields = _jsonable(fields)
+        fields["event"] = event
+        fields["monotonic"] = time.monotonic()
+        self.frames[-1]["events"].append(fields)
+
+    def dump(self, reason):
+        """
+        Hand the buffered frames and a JSON sidecar to the artifact writer.
+        Returns the dump folder (relative to the writer folder) or None if empty.
+        """
+        if not self.frames:
+            return None
+        frames = list(self.frames)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        folder = f"flight_{timestamp}_{reason}"
+        extension = self.writer.image_format
+
+        def files():
+            # Runs on the writer thread after the encodes queued before the dump
+            sidecar = {
+                "reason": reason,
+                "created": timestamp,
+                "scale": self.scale,
+                "frames": [],
+            }
+            out = []
+            for i, entry in enumerate(frames):
+                meta = {k: v for k, v in entry.items() if k != "image"}
+                meta["file"] = None
+                if entry["image"] is not None:
+                    meta["file"] = f"{i:03d}.{extension}"
+                    out.append((f"{folder}/{meta['file']}", entry["image"]))
+                sidecar["frames"].append(meta)
+            out.append((f"{folder}/recording.json", json.dumps(sidecar, indent=2).encode("utf-8")))
+            return out
+
+        if not self.writer.submit_files(files):
+            return None
+        self.dumps += 1
+        return folder
@@ -0,0 +1,71 @@
+import cv2
+from buffer_pool import BufferPool
+
+# Working width every captured frame is resized to; the height follows the
+# frame's aspect ratio so buttons keep their shape
+CANONICAL_WIDTH = 1920
+# Width of the screenshots the template images were cut from
+TEMPLATE_REFERENCE_WIDTH = 1920
+
+
+def scale_templates(templates, canonical_width=CANONICAL_WIDTH, reference_width=TEMPLATE_REFERENCE_WIDTH):
+    """Resize {name: image} templates once from their reference width to canonical space"""
+    factor = canonical_width / reference_width
+    if factor == 1.0:
+        return templates
+    interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_LINEAR
+    return {name: img if img is None else cv2.resize(img, None, fx=factor, fy=factor, interpolation=interpolation)
+            for name, img in templates.items()}
+
+
+class FrameTransform:
+    """
+    Maps captured frames into canonical space and detection coordinates back
+    to captured (canvas) pixels. apply() records the size of the last frame,
+    so the click and drag helpers always map with the frame they came from.
+    """
+
+    def __init__(self, canonical_width=CANONICAL_WIDTH, pool=None):
+        self.canonical_width = canonical_width
+        self.pool = pool or BufferPool()
+        self.frame_size = None
+        self.scale = 1.0
+
+    def apply(self, frame):
+        """Resize a captured frame to canonical width (no copy when it already is)"""
+        if frame is None:
+            return None
+        h, w = frame.shape[:2]
+        self.frame_size = (w, h)
+        self.scale = self.canonical_width / w
+        if w == self.canonical_width:
+            return frame
+        size = (self.canonical_width, max(1, int(round(h * self.scale))))
+        # INTER_AREA is ~5x slower at non-integer ratios like 1440p -> 1080p;
+        # linear is enough until the frame shrinks by more than half
+        interpolation = cv2.INTER_AREA if self.scale < 0.5 else cv2.INTER_LINEAR
+        # Not a pool buffer: click verification crops and queued debug images
+        # still hold the frame after the next capture
+        self.pool.count("canonical")
+        return cv2.resize(frame, size, interpolation=interpolation)
+
+    def to_frame(self, x, y):
+        """Canonical point -> captured frame pixels"""
+        return int(round(x / self.scale)), int(round(y / self.scale))
+
+    def to_canonical(self, x, y):
+        """Captured frame pixels -> canonical point"""
+        return int(round(x * self.scale)), int(round(y * self.scale))
+
+    def points_to_frame(self, points):
+        return [self.to_frame(x, y) for x, y in points]
+
+    def box_to_frame(self, box):
+        """Canonical (x, y, w, h) -> captured frame pixels"""
+        x, y, w, h = box
+        return (int(round(x / self.scale)), int(round(y / self.scale)),
+                int(round(w / self.scale)), int(round(h / self.scale)))
+
+    def snapshot(self):
+        return {"frame_size": self.frame_size, "canonical_width": self.canonical_width,
+                "scale": round(self.scale, 4)}
@@ -12,6 +12,24 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import threading
 import argparse
+import json
+from colour_prefilter import ColourPrefilter
+from correlation_engine import add_match_arguments, create_matcher
+from buffer_pool import BufferPool
+from template_sets import SharedGray, TemplateSet, load_template_sets
+from detectors import Detection, FrameContext, TemplateDetector, GiftBoxDetector
+from frame_transform import FrameTransform, scale_templates
+from coordinate_calibration import CoordinateCalibration
+from action_scheduler import ActionScheduler, ACTION_COOLDOWNS
+from gift_scheduler import GiftScheduler, parse_countdown, read_countdown_text
+from scene_classifier import SceneClassifier, GIFT_SCENE_BUTTONS, SCENE_RESYNC_FRAMES, restrict_to_scene
+from detection_config import BUTTON_SCALES, BUTTON_THRESHOLD, GIFTBOX_SCALES, GIFTBOX_THRESHOLD
+from adaptive_polling import AdaptivePollScheduler, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_DECAY
+from debug_artifacts import DebugArtifactWriter
+from flight_recorder import FlightRecorder
+from event_log import EventLog, add_event_log_arguments, default_event_log_path, stage_durations_ms
+from tick_profiler import TickProfiler, PROFILE_TICKS
+from perf_metrics import MetricsRegistry, InstrumentedDriver, add_metrics_arguments, start_metrics_export, default_instance_name
 
 BUTTON_TEMPLATES = {
     "CLAIM": "claim_button_template.png",
@@ -20,22 +38,69 @@ BUTTON_TEMPLATES = {
     "GIFTBOX": "gift_box_template.png"
 }
 
-GIFTBOX_THRESHOLD = 0.5
-BUTTON_THRESHOLD = 0.7
 CLICK_COOLDOWN = 10
 DRAG_DELAY = 0.1
+# Control-command poll period while waiting for the next gift
+GIFT_IDLE_POLL = 1.0
+# Longest wait between control-command polls while waiting for the next capture
+COMMAND_POLL_INTERVAL = 0.5
+# Points kept (roughly) when sampling a path contour for the drag
+PATH_SAMPLES = 20
+# Buttons checked on every analysed frame, in click order
+GIFT_BUTTON_ORDER = ["CLAIM", "AGREE", "BACK"]
+
+
+def sampled_path(contour, offset_x, offset_y, samples=PATH_SAMPLES):
+    """Contour points sorted left to right, thinned to ~samples and offset: int32 (N, 2)"""
+    points = contour.reshape(-1, 2)
+    points = points[np.argsort(points[:, 0], kind="stable")]
+    points = points[::max(1, len(points) // samples)].astype(np.int32)
+    points += (offset_x, offset_y)
+    return points
 
 
 class BalootGiftBoxAutomation:
-    def __init__(self):
-        self.setup_chrome()
+    def __init__(self, driver=None, instance=None, event_log=None):
+        self.metrics = MetricsRegistry(instance)
+        if driver is None:
+            self.setup_chrome()
+        else:
+            self.driver = driver
+        self.driver = InstrumentedDriver(self.driver, self.metrics)
+        self.buffer_pool = BufferPool()
+        self.frame_transform = FrameTransform(pool=self.buffer_pool)
+        self.calibration = CoordinateCalibration(self.driver)
         self.load_templates()
-        self.last_claim_time = 0
+        self.template_sets = load_template_sets(BUTTON_TEMPLATES, states=[b for b in self.templates if b != "GIFTBOX"])
+        self.giftbox_set = TemplateSet("GIFTBOX", [(BUTTON_TEMPLATES["GIFTBOX"], self.templates["GIFTBOX"])]) \
+            if "GIFTBOX" in self.templates else None
+        self.shared_gray = SharedGray(pool=self.buffer_pool)
+        self.button_threshold = BUTTON_THRESHOLD
+        self.button_scales = list(BUTTON_SCALES)
+        self.giftbox_threshold = GIFTBOX_THRESHOLD
+        self.giftbox_scales = list(GIFTBOX_SCALES)
+        self.scene_classifier = SceneClassifier.default(pool=self.buffer_pool)
+        self.colour_prefilter = ColourPrefilter(self.colour_templates, pool=self.buffer_pool)
+        self.detectors = {
+            name: TemplateDetector(name, template_set, self.colour_prefilter,
+                                   lambda: (self.button_scales, self.button_threshold))
+            for name, template_set in self.template_sets.items()
+        }
+        self.giftbox_detector = GiftBoxDetector(self.giftbox_set, self.colour_prefilter,
+                                                lambda: (self.giftbox_scales, self.giftbox_threshold)) \
+            if self.giftbox_set else None
+        self.action_scheduler = ActionScheduler(dict(ACTION_COOLDOWNS, CLAIM=CLICK_COOLDOWN))
+        self.gift_scheduler = GiftScheduler()
         self.running = False
         self.debug_folder = "giftbox_debug"
         os.makedirs(self.debug_folder, exist_ok=True)
+        self.debug_writer = DebugArtifactWriter(self.debug_folder)
+        self.flight_recorder = FlightRecorder(self.debug_writer, pool=self.buffer_pool)
+        self.profiler = TickProfiler(self.debug_writer)
+        self.event_log = event_log or EventLog(default_event_log_path("gift", self.metrics.instance), self.metrics.instance)
         self.canvas = None
         self.panel_injected = False
+        self.poll_scheduler = AdaptivePollScheduler(pool=self.buffer_pool)
 
     def setup_chrome(self):
         options = Options()
@@ -52,162 +117,96 @@ class BalootGiftBoxAutomation:
 
     def load_templates(self):
         self.templates = {}
+        self.colour_templates = {}
         for key, path in BUTTON_TEMPLATES.items():
             if os.path.exists(path):
                 img = cv2.imread(path, cv2.IMREAD_COLOR)
                 if img is not None:
+                    self.colour_templates[key] = img
                     self.templates[key] = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
                     print(f"✅ Loaded template: {key}")
                 else:
                     print(f"❌ Failed to load image: {path}")
             else:
                 print(f"⚠️ Template missing: {path}")
+        self.templates = scale_templates(self.templates)
+        # The colour prefilter needs the BGR originals
+        self.colour_templates = scale_templates(self.colour_templates)
 
-    def take_screenshot(self):
-        path = f"{self.debug_folder}/screen_{int(time.time())}.png"
+    def capture_frame(self):
+        """Grab the viewport as a BGR image in canonical frame space without touching the disk"""
         try:
-            self.driver.save_screenshot(path)
-            return path
+            with self.metrics.time("capture"):
+                png = self.driver.get_screenshot_as_png()
+            with self.metrics.time("decode"):
+                frame = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+            # imdecode has no dst=; at canonical width this array is the frame itself
+            self.buffer_pool.count("decoded")
+            with self.metrics.time("convert:canonical"):
+                return self.frame_transform.apply(frame)
         except Exception as e:
             print(f"Screenshot failed: {e}")
             return None
-    
-    def cleanup_screenshot(self, screenshot_path):
-        """Delete screenshot after use"""
-        try:
-            if screenshot_path and os.path.exists(screenshot_path):
-                os.remove(screenshot_path)
-        except Exception as e:
-            print(f"⚠️ Failed to delete screenshot: {e}")
 
-    def detect_button(self, screenshot_path, btn_name):
-        """Detect button using template matching"""
-        if btn_name not in self.templates:
-            return None
-        if not os.path.exists(screenshot_path):
+    def load_screenshot(self, screenshot):
+        """Accept a screenshot path or an already decoded BGR image"""
+        if isinstance(screenshot, np.ndarray):
+            return screenshot
+        if not screenshot or not os.path.exists(screenshot):
             return None
+        return cv2.imread(screenshot)
 
-        screenshot = cv2.imread(screenshot_path)
+    def frame_context(self, screenshot):
+        """FrameContext for a screenshot path or BGR image (an existing context is returned as is)"""
+        if isinstance(screenshot, FrameContext):
+            return screenshot
+        screenshot = self.load_screenshot(screenshot)
         if screenshot is None:
             return None
+        return FrameContext(screenshot, self.shared_gray, self.metrics.time)
 
-        gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
-        template = self.templates[btn_name]
-        h, w = template.shape
-
-        result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
-        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    def detect_button(self, screenshot, btn_name):
+        """Detect button using template matching; accepts a screenshot or the frame's FrameContext"""
+        if btn_name not in self.detectors:
+            return Detection(btn_name)
 
-        if max_val >= BUTTON_THRESHOLD:
-            center_x = max_loc[0] + w // 2
-            center_y = max_loc[1] + h // 2
-            return {"x": center_x, "y": center_y, "confidence": max_val}
-        return None
+        ctx = self.frame_context(screenshot)
+        if ctx is None:
+            return Detection(btn_name, reason="Screenshot failed")
+        return ctx.detect(self.detectors[btn_name])
 
-    def detect_giftbox(self, screenshot_path):
+    def detect_giftbox(self, screenshot):
         """
         Detect gift box using multi-scale template matching
-        Returns dict with location info or None
+        Returns a Detection (box, confidence, scale), truthy when found
         """
-        if "GIFTBOX" not in self.templates:
+        if self.giftbox_detector is None:
             print("⚠️ Gift box template not loaded")
-            return None
-
-        screenshot = cv2.imread(screenshot_path)
-        if screenshot is None:
-            return None
-
-        gray_screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
-        gray_template = self.templates["GIFTBOX"]
-        
-        template_h, template_w = gray_template.shape
-        screen_height, screen_width = gray_screenshot.shape
-
-        # Try multiple scales
-        scales = [0.8, 0.9, 1.0, 1.1, 1.2]
-        all_matches = []
-
-        for scale in scales:
-            if scale != 1.0:
-                new_w = int(template_w * scale)
-                new_h = int(template_h * scale)
-                resized_template = cv2.resize(gray_template, (new_w, new_h))
-            else:
-                resized_template = gray_template
-                new_w, new_h = template_w, template_h
-
-            # Skip if template is larger than screenshot
-            if new_h > screen_height or new_w > screen_width:
-                continue
-
-            # Template matching
-            result = cv2.matchTemplate(gray_screenshot, resized_template, cv2.TM_CCOEFF_NORMED)
-            threshold_map = result >= (GIFTBOX_THRESHOLD * 0.8)
-            locations = np.where(threshold_map)
-
-            for pt in zip(*locations[::-1]):
-                confidence = result[pt[1], pt[0]]
-                all_matches.append({
-                    'location': pt,
-                    'confidence': confidence,
-                    'scale': scale,
-                    'width': new_w,
-                    'height': new_h
-                })
-
-        if not all_matches:
-            return None
-
-        # Sort by confidence
-        all_matches.sort(key=lambda x: x['confidence'], reverse=True)
-
-        # Filter: must be on right side of screen
-        right_side_matches = [m for m in all_matches if m['location'][0] > screen_width * 0.6]
-
-        if not right_side_matches:
-            right_side_matches = all_matches
-
-        best_match = right_side_matches[0]
+            return Detection("GIFTBOX")
 
-        if best_match['confidence'] >= GIFTBOX_THRESHOLD:
-            loc = best_match['location']
-            w = best_match['width']
-            h = best_match['height']
+        ctx = self.frame_context(screenshot)
+        if ctx is None:
+            return Detection("GIFTBOX", reason="Screenshot failed")
+        giftbox = ctx.detect(self.giftbox_detector)
+        if giftbox:
+            print(f"🎁 Gift box found! Confidence: {giftbox.confidence:.3f}, Scale: {giftbox.scale:.1f}x")
+        return giftbox
 
-            top_left = loc
-            bottom_right = (top_left[0] + w, top_left[1] + h)
-            center = (top_left[0] + w // 2, top_left[1] + h // 2)
-
-            print(f"🎁 Gift box found! Confidence: {best_match['confidence']:.3f}, Scale: {best_match['scale']:.1f}x")
-            
-            return {
-                "found": True,
-                "confidence": best_match['confidence'],
-                "top_left": top_left,
-                "bottom_right": bottom_right,
-                "center": center,
-                "width": w,
-                "height": h,
-                "scale": best_match['scale']
-            }
-        
-        return None
-
-    def detect_path_in_giftbox(self, screenshot_path, giftbox_info):
+    def detect_path_in_giftbox(self, screenshot, giftbox_info):
         """
-        Detect the path inside the gift box area
-        Returns list of path points for dragging
+        Detect the path inside the gift box area (a found GIFTBOX Detection)
+        Returns an int32 (N, 2) array of path points for dragging, or None
         """
-        if not giftbox_info or not giftbox_info["found"]:
+        if not giftbox_info:
             return None
 
-        screenshot = cv2.imread(screenshot_path)
+        screenshot = self.load_screenshot(screenshot.frame if isinstance(screenshot, FrameContext) else screenshot)
         if screenshot is None:
             return None
 
         # Get original boundaries
-        orig_x1, orig_y1 = giftbox_info["top_left"]
-        orig_x2, orig_y2 = giftbox_info["bottom_right"]
+        orig_x1, orig_y1, box_w, box_h = giftbox_info.box
+        orig_x2, orig_y2 = orig_x1 + box_w, orig_y1 + box_h
 
         # Adjust boundaries: move down 100px, up 50px
         x1 = orig_x1
@@ -250,19 +249,12 @@ class BalootGiftBoxAutomation:
             print("⚠️ Path too small, trying HSV fallback...")
             return self._detect_path_hsv_fallback(roi, x1, y1)
 
-        # Extract and sort points
-        points = [tuple(pt[0]) for pt in contour]
-        points_sorted = sorted(points, key=lambda p: p[0])
-
-        # Sample points for smooth dragging
-        sample_rate = max(1, len(points_sorted) // 20)
-        sampled_points = points_sorted[::sample_rate]
-
-        # Convert to global coordinates
-        global_points = [(p[0] + x1, p[1] + y1) for p in sampled_points]
+        # Sort points left to right, sample them for smooth dragging and
+        # convert to global coordinates
+        global_points = sampled_path(contour, x1, y1)
 
         print(f"🛤️ Path detected: {len(global_points)} points")
-        print(f"   Start: {global_points[0]}, End: {global_points[-1]}")
+        print(f"   Start: {tuple(global_points[0])}, End: {tuple(global_points[-1])}")
 
         return global_points
 
@@ -287,21 +279,28 @@ class BalootGiftBoxAutomation:
             return None
 
         contour = max(contours, key=cv2.contourArea)
-        points = [tuple(pt[0]) for pt in contour]
-        points_sorted = sorted(points, key=lambda p: p[0])
-
-        sample_rate = max(1, len(points_sorted) // 20)
-        sampled_points = points_sorted[::sample_rate]
-        global_points = [(p[0] + offset_x, p[1] + offset_y) for p in sampled_points]
+        global_points = sampled_path(contour, offset_x, offset_y)
 
         print(f"✅ HSV fallback found {len(global_points)} points")
         return global_points
 
+    def check_calibration(self):
+        """Re-measure the page mapping if the window moved, resized or the capture size changed"""
+        try:
+            if self.calibration.check(self.frame_transform.frame_size):
+                snapshot = self.calibration.snapshot()
+                self.event_log.emit("calibration", **snapshot)
+                print(f"📐 Calibrated ({snapshot['source']}): {snapshot['frame_per_css']} frame px per CSS px")
+        except Exception as e:
+            self.event_log.emit("error", where="calibration", message=str(e))
+
     def perform_drag_on_path(self, path_points):
-        """Drag mouse along the detected path"""
-        if not path_points or len(path_points) < 2:
+        """Drag mouse along the detected path (points in canonical frame space)"""
+        if path_points is None or len(path_points) < 2:
             print("⚠️ Not enough path points to drag")
             return False
+        self.check_calibration()
+        path_points = [self.calibration.to_client(x, y) for x, y in self.frame_transform.points_to_frame(path_points)]
 
         start_pt = path_points[0]
         end_pt = path_points[-1]
@@ -343,18 +342,27 @@ class BalootGiftBoxAutomation:
                 });
                 canvas.dispatchEvent(evtMove);
             }, %d);
-            """ % (str(path_points), int(DRAG_DELAY * 1000))
+            """ % (json.dumps([[int(x), int(y)] for x, y in path_points]), int(DRAG_DELAY * 1000))
 
+            drag_start = time.perf_counter()
             self.driver.execute_script(script)
+            drag_seconds = time.perf_counter() - drag_start
+            self.metrics.observe("drag", drag_seconds)
+            self.metrics.inc("drags")
+            self.event_log.emit("action", action="drag", start=start_pt, end=end_pt, points=len(path_points),
+                                drag_ms=round(drag_seconds * 1000, 3))
             print(f"🖱️ Dragged along path from {start_pt} to {end_pt}")
             return True
 
         except Exception as e:
             print(f"❌ Drag error: {e}")
+            self.event_log.emit("error", where="drag", message=str(e))
             return False
 
     def click_at(self, x, y):
-        """Click at coordinates using PointerEvent"""
+        """Click at canonical frame coordinates using PointerEvent"""
+        self.check_calibration()
+        x, y = self.calibration.to_client(*self.frame_transform.to_frame(x, y))
         try:
             script = """
             var canvas = document.getElementById('unity-canvas');
@@ -367,11 +375,17 @@ class BalootGiftBoxAutomation:
             });
             canvas.dispatchEvent(evt);
             """ % (x, y)
+            click_start = time.perf_counter()
             self.driver.execute_script(script)
+            click_seconds = time.perf_counter() - click_start
+            self.metrics.observe("click", click_seconds)
+            self.metrics.inc("clicks")
+            self.event_log.emit("action", action="click", x=x, y=y, click_ms=round(click_seconds * 1000, 3))
             print(f"🖱️ Clicked at ({x}, {y})")
             time.sleep(0.5)
         except Exception as e:
             print(f"❌ Click failed: {e}")
+            self.event_log.emit("error", where="click", message=str(e), x=x, y=y)
 
     def create_control_panel(self):
         """Inject control panel at TOP LEFT"""
@@ -418,8 +432,14 @@ class BalootGiftBoxAutomation:
             stopBtn.style.cssText = 'width:100%; background:#cc0000; color:white; border:none; padding:10px; border-radius:6px; cursor:pointer; font-size:14px;';
             stopBtn.onclick = () => { window.botCommand = 'STOP'; };
 
+            const profileBtn = document.createElement('button');
+            profileBtn.textContent = '🧪 PROFILE';
+            profileBtn.style.cssText = 'width:100%; background:#6a1b9a; color:white; border:none; padding:8px; margin-top:10px; border-radius:6px; cursor:pointer; font-size:12px;';
+            profileBtn.onclick = () => { window.botCommand = 'PROFILE'; };
+
             panel.appendChild(startBtn);
             panel.appendChild(stopBtn);
+            panel.appendChild(profileBtn);
             document.body.appendChild(panel);
 
             console.log('✅ Panel Injected (Top Left)');
@@ -479,6 +499,10 @@ class BalootGiftBoxAutomation:
         print("🤖 Waiting for START command...")
         last_repair = 0
         last_screenshot_time = 0
+        last_frame_had_buttons = True
+        frames_since_full_check = 0
+        last_state = None
+        state_since = time.monotonic()
 
         while True:
             # Repair panel periodically
@@ -490,72 +514,199 @@ class BalootGiftBoxAutomation:
             cmd = self.check_command()
             if cmd == "START" and not self.running:
                 self.running = True
+                self.poll_scheduler.reset()
                 self.update_status("RUNNING")
                 print("▶️ Automation started!")
             elif cmd == "STOP":
                 self.running = False
                 self.update_status("STOPPED")
                 print("⏹️ Automation stopped.")
-
+                self.report_profile(self.profiler.stop())
+            elif cmd == "EMERGENCY_STOP":
+                self.running = False
+                self.update_status("STOPPED")
+                print("🚨 Emergency Stop!")
+                self.report_profile(self.profiler.stop())
+                break
+            elif cmd == "PROFILE":
+                if self.profiler.start():
+                    print(f"🧪 Profiling the next {self.profiler.remaining} captures...")
+
+            # An armed profiler (--profile, PROFILE while stopped) waits for the ticks after START
             if not self.running:
                 time.sleep(0.5)
                 continue
 
             try:
+                # Gift not ready yet: stay idle until shortly before the countdown ends
+                idle = self.gift_scheduler.wait_time()
+                if idle > 0:
+                    time.sleep(min(idle, GIFT_IDLE_POLL))
+                    continue
+
                 current_time = time.time()
                 
-                # Take screenshot every 1 second
-                if current_time - last_screenshot_time < 1.0:
-                    time.sleep(0.1)
+                # Capture at the rate chosen by the adaptive scheduler; sleep until
+                # the capture is due, waking only to poll control commands
+                wait = last_screenshot_time + self.poll_scheduler.interval - current_time
+                if wait > 0:
+                    time.sleep(min(wait, COMMAND_POLL_INTERVAL))
                     continue
                 
-                screenshot_path = self.take_screenshot()
+                self.report_profile(self.profiler.tick())
+                # Close the previous capture's allocation count, skipped frames included
+                self.buffer_pool.next_frame()
+                self.metrics.set_gauges(self.buffer_pool.snapshot())
+                self.metrics.start_frame()
+                screenshot = self.capture_frame()
                 last_screenshot_time = current_time
                 
-                if not screenshot_path:
+                if screenshot is None:
                     time.sleep(1)
                     continue
 
+                self.poll_scheduler.on_frame(screenshot)
+                self.metrics.set_gauges(self.poll_scheduler.snapshot())
+
+                # A running countdown where CLAIM appears means no CLAIM scan is needed
+                if self.gift_scheduler.read_due():
+                    self.read_gift_countdown(screenshot)
+                    if self.gift_scheduler.wait_time() > 0:
+                        continue
+
+                # Nothing moved since a frame without buttons: skip analysis
+                if not last_frame_had_buttons and self.poll_scheduler.is_static():
+                    self.poll_scheduler.mark_skipped()
+                    continue
+                last_frame_had_buttons = False
+                self.metrics.inc("frames_analysed")
+
+                # STEP 0: A confident scene narrows the button checks; unsure
+                # frames and every SCENE_RESYNC_FRAMES-th frame check them all
+                with self.metrics.time("scene"):
+                    scene = self.scene_classifier.classify(screenshot)
+                full_check = not scene or frames_since_full_check >= SCENE_RESYNC_FRAMES
+                buttons = GIFT_BUTTON_ORDER if full_check else restrict_to_scene(GIFT_BUTTON_ORDER, scene, GIFT_SCENE_BUTTONS)
+                frames_since_full_check = 0 if full_check else frames_since_full_check + 1
+                # Every detector of this frame shares one context (gray frame, results)
+                ctx = FrameContext(screenshot, self.shared_gray, self.metrics.time, scene)
+
                 # STEP 1: Look for CLAIM button
-                claim_btn = self.detect_button(screenshot_path, "CLAIM")
-                if claim_btn and (current_time - self.last_claim_time) > CLICK_COOLDOWN:
+                with self.metrics.time("detect"):
+                    claim_btn = self.detect_button(ctx, "CLAIM") if "CLAIM" in buttons else None
+                state = "CLAIM" if claim_btn else "WAITING"
+                self.metrics.set_state(state)
+                self.flight_recorder.record(screenshot, {"CLAIM": claim_btn})
+                self.event_log.emit(
+                    "detection", state=state, scene=scene, confidence=claim_btn.confidence if claim_btn else 0,
+                    location=claim_btn.location if claim_btn else None,
+                    frame_diff=self.poll_scheduler.last_diff,
+                    stages_ms=stage_durations_ms(self.metrics.frame_durations),
+                )
+                if state != last_state:
+                    now = time.monotonic()
+                    self.event_log.emit("transition", from_state=last_state, to_state=state,
+                                        after_s=round(now - state_since, 3))
+                    last_state, state_since = state, now
+                visible = []
+                blocked = None
+                if claim_btn:
+                    self.gift_scheduler.claim_seen(claim_btn.box)
+                    last_frame_had_buttons = True
+                    claim_location = claim_btn.location
+                    visible.append(("CLAIM", claim_location))
+                    blocked = self.skip_if_pending("CLAIM", claim_location)
+                if claim_btn and not blocked:
                     print("🎯 Found CLAIM button! Clicking...")
-                    self.click_at(claim_btn["x"], claim_btn["y"])
-                    self.last_claim_time = current_time
+                    self.flight_recorder.note("click", target="CLAIM", x=claim_location[0], y=claim_location[1])
+                    self.action_scheduler.started("CLAIM", claim_location)
+                    self.click_at(*claim_location)
+                    self.poll_scheduler.on_action()
                     time.sleep(1)
 
                     # STEP 2: After CLAIM, look for GIFT BOX (PRIORITY)
                     print("🔍 Searching for gift box...")
-                    giftbox_info = self.detect_giftbox(screenshot_path)
+                    giftbox_info = self.detect_giftbox(ctx)
                     
-                    if giftbox_info and giftbox_info["found"]:
+                    if giftbox_info:
                         # STEP 3: Detect path inside gift box
-                        path_points = self.detect_path_in_giftbox(screenshot_path, giftbox_info)
+                        with self.metrics.time("path"):
+                            path_points = self.detect_path_in_giftbox(ctx, giftbox_info)
                         
-                        if path_points:
+                        if path_points is not None:
                             # STEP 4: Drag along path
+                            self.flight_recorder.note("drag", points=path_points)
                             self.perform_drag_on_path(path_points)
                             time.sleep(1)
                         else:
                             print("⚠️ No path detected in gift box")
+                            self.event_log.emit("error", where="path", message="no path detected in gift box")
+                            self.flight_recorder.dump("no_path")
                     else:
                         print("⚠️ Gift box not found after CLAIM")
+                        self.event_log.emit("error", where="giftbox", message="gift box not found after CLAIM")
+                        self.flight_recorder.dump("giftbox_missing")
 
                 # STEP 5: Handle popups (AGREE/BACK)
                 for btn_name, label in [("AGREE", "موافق"), ("BACK", "عودة")]:
-                    btn = self.detect_button(screenshot_path, btn_name)
+                    if btn_name not in buttons:
+                        continue
+                    btn = self.detect_button(ctx, btn_name)
                     if btn:
+                        last_frame_had_buttons = True
+                        location = btn.location
+                        visible.append((btn_name, location))
+                        self.event_log.emit("detection", state=btn_name, confidence=btn.confidence,
+                                            location=location)
+                        if self.skip_if_pending(btn_name, location):
+                            continue
                         print(f"✅ Found '{label}' button!")
-                        self.click_at(btn["x"], btn["y"])
+                        self.flight_recorder.note("click", target=btn_name, x=location[0], y=location[1])
+                        self.action_scheduler.started(btn_name, location)
+                        self.click_at(*location)
+                        self.poll_scheduler.on_action()
                         time.sleep(1)
 
-                # Delete screenshot after processing
-                self.cleanup_screenshot(screenshot_path)
+                # Clicks whose button is gone have been handled by the page
+                self.action_scheduler.observe(visible)
+                self.metrics.set_gauges(self.action_scheduler.snapshot())
 
             except Exception as e:
                 print(f"❌ Loop error: {e}")
+                self.event_log.emit("error", where="loop", message=str(e))
+                self.flight_recorder.note("error", message=str(e))
+                self.flight_recorder.dump("loop_error")
                 time.sleep(2)
 
+    def read_gift_countdown(self, screenshot):
+        """OCR the countdown on the CLAIM bar and update the gift prediction"""
+        h, w = screenshot.shape[:2]
+        x, y, rw, rh = self.gift_scheduler.roi((w, h))
+        with self.metrics.time("ocr"):
+            text = read_countdown_text(screenshot[y:y + rh, x:x + rw], confirm=self.gift_scheduler.confirming)
+        seconds = parse_countdown(text)
+        self.gift_scheduler.update(seconds)
+        self.metrics.set_gauges(self.gift_scheduler.snapshot())
+        if seconds is not None and self.gift_scheduler.confirming:
+            print(f"⏳ Countdown read as {seconds}s, confirming before going idle")
+        elif seconds is not None:
+            print(f"⏳ Next gift in {seconds}s, detector idle until then")
+            self.event_log.emit("wait", reason="gift_countdown", seconds=seconds, text=text.strip())
+        return seconds
+
+    def skip_if_pending(self, btn_name, location):
+        """Log and return the block reason when this button was just clicked, else None"""
+        blocked = self.action_scheduler.check(btn_name, location)
+        if blocked:
+            reason, remaining = blocked
+            self.event_log.emit("action_skipped", state=btn_name, reason=reason,
+                                seconds=round(remaining, 3), location=location)
+        return blocked
+
+    def report_profile(self, folder):
+        if folder:
+            print(f"🧪 Profile saved: {self.debug_folder}/{folder}")
+
     def start(self):
         """Start the bot"""
         print("🚀 Starting Baloot Gift Box Automation...")
@@ -586,6 +737,8 @@ class BalootGiftBoxAutomation:
         except KeyboardInterrupt:
             print("\n👋 Stopping bot...")
             self.running = False
+            self.debug_writer.close()
+            self.event_log.close()
             self.driver.quit()
 
 
@@ -595,6 +748,16 @@ def main():
     parser.add_argument("--agree", default="mouwafeq_template.png")
     parser.add_argument("--back", default="return_grey_template.png")
     parser.add_argument("--giftbox", default="gift_box_template.png")
+    parser.add_argument("--poll-min", type=float, default=POLL_MIN_INTERVAL, help="Fastest capture interval (s)")
+    parser.add_argument("--poll-max", type=float, default=POLL_MAX_INTERVAL, help="Slowest capture interval (s)")
+    parser.add_argument("--poll-decay", type=float, default=POLL_DECAY, help="Back-off factor while the screen is static")
+    parser.add_argument("--profile-ticks", type=int, default=PROFILE_TICKS,
+                        help="Captures profiled by the PROFILE button")
+    parser.add_argument("--profile", action="store_true", help="Profile the first captures after START")
+    parser.add_argument("--countdown-roi", help="Fixed countdown region X,Y,W,H (default: where CLAIM was last seen)")
+    add_metrics_arguments(parser)
+    add_event_log_arguments(parser)
+    add_match_arguments(parser)
     args = parser.parse_args()
 
     BUTTON_TEMPLATES["CLAIM"] = args.claim
@@ -602,8 +765,23 @@ def main():
     BUTTON_TEMPLATES["BACK"] = args.back
     BUTTON_TEMPLATES["GIFTBOX"] = args.giftbox
 
-    bot = BalootGiftBoxAutomation()
-    bot.start()
+    instance = args.instance or default_instance_name()
+    event_log = EventLog(args.event_log or default_event_log_path("gift", instance), instance,
+                         max_bytes=int(args.event_log_max_mb * 1024 * 1024), backups=args.event_log_backups)
+    bot = BalootGiftBoxAutomation(instance=instance, event_log=event_log)
+    bot.shared_gray.matcher = create_matcher(args.match_backend, args.fft_workers)
+    bot.poll_scheduler = AdaptivePollScheduler(args.poll_min, args.poll_max, args.poll_decay, pool=bot.buffer_pool)
+    bot.profiler.ticks = args.profile_ticks
+    if args.countdown_roi:
+        bot.gift_scheduler.fixed_roi = tuple(int(v) for v in args.countdown_roi.split(","))
+    if args.profile:
+        bot.profiler.start(reason="startup")
+    exporter = start_metrics_export(bot.metrics, args.metrics_port, args.metrics_json, args.metrics_interval)
+    try:
+        bot.start()
+    finally:
+        if exporter:
+            exporter.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import re
+import time
+import cv2
+from digit_ocr import read_digits
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Wake the CLAIM detector this long before the predicted ready time
+GIFT_READY_LEAD = 3.0
+# Re-read the countdown this often while waiting, to correct drift
+COUNTDOWN_RECHECK = 60.0
+# Minimum gap between reads while no countdown is visible
+COUNTDOWN_RETRY = 5.0
+# Longest countdown we believe (anything above is a misread)
+MAX_COUNTDOWN = 24 * 3600
+# A new countdown is only slept on once a second read predicts the same ready
+# time within this many seconds; the confirming read comes this soon after
+COUNTDOWN_CONFIRM_TOLERANCE = 3.0
+COUNTDOWN_CONFIRM_RETRY = 1.0
+# Padding around the CLAIM bar, as a fraction of its size, for the countdown ROI
+COUNTDOWN_ROI_PADDING = (0.1, 0.3)
+# Countdowns always have a colon; plain numbers on the bar are coin amounts
+COUNTDOWN_PATTERN = re.compile(r"(?:(\d{1,2}):)?(\d{1,2}):(\d{2})")
+TESSERACT_CONFIG = "--psm 7 -c tessedit_char_whitelist=0123456789:"
+
+
+def parse_countdown(text):
+    """'MM:SS' or 'H:MM:SS' -> seconds, None when there is no countdown in text"""
+    if not text:
+        return None
+    match = COUNTDOWN_PATTERN.search(text.replace(" ", ""))
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    total = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+    if int(seconds) >= 60 or total > MAX_COUNTDOWN:
+        return None
+    return total
+
+
+def countdown_roi(claim_box, frame_size=None, padding=COUNTDOWN_ROI_PADDING):
+    """The countdown replaces the CLAIM bar: its box, slightly padded and clipped"""
+    x, y, w, h = claim_box
+    px, py = int(w * padding[0]), int(h * padding[1])
+    x0, y0 = max(0, x - px), max(0, y - py)
+    x1, y1 = x + w + px, y + h + py
+    if frame_size:
+        x1, y1 = min(x1, frame_size[0]), min(y1, frame_size[1])
+    return x0, y0, max(1, x1 - x0), max(1, y1 - y0)
+
+
+def read_countdown_text(region, confirm=False):
+    """
+    Glyph-bank reading of digits and ':'; Tesseract when a glyph is uncertain.
+    A confirming read goes to Tesseract first (when installed) so that it
+    cannot repeat a glyph-bank misread of the same pixels.
+    """
+    if region is None or not region.size:
+        return ""
+    if confirm and pytesseract is not None:
+        text = tesseract_countdown_text(region)
+        if parse_countdown(text) is not None:
+            return text
+    text = read_digits(region)
+    if text is not None:
+        return text
+    return tesseract_countdown_text(region)
+
+
+def tesseract_countdown_text(region):
+    """Tesseract on a binarised, upscaled ROI restricted to digits and ':'"""
+    if pytesseract is None or region is None or not region.size:
+        return ""
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Tesseract wants dark text on a light background
+    if binary.mean() < 127:
+        binary = 255 - binary
+    binary = cv2.resize(binary, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+    try:
+        return pytesseract.image_to_string(binary, config=TESSERACT_CONFIG)
+    except Exception:
+        return ""
+
+
+class GiftScheduler:
+    """
+    Predict when the next gift is ready from the countdown on the CLAIM bar
+    and tell the loop how long it may sleep instead of scanning for CLAIM.
+    A single read is never slept on: it stays pending until a second read
+    agrees (and a recheck that disagrees drops the prediction again).
+    """
+
+    def __init__(self, lead=GIFT_READY_LEAD, recheck=COUNTDOWN_RECHECK, retry=COUNTDOWN_RETRY, roi=None,
+                 tolerance=COUNTDOWN_CONFIRM_TOLERANCE, confirm_retry=COUNTDOWN_CONFIRM_RETRY):
+        self.lead = lead
+        self.recheck = recheck
+        self.retry = retry
+        self.tolerance = tolerance
+        self.confirm_retry = confirm_retry
+        self.last_read = None
+        self.fixed_roi = roi
+        self.claim_box = None
+        self.ready_at = None
+        self.pending = None
+        self.next_check = None
+        self.reads = 0
+        self.misreads = 0
+        self.unconfirmed = 0
+
+    @property
+    def confirming(self):
+        """The last read predicted a ready time that no second read has agreed with yet"""
+        return self.pending is not None
+
+    @property
+    def roi_known(self):
+        return self.fixed_roi is not None or self.claim_box is not None
+
+    def roi(self, frame_size=None):
+        if self.fixed_roi is not None:
+            return self.fixed_roi
+        if self.claim_box is not None:
+            return countdown_roi(self.claim_box, frame_size)
+        return None
+
+    def claim_seen(self, box):
+        """CLAIM is on screen: remember where the countdown will appear and drop any prediction"""
+        if box is not None:
+            self.claim_box = tuple(int(v) for v in box)
+        self.ready_at = None
+        self.pending = None
+        self.next_check = None
+
+    def read_due(self):
+        """A countdown read is worth its OCR cost: ROI known and not read in the last `retry` seconds"""
+        if not self.roi_known:
+            return False
+        retry = self.confirm_retry if self.confirming else self.retry
+        return self.last_read is None or time.monotonic() - self.last_read >= retry
+
+    def update(self, seconds):
+        """Record a countdown reading (None = unreadable, keep scanning normally)"""
+        self.reads += 1
+        self.last_read = time.monotonic()
+        if seconds is None:
+            self.misreads += 1
+            self.ready_at = None
+            self.pending = None
+            self.next_check = None
+            return
+        now = time.monotonic()
+        ready = now + seconds
+        expected = self.pending if self.pending is not None else self.ready_at
+        if expected is not None and abs(ready - expected) <= self.tolerance:
+            self.ready_at = ready
+            self.pending = None
+            self.next_check = now + self.recheck
+            return
+        # First read of this countdown, or one that disagrees: keep scanning until confirmed
+        self.unconfirmed += 1
+        self.pending = ready
+        self.ready_at = None
+        self.next_check = None
+
+    def wait_time(self):
+        """Seconds the detector may stay idle; 0 when the next frame should be scanned"""
+        if self.ready_at is None:
+            return 0.0
+        wake = min(self.ready_at - self.lead, self.next_check)
+        return max(0.0, wake - time.monotonic())
+
+    def snapshot(self):
+        remaining = None if self.ready_at is None else max(0.0, self.ready_at - time.monotonic())
+        return {
+            "gift_ready_in": round(remaining, 1) if remaining is not None else -1,
+            "countdown_reads": self.reads,
+            "countdown_misreads": self.misreads,
+            "countdown_unconfirmed": self.unconfirmed,
+        }
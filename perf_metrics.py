@@ -0,0 +1,266 @@
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; the last bucket catches everything
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+METRIC_PREFIX = "baloot"
+METRICS_HOST = "127.0.0.1"
+SNAPSHOT_INTERVAL = 10.0
+
+# WebDriver calls timed as their own stage by InstrumentedDriver
+TIMED_DRIVER_CALLS = (
+    "execute_script", "save_screenshot", "get_screenshot_as_png",
+    "get_window_position", "get_window_rect", "execute_cdp_cmd", "find_element",
+)
+
+
+def default_instance_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (non-cumulative counts per bucket)"""
+
+    __slots__ = ("buckets", "counts", "total", "count", "last")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.last = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.last = seconds
+
+
+class MetricsRegistry:
+    """
+    Stage timings, counters and gauges for one bot instance.
+    Every observation is labelled with the bot's current state.
+    """
+
+    def __init__(self, instance=None, buckets=DEFAULT_BUCKETS):
+        self.instance = instance or default_instance_name()
+        self.buckets = buckets
+        self.state = "IDLE"
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.last_durations = {}
+        self.frame_durations = {}
+        self.lock = threading.Lock()
+
+    def set_state(self, state):
+        self.state = state or "UNKNOWN"
+
+    def observe(self, stage, seconds):
+        key = (stage, self.state)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(self.buckets)
+            hist.observe(seconds)
+            self.last_durations[stage] = seconds
+            self.frame_durations[stage] = self.frame_durations.get(stage, 0.0) + seconds
+
+    def start_frame(self):
+        """Begin a new frame: frame_durations then sums each stage for this frame only"""
+        with self.lock:
+            self.frame_durations = {}
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name, value=1):
+        key = (name, self.state)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value):
+        if value is None:
+            return
+        with self.lock:
+            self.gauges[name] = float(value)
+
+    def set_gauges(self, values):
+        for name, value in values.items():
+            self.set_gauge(name, value)
+
+    def counter_total(self, name):
+        with self.lock:
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage",
+                 f"# TYPE {name} histogram"]
+        with self.lock:
+            for (stage, state), hist in sorted(self.histograms.items()):
+                labels = f'instance="{self.instance}",stage="{stage}",state="{state}"'
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {hist.total:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+            for counter in sorted({n for n, _ in self.counters}):
+                full = f"{METRIC_PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {full} counter")
+                for (n, state), value in sorted(self.counters.items()):
+                    if n == counter:
+                        lines.append(f'{full}{{instance="{self.instance}",state="{state}"}} {value}')
+
+            for gauge, value in sorted(self.gauges.items()):
+                full = f"{METRIC_PREFIX}_{gauge}"
+                lines.append(f"# TYPE {full} gauge")
+                lines.append(f'{full}{{instance="{self.instance}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON friendly view of every metric"""
+        with self.lock:
+            stages = []
+            for (stage, state), hist in sorted(self.histograms.items()):
+                stages.append({
+                    "stage": stage,
+                    "state": state,
+                    "count": hist.count,
+                    "sum_seconds": round(hist.total, 6),
+                    "last_seconds": round(hist.last, 6),
+                    "buckets": [["+Inf" if b == float("inf") else b, c] for b, c in zip(hist.buckets, hist.counts)],
+                })
+            return {
+                "instance": self.instance,
+                "state": self.state,
+                "time": time.time(),
+                "stages": stages,
+                "counters": [{"name": n, "state": s, "value": v} for (n, s), v in sorted(self.counters.items())],
+                "gauges": dict(self.gauges),
+            }
+
+
+class InstrumentedDriver:
+    """Proxy around a WebDriver that times every round trip as a 'webdriver:<call>' stage"""
+
+    def __init__(self, driver, metrics):
+        self._driver = driver
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._driver, name)
+        if name not in TIMED_DRIVER_CALLS or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            with self._metrics.time(f"webdriver:{name}"):
+                return attr(*args, **kwargs)
+        return timed
+
+    @property
+    def wrapped(self):
+        return self._driver
+
+
+class MetricsExporter:
+    """Serve metrics on localhost and/or write periodic JSON snapshots"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.server = None
+        self.snapshot_thread = None
+        self.stop_event = threading.Event()
+
+    def serve(self, port, host=METRICS_HOST):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(registry.snapshot()).encode("utf-8")
+                    content_type = "application/json"
+                elif self.path.startswith("/metrics"):
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Metrics at http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server.server_address[1]
+
+    def write_snapshots(self, path, interval=SNAPSHOT_INTERVAL):
+        def loop():
+            while not self.stop_event.wait(interval):
+                self.write_snapshot(path)
+            self.write_snapshot(path)
+
+        self.snapshot_thread = threading.Thread(target=loop, name="metrics-json", daemon=True)
+        self.snapshot_thread.start()
+        print(f"📈 Metrics snapshots every {interval:.0f}s in {path}")
+
+    def write_snapshot(self, path):
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Metrics snapshot failed: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server:
+            self.server.shutdown()
+        if self.snapshot_thread:
+            self.snapshot_thread.join(timeout=2)
+
+
+def start_metrics_export(registry, port=None, json_path=None, interval=SNAPSHOT_INTERVAL):
+    """Start whichever exporters were requested; returns the exporter (or None)"""
+    if not port and not json_path:
+        return None
+    exporter = MetricsExporter(registry)
+    if port:
+        exporter.serve(port)
+    if json_path:
+        exporter.write_snapshots(json_path, interval)
+    return exporter
+
+
+def add_metrics_arguments(parser):
+    """Shared CLI flags for both bots"""
+    parser.add_argument("--instance", help="Bot instance label for metrics (default: host-pid)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on localhost:PORT/metrics")
+    parser.add_argument("--metrics-json", help="Write a JSON metrics snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=SNAPSHOT_INTERVAL,
+                        help="Seconds between JSON snapshots")
@@ -0,0 +1,349 @@
+import argparse
+import base64
+import contextlib
+import glob
+import json
+import os
+import re
+import sys
+import time
+import cv2
+import numpy as np
+
+DEFAULT_WINDOW_POSITION = {"x": 0, "y": 0}
+# Browser chrome above the simulated viewport (tabs + address bar)
+REPLAY_CHROME_HEIGHT = 130
+REPLAY_SCREEN_WIDTH = 3840
+
+_CLIENT_XY = re.compile(r"clientX:\s*(-?\d+(?:\.\d+)?)\s*,\s*clientY:\s*(-?\d+(?:\.\d+)?)")
+_DRAG_POINTS = re.compile(r"var points = (\[.*?\]);", re.S)
+
+
+class VirtualClock:
+    """
+    Replace time.sleep with a clock that jumps forward instead of waiting,
+    so the bots' fixed waits cost nothing during a replay. time.time and
+    time.monotonic follow the virtual clock so cooldowns still behave.
+    """
+
+    def __init__(self):
+        self.offset = 0.0
+        self._saved = None
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.offset += seconds
+
+    def __enter__(self):
+        self._saved = (time.sleep, time.time, time.monotonic)
+        real_time, real_monotonic = time.time, time.monotonic
+        time.sleep = self.sleep
+        time.time = lambda: real_time() + self.offset
+        time.monotonic = lambda: real_monotonic() + self.offset
+        return self
+
+    def __exit__(self, *exc):
+        time.sleep, time.time, time.monotonic = self._saved
+        return False
+
+
+class ReplayElement:
+    def __init__(self, element_id, rect):
+        self.id = element_id
+        self.rect = rect
+
+    def is_displayed(self):
+        return True
+
+    def get_attribute(self, name):
+        return self.id if name == "id" else None
+
+
+class ReplayMouse:
+    """Records the PyAutoGUI calls the baloot bot makes"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.position = (0, 0)
+
+    def moveTo(self, x, y, duration=0):
+        self.position = (int(x), int(y))
+
+    def mouseDown(self):
+        pass
+
+    def mouseUp(self):
+        x, y = self.position
+        self.driver.record_action("mouse_click", x=x, y=y)
+
+    def size(self):
+        return REPLAY_SCREEN_WIDTH, REPLAY_SCREEN_WIDTH * 9 // 16
+
+    def click(self, x=None, y=None):
+        if x is not None:
+            self.moveTo(x, y)
+        self.mouseUp()
+
+
+class ReplayDriver:
+    """
+    Local stand-in for the Chrome WebDriver.
+    Serves a scripted sequence of frames (one per capture) and records every
+    click and drag it receives. Once the script is exhausted it answers the
+    next control-command poll with a stop command so the bot loop exits.
+    """
+
+    def __init__(self, frames, commands=None, window_position=None):
+        self.frames = frames
+        self.index = 0
+        self.commands = list(commands or ["START"])
+        self.window_position = window_position or dict(DEFAULT_WINDOW_POSITION)
+        self.mouse = ReplayMouse(self)
+        self.trace = []
+        self.latencies = []
+        self.captures = 0
+        self.script_calls = 0
+        self.current_label = None
+        self.last_capture_time = None
+        self.url = None
+
+    @property
+    def finished(self):
+        return self.index >= len(self.frames)
+
+    def _next_frame(self):
+        if self.finished:
+            label, frame = self.frames[-1]
+        else:
+            label, frame = self.frames[self.index]
+            self.index += 1
+        self.captures += 1
+        self.current_label = label
+        self.last_capture_time = time.monotonic()
+        return frame
+
+    def current_frame(self):
+        return self.frames[max(0, min(self.index, len(self.frames)) - 1)][1]
+
+    def upcoming_frame(self):
+        """The frame the next capture will serve, i.e. the screen after an action"""
+        return self.frames[min(self.index, len(self.frames) - 1)][1]
+
+    def record_action(self, kind, **fields):
+        entry = {"type": kind, "frame": self.current_label, "capture": self.captures}
+        entry.update(fields)
+        if self.last_capture_time is not None:
+            latency = (time.monotonic() - self.last_capture_time) * 1000
+            entry["latency_ms"] = round(latency, 3)
+            self.latencies.append(latency)
+        self.trace.append(entry)
+
+    # --- WebDriver API used by the bots ---
+
+    def get(self, url):
+        self.url = url
+
+    def quit(self):
+        pass
+
+    def save_screenshot(self, path):
+        return cv2.imwrite(path, self._next_frame())
+
+    def get_screenshot_as_png(self):
+        ok, buf = cv2.imencode(".png", self._next_frame())
+        return buf.tobytes()
+
+    def get_window_position(self):
+        return dict(self.window_position)
+
+    def get_window_rect(self):
+        """Window sized to the current frame plus the simulated browser chrome"""
+        h, w = self.current_frame().shape[:2]
+        return {"x": self.window_position["x"], "y": self.window_position["y"],
+                "width": w, "height": h + REPLAY_CHROME_HEIGHT}
+
+    def execute_cdp_cmd(self, cmd, params=None):
+        rect = self.get_window_rect()
+        if cmd == "Browser.getWindowForTarget":
+            return {"windowId": 1, "bounds": {"left": rect["x"], "top": rect["y"], "width": rect["width"],
+                                              "height": rect["height"], "windowState": "normal"}}
+        if cmd == "Page.getLayoutMetrics":
+            h, w = self.current_frame().shape[:2]
+            return {"cssVisualViewport": {"clientWidth": w, "clientHeight": h, "pageX": 0, "pageY": 0, "zoom": 1}}
+        if cmd == "Page.captureScreenshot":
+            return {"data": self._clip_png(params["clip"])}
+        raise ValueError(f"Unsupported CDP command in replay: {cmd}")
+
+    def _clip_png(self, clip):
+        frame = self.upcoming_frame()
+        x, y = int(round(clip["x"])), int(round(clip["y"]))
+        w, h = max(1, int(round(clip["width"]))), max(1, int(round(clip["height"])))
+        region = frame[max(0, y):y + h, max(0, x):x + w]
+        scale = clip.get("scale", 1)
+        if scale != 1 and region.size:
+            region = cv2.resize(region, (max(1, int(round(region.shape[1] * scale))),
+                                         max(1, int(round(region.shape[0] * scale)))))
+        ok, buf = cv2.imencode(".png", region)
+        return base64.b64encode(buf.tobytes()).decode("ascii")
+
+    def find_element(self, by=None, value=None):
+        h, w = self.frames[0][1].shape[:2]
+        return ReplayElement(value, {"x": 0, "y": 0, "width": w, "height": h})
+
+    def execute_script(self, script, *args):
+        self.script_calls += 1
+
+        # Control channels: baloot polls window.automationControl, gift polls window.botCommand
+        if "const c = window.automationControl" in script:
+            return self._pop_command(as_dict=True)
+        if "return window.botCommand" in script:
+            return self._pop_command(as_dict=False)
+        if "getBoundingClientRect" in script:
+            h, w = self.frames[0][1].shape[:2]
+            return {"x": 0, "y": 0, "width": w, "height": h}
+        if "return !!document.getElementById" in script:
+            return True
+        if "window.devicePixelRatio" in script:
+            rect = self.get_window_rect()
+            h, w = self.current_frame().shape[:2]
+            return {"screenX": rect["x"], "screenY": rect["y"], "outerWidth": rect["width"],
+                    "outerHeight": rect["height"], "innerWidth": w, "innerHeight": h,
+                    "devicePixelRatio": 1, "screenWidth": REPLAY_SCREEN_WIDTH}
+
+        if "pointerdown" in script:
+            match = _DRAG_POINTS.search(script)
+            points = json.loads(match.group(1)) if match else []
+            self.record_action("drag", points=points)
+            return None
+        if "'click'" in script:
+            match = _CLIENT_XY.search(script)
+            if match:
+                self.record_action("js_click", x=int(float(match.group(1))), y=int(float(match.group(2))))
+            return None
+        return None
+
+    def _pop_command(self, as_dict):
+        if self.commands:
+            cmd = self.commands.pop(0)
+        elif self.finished:
+            cmd = "STOP" if as_dict else "EMERGENCY_STOP"
+        else:
+            return None
+        return {"action": cmd} if as_dict else cmd
+
+
+def load_script(path=None, patterns=None, repeat=1):
+    """
+    Build the frame list from a JSON script ({"frames": [{"path", "repeat"}]})
+    or from glob patterns, each frame served `repeat` times.
+    """
+    entries = []
+    if path:
+        with open(path) as f:
+            script = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        for item in script["frames"]:
+            frame_path = item["path"] if os.path.isabs(item["path"]) else os.path.join(base, item["path"])
+            entries.append((frame_path, int(item.get("repeat", 1))))
+    for pattern in patterns or []:
+        for frame_path in sorted(glob.glob(pattern)):
+            entries.append((frame_path, repeat))
+
+    frames = []
+    cache = {}
+    for frame_path, count in entries:
+        if frame_path not in cache:
+            img = cv2.imread(frame_path)
+            if img is None:
+                print(f"⚠️ Could not load frame: {frame_path}")
+                continue
+            cache[frame_path] = img
+        frames.extend([(os.path.basename(frame_path), cache[frame_path])] * count)
+    return frames
+
+
+def run_replay(bot_name, frames, quiet=True):
+    """Drive one bot over the frames and return (trace, stats)"""
+    driver = ReplayDriver(frames)
+    sink = open(os.devnull, "w") if quiet else sys.stdout
+
+    with VirtualClock() as clock, contextlib.redirect_stdout(sink):
+        wall_start = time.perf_counter()
+        if bot_name == "baloot":
+            from baloot_automation import RobustBalootAutomation
+            bot = RobustBalootAutomation(driver=driver, mouse=driver.mouse)
+            bot.start_game()
+            bot.automation_running = True
+            bot.automation_loop()
+        else:
+            from gift_automation import BalootGiftBoxAutomation
+            bot = BalootGiftBoxAutomation(driver=driver)
+            bot.run_automation()
+        wall = time.perf_counter() - wall_start
+        bot.debug_writer.close()
+        bot.event_log.close()
+
+    if quiet:
+        sink.close()
+
+    lat = np.asarray(driver.latencies) if driver.latencies else None
+    stats = {
+        "bot": bot_name,
+        "frames": len(frames),
+        "captures": driver.captures,
+        "actions": len(driver.trace),
+        "script_calls": driver.script_calls,
+        "wall_seconds": round(wall, 3),
+        "simulated_seconds": round(clock.offset + wall, 3),
+        "decisions_per_second": round(driver.captures / wall, 2) if wall > 0 else None,
+        "frame_to_action_p50_ms": round(float(np.percentile(lat, 50)), 3) if lat is not None else None,
+        "frame_to_action_p95_ms": round(float(np.percentile(lat, 95)), 3) if lat is not None else None,
+    }
+    return driver.trace, stats
+
+
+def comparable(trace):
+    """Strip timing so two traces can be compared action by action"""
+    return [{k: v for k, v in entry.items() if k not in ("latency_ms", "capture")} for entry in trace]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames through a bot with a fake WebDriver")
+    parser.add_argument("--bot", choices=["baloot", "gift"], default="baloot")
+    parser.add_argument("--script", help="JSON script: {\"frames\": [{\"path\": ..., \"repeat\": n}]}")
+    parser.add_argument("--frames", nargs="*", default=[], help="Frame glob patterns, served in order")
+    parser.add_argument("--repeat", type=int, default=1, help="Captures served per frame for --frames")
+    parser.add_argument("--save-trace", help="Write the action trace and stats as JSON")
+    parser.add_argument("--expect", help="Fail unless the action trace matches this saved trace")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own output")
+    args = parser.parse_args()
+
+    frames = load_script(args.script, args.frames, args.repeat)
+    if not frames:
+        print("❌ No frames to replay")
+        sys.exit(2)
+
+    print(f"▶️ Replaying {len(frames)} frames through the {args.bot} bot...")
+    trace, stats = run_replay(args.bot, frames, quiet=not args.verbose)
+
+    for entry in trace:
+        where = f"({entry['x']}, {entry['y']})" if "x" in entry else f"{len(entry.get('points', []))} points"
+        print(f"   🖱️ {entry['type']:<12} {where:<16} after {entry['frame']}")
+    print(json.dumps(stats, indent=2))
+
+    if args.save_trace:
+        with open(args.save_trace, "w") as f:
+            json.dump({"stats": stats, "trace": trace}, f, indent=2)
+        print(f"📄 Trace saved to: {args.save_trace}")
+
+    if args.expect:
+        with open(args.expect) as f:
+            expected = json.load(f)["trace"]
+        if comparable(expected) != comparable(trace):
+            print("❌ Action trace differs from the expected trace")
+            sys.exit(1)
+        print("✅ Action trace matches the expected trace")
+
+
+if __name__ == "__main__":
+    main()
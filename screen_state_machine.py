@@ -0,0 +1,120 @@
+import time
+
+# Kammelna screen flow. Keys are screens, values are the screens that can
+# follow them. Screens that own a button template share its state name;
+# LOBBY and IN_GAME are idle screens with nothing to click.
+SCREEN_TRANSITIONS = {
+    "LOBBY": ["PLAY_BALOOT", "GREEN_PARTICIPATE"],
+    "PLAY_BALOOT": ["GREEN_PARTICIPATE", "PLAY_BALOOT"],
+    "GREEN_PARTICIPATE": ["IN_GAME", "GREEN_PARTICIPATE"],
+    "IN_GAME": ["RETURN_GREEN", "RETURN_GREY", "LEAVE_GAME"],
+    "RETURN_GREEN": ["LOBBY", "RETURN_GREEN", "RETURN_GREY", "LEAVE_GAME"],
+    "RETURN_GREY": ["LOBBY", "RETURN_GREY", "LEAVE_GAME"],
+    "LEAVE_GAME": ["LOBBY", "LEAVE_GAME"],
+}
+
+# Screen entered when a button screen is followed by a frame with no buttons
+IDLE_SUCCESSOR = {
+    "PLAY_BALOOT": "PLAY_BALOOT",
+    "GREEN_PARTICIPATE": "IN_GAME",
+    "RETURN_GREEN": "LOBBY",
+    "RETURN_GREY": "LOBBY",
+    "LEAVE_GAME": "LOBBY",
+}
+
+IDLE_SCREENS = ("LOBBY", "IN_GAME")
+
+# The lobby always shows PLAY_BALOOT, so an empty full scan means we are at a table
+UNKNOWN_IDLE_SCREEN = "IN_GAME"
+
+FULL_SCAN_EVERY_N_FRAMES = 10
+FULL_SCAN_TIMEOUT = 30.0
+
+
+class ScreenStateMachine:
+    """Track the current Kammelna screen and pick the detectors worth running"""
+
+    def __init__(self, transitions=None, full_scan_every=FULL_SCAN_EVERY_N_FRAMES,
+                 full_scan_timeout=FULL_SCAN_TIMEOUT):
+        self.transitions = transitions or SCREEN_TRANSITIONS
+        self.full_scan_every = full_scan_every
+        self.full_scan_timeout = full_scan_timeout
+        # Session totals (reset() only forgets the screen)
+        self.unexpected_jumps = 0
+        self.full_scans = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the current screen so the next frame gets a full scan"""
+        self.screen = None
+        self.frames_since_full_scan = 0
+        self.last_full_scan = 0
+        self.last_change = time.monotonic()
+
+    def reachable_detectors(self, screen=None):
+        """Button states reachable from a screen, looking through idle screens"""
+        screen = screen or self.screen
+        detectors = set()
+        for nxt in self.transitions.get(screen, []):
+            if nxt in IDLE_SCREENS:
+                detectors.update(s for s in self.transitions.get(nxt, []) if s not in IDLE_SCREENS)
+            else:
+                detectors.add(nxt)
+        return detectors
+
+    def needs_full_scan(self):
+        """Full scan when the screen is unknown, every N frames or after a timeout"""
+        if self.screen is None:
+            return True
+        if self.frames_since_full_scan >= self.full_scan_every:
+            return True
+        now = time.monotonic()
+        return (now - self.last_change > self.full_scan_timeout
+                and now - self.last_full_scan > self.full_scan_timeout)
+
+    def next_detectors(self, priority_order):
+        """
+        Return the states to check for the next frame, keeping priority order.
+        Also returns whether this frame is a full scan.
+        """
+        if self.needs_full_scan():
+            self.frames_since_full_scan = 0
+            self.last_full_scan = time.monotonic()
+            self.full_scans += 1
+            return list(priority_order), True
+
+        self.frames_since_full_scan += 1
+        reachable = self.reachable_detectors()
+        return [state for state in priority_order if state in reachable], False
+
+    def observe(self, detected_state):
+        """
+        Advance the machine with a detection result.
+        Returns the new screen name.
+        """
+        previous = self.screen
+
+        if detected_state == "WAITING":
+            if previous is None:
+                self.screen = UNKNOWN_IDLE_SCREEN
+            else:
+                self.screen = IDLE_SUCCESSOR.get(previous, previous)
+        elif detected_state in self.transitions:
+            if previous is not None and detected_state != previous \
+                    and detected_state not in self.reachable_detectors(previous):
+                self.unexpected_jumps += 1
+            self.screen = detected_state
+
+        if self.screen != previous:
+            self.last_change = time.monotonic()
+        return self.screen
+
+    def seconds_since_change(self):
+        return time.monotonic() - self.last_change
+
+    def snapshot(self):
+        """Jumps the transition table did not predict (a gap in it, or a missed frame) and full scans so far"""
+        return {
+            "screen_unexpected_jumps": self.unexpected_jumps,
+            "screen_full_scans": self.full_scans,
+        }
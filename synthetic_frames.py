@@ -0,0 +1,214 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import cv2
+import numpy as np
+
+# State -> template composited for it (BACK shares return_grey_template.png with RETURN_GREY)
+SYNTHETIC_TEMPLATES = {
+    "PLAY_BALOOT": "play_baloot_template.png",
+    "GREEN_PARTICIPATE": "green_participate_template.png",
+    "RETURN_GREEN": "return_template.png",
+    "RETURN_GREY": "return_grey_template.png",
+    "LEAVE_GAME": "leave_game_template.png",
+    "CLAIM": "claim_button_template.png",
+    "AGREE": "mouwafeq_template.png",
+    "GIFTBOX": "gift_box_template.png",
+}
+DEFAULT_BACKGROUNDS = ["test*.png", "screenshot_v3.png", "Screenshot_v1.png"]
+RESOLUTIONS = [(1280, 720), (1600, 900), (1920, 1040), (2560, 1440), (3840, 2160)]
+REFERENCE_WIDTH = 1920
+
+SCALE_RANGE = (0.8, 1.2)
+BRIGHTNESS_RANGE = (0.8, 1.2)
+CONTRAST_SHIFT = 25
+NOISE_SIGMA_MAX = 8.0
+JPEG_QUALITY_RANGE = (40, 95)
+MAX_OBJECTS = 3
+PLACEMENT_ATTEMPTS = 50
+# Backgrounds are downscaled by this factor and back up so buttons already
+# present in the recorded screenshots cannot be matched (they are not labelled)
+BACKGROUND_BLUR_FACTOR = 16
+
+
+def load_templates(templates=SYNTHETIC_TEMPLATES, states=None):
+    loaded = {}
+    for state, path in templates.items():
+        if states and state not in states:
+            continue
+        img = cv2.imread(path)
+        if img is None:
+            print(f"⚠️ Template not found: {path}")
+            continue
+        loaded[state] = img
+    return loaded
+
+
+def load_backgrounds(patterns, keep_detail=False):
+    backgrounds = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            if not keep_detail:
+                h, w = img.shape[:2]
+                small = cv2.resize(img, (max(1, w // BACKGROUND_BLUR_FACTOR), max(1, h // BACKGROUND_BLUR_FACTOR)),
+                                   interpolation=cv2.INTER_AREA)
+                img = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+            backgrounds.append((os.path.basename(path), img))
+    return backgrounds
+
+
+def _overlaps(box, boxes):
+    x, y, w, h = box
+    for bx, by, bw, bh in boxes:
+        if x < bx + bw and bx < x + w and y < by + bh and by < y + h:
+            return True
+    return False
+
+
+class SyntheticFrameGenerator:
+    """
+    Composite button templates onto recorded backgrounds with random
+    position, scale, brightness, noise and JPEG quality. Every frame comes
+    with ground-truth boxes for the objects pasted onto it.
+    """
+
+    def __init__(self, templates, backgrounds, resolutions=RESOLUTIONS, scale_range=SCALE_RANGE,
+                 max_objects=MAX_OBJECTS, seed=0, scale_with_resolution=True):
+        if not templates or not backgrounds:
+            raise ValueError("Need at least one template and one background")
+        self.templates = templates
+        self.backgrounds = backgrounds
+        self.resolutions = resolutions
+        self.scale_range = scale_range
+        self.max_objects = max_objects
+        self.scale_with_resolution = scale_with_resolution
+        self.rng = np.random.default_rng(seed)
+
+    def generate(self):
+        """Return (BGR frame before JPEG encoding, label dict, jpeg quality)"""
+        rng = self.rng
+        bg_name, background = self.backgrounds[rng.integers(len(self.backgrounds))]
+        width, height = self.resolutions[rng.integers(len(self.resolutions))]
+        frame = cv2.resize(background, (width, height), interpolation=cv2.INTER_LINEAR)
+        resolution_scale = width / REFERENCE_WIDTH if self.scale_with_resolution else 1.0
+
+        states = list(self.templates)
+        count = int(rng.integers(1, min(self.max_objects, len(states)) + 1))
+        chosen = rng.choice(len(states), size=count, replace=False)
+
+        objects = []
+        boxes = []
+        for index in chosen:
+            state = states[index]
+            template = self.templates[state]
+            scale = float(rng.uniform(*self.scale_range)) * resolution_scale
+            th, tw = template.shape[:2]
+            w, h = max(1, int(round(tw * scale))), max(1, int(round(th * scale)))
+            if w >= width or h >= height:
+                continue
+            for _ in range(PLACEMENT_ATTEMPTS):
+                x = int(rng.integers(0, width - w))
+                y = int(rng.integers(0, height - h))
+                if not _overlaps((x, y, w, h), boxes):
+                    break
+            else:
+                continue
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            frame[y:y + h, x:x + w] = cv2.resize(template, (w, h), interpolation=interpolation)
+            boxes.append((x, y, w, h))
+            objects.append({
+                "state": state,
+                "box": [x, y, w, h],
+                "center": [x + w // 2, y + h // 2],
+                "scale": round(scale, 4),
+            })
+
+        # Photometric changes apply to the whole frame, buttons included
+        brightness = float(rng.uniform(*BRIGHTNESS_RANGE))
+        shift = float(rng.uniform(-CONTRAST_SHIFT, CONTRAST_SHIFT))
+        frame = cv2.convertScaleAbs(frame, alpha=brightness, beta=shift)
+        sigma = float(rng.uniform(0, NOISE_SIGMA_MAX))
+        if sigma > 0.5:
+            noise = rng.normal(0, sigma, frame.shape).astype(np.float32)
+            frame = np.clip(frame.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        quality = int(rng.integers(JPEG_QUALITY_RANGE[0], JPEG_QUALITY_RANGE[1] + 1))
+
+        label = {
+            "width": width,
+            "height": height,
+            "background": bg_name,
+            "brightness": round(brightness, 3),
+            "shift": round(shift, 2),
+            "noise_sigma": round(sigma, 2),
+            "jpeg_quality": quality,
+            "objects": objects,
+        }
+        return frame, label, quality
+
+    def generate_frames(self, count):
+        """Yield (decoded frame with JPEG artefacts, label) without touching the disk"""
+        for _ in range(count):
+            frame, label, quality = self.generate()
+            ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            yield cv2.imdecode(buf, cv2.IMREAD_COLOR), label
+
+    def write_dataset(self, folder, count):
+        """Write count JPEG frames and labels.json to folder; returns the labels"""
+        os.makedirs(folder, exist_ok=True)
+        labels = {"frames": []}
+        for i in range(count):
+            frame, label, quality = self.generate()
+            name = f"synthetic_{i:05d}.jpg"
+            cv2.imwrite(os.path.join(folder, name), frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            labels["frames"].append(dict(frame=name, **label))
+            if (i + 1) % 100 == 0:
+                print(f"   🖼️ {i + 1}/{count} frames")
+        with open(os.path.join(folder, "labels.json"), "w") as f:
+            json.dump(labels, f, indent=2)
+        return labels
+
+
+def parse_resolution(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate labelled synthetic frames from the button templates")
+    parser.add_argument("--count", "-n", type=int, default=200, help="Frames to generate")
+    parser.add_argument("--output", "-o", default="synthetic_frames", help="Output folder")
+    parser.add_argument("--backgrounds", nargs="*", default=DEFAULT_BACKGROUNDS, help="Background glob patterns")
+    parser.add_argument("--keep-background-detail", action="store_true",
+                        help="Do not blur backgrounds (their own buttons stay unlabelled)")
+    parser.add_argument("--states", nargs="*", help=f"Only composite these states ({', '.join(SYNTHETIC_TEMPLATES)})")
+    parser.add_argument("--resolutions", nargs="*", type=parse_resolution,
+                        help="Frame sizes like 1920x1080 (default: 720p up to 4K)")
+    parser.add_argument("--max-objects", type=int, default=MAX_OBJECTS, help="Most objects per frame")
+    parser.add_argument("--fixed-scale", action="store_true",
+                        help="Do not scale templates with the frame width")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    templates = load_templates(states=args.states)
+    backgrounds = load_backgrounds(args.backgrounds, args.keep_background_detail)
+    if not templates or not backgrounds:
+        print("❌ No templates or backgrounds found")
+        sys.exit(2)
+
+    generator = SyntheticFrameGenerator(
+        templates, backgrounds, resolutions=args.resolutions or RESOLUTIONS,
+        max_objects=args.max_objects, seed=args.seed, scale_with_resolution=not args.fixed_scale,
+    )
+    print(f"🏭 Generating {args.count} frames from {len(templates)} templates and {len(backgrounds)} backgrounds...")
+    labels = generator.write_dataset(args.output, args.count)
+    objects = sum(len(f["objects"]) for f in labels["frames"])
+    print(f"✅ {args.count} frames, {objects} labelled objects in {args.output}/ (labels.json)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import contextlib
+import json
+import os
+import cv2
+from frame_transform import scale_templates
+from correlation_engine import create_matcher
+from buffer_pool import BufferPool
+
+TEMPLATE_DIR = "templates"
+TEMPLATE_MANIFEST = "manifest.json"
+# States with several variants are ranked on a frame downscaled by this factor
+# first; only the best candidates are matched at full size
+COARSE_FACTOR = 0.5
+# Full-size candidates refined per state after the coarse ranking
+REFINE_CANDIDATES = 2
+# Canonical pixels searched around a coarse hit when refining
+REFINE_PADDING = 12
+
+
+def no_timer(name):
+    return contextlib.nullcontext()
+
+
+def to_gray(img):
+    return img if img is None or img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def load_manifest(directory=TEMPLATE_DIR, manifest=TEMPLATE_MANIFEST):
+    """{state: [variant paths]} from the manifest; paths are relative to directory"""
+    path = os.path.join(directory, manifest)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {state: [os.path.join(directory, name) for name in names] for state, names in data.items()}
+
+
+def load_template_sets(template_files, directory=TEMPLATE_DIR, states=None):
+    """
+    {state: TemplateSet} with the state's default file first and the manifest's
+    variants after it, all scaled to canonical space and converted to gray once.
+    """
+    manifest = load_manifest(directory)
+    sets = {}
+    for state in states or template_files:
+        paths = [template_files[state]] if state in template_files else []
+        paths += [p for p in manifest.get(state, []) if p not in paths]
+        images = {}
+        for path in paths:
+            img = cv2.imread(path, cv2.IMREAD_COLOR) if os.path.exists(path) else None
+            if img is None:
+                print(f"⚠️ Template variant missing: {path}")
+                continue
+            images[os.path.basename(path)] = img
+        if images:
+            sets[state] = TemplateSet(state, [(name, to_gray(img)) for name, img in scale_templates(images).items()])
+            if len(images) > 1:
+                print(f"✅ {state}: {len(images)} template variants")
+    return sets
+
+
+class SharedGray:
+    """
+    Gray (and coarse gray) of the frame being analysed, reused while the same
+    array is passed in, and the correlation backend that matches against them.
+    Both live in pool buffers that the next frame overwrites.
+    """
+
+    def __init__(self, coarse_factor=COARSE_FACTOR, matcher=None, pool=None):
+        self.coarse_factor = coarse_factor
+        self.matcher = matcher or create_matcher()
+        self.pool = pool or BufferPool()
+        self.last_frame = None
+        self.gray = None
+        self.coarse = None
+
+    def get(self, frame):
+        if frame is not self.last_frame:
+            self.last_frame = frame
+            if frame.ndim == 2:
+                self.gray = frame
+            else:
+                self.gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.pool.get("gray", frame.shape[:2]))
+            self.coarse = None
+            # Cached transforms refer to the buffers just overwritten
+            self.matcher.reset()
+        return self.gray
+
+    def get_coarse(self, frame):
+        gray = self.get(frame)
+        if self.coarse is None:
+            size = (max(1, int(gray.shape[1] * self.coarse_factor)), max(1, int(gray.shape[0] * self.coarse_factor)))
+            self.coarse = cv2.resize(gray, size, dst=self.pool.get("gray:coarse", (size[1], size[0])),
+                                     interpolation=cv2.INTER_AREA)
+        return self.coarse
+
+    def match_maps(self, gray, templates):
+        """Result maps of the templates against gray (or a region of it), written into pool buffers"""
+        return self.matcher.match_maps(gray, templates, self.pool)
+
+
+class TemplateSet:
+    """
+    All variants of one state's button. Scaled variants are prepared once per
+    scale. A single variant is matched exactly as before; with several, each
+    variant is matched on its own against the shared coarse frame (the gray and
+    coarse conversions are shared, the correlations are not) and only the best
+    REFINE_CANDIDATES are matched at full size, around their coarse hit.
+    """
+
+    def __init__(self, state, variants, coarse_factor=COARSE_FACTOR):
+        self.state = state
+        self.variants = list(variants)
+        self.coarse_factor = coarse_factor
+        self.prepared = {}
+
+    def __len__(self):
+        return len(self.variants)
+
+    @property
+    def default(self):
+        return self.variants[0][1]
+
+    def scaled(self, scale):
+        """[(name, full-size template, coarse template)] at scale, built on first use"""
+        if scale not in self.prepared:
+            entries = []
+            for name, gray in self.variants:
+                full = gray if scale == 1.0 else cv2.resize(gray, (int(gray.shape[1] * scale), int(gray.shape[0] * scale)))
+                coarse = cv2.resize(full, None, fx=self.coarse_factor, fy=self.coarse_factor, interpolation=cv2.INTER_AREA)
+                entries.append((name, full, coarse))
+            self.prepared[scale] = entries
+        return self.prepared[scale]
+
+    def match(self, frame, scales, shared, timer=None):
+        """Best (score, box, variant) over all variants and scales; box is (x, y, w, h) or None"""
+        timer = timer or no_timer
+        gray = shared.get(frame)
+        if len(self.variants) == 1:
+            candidates = [(name, full) for scale in scales for name, full, _ in self.scaled(scale)]
+            with timer(f"match:{self.state}"):
+                maps = shared.match_maps(gray, [template for _, template in candidates])
+            return self.best([(name, template, 0, 0, res) for (name, template), res in zip(candidates, maps)])
+
+        refined = []
+        for name, template, hint in self.rank_coarse(shared, frame, scales, timer):
+            h, w = template.shape
+            x0 = max(0, int(hint[0] / self.coarse_factor) - REFINE_PADDING)
+            y0 = max(0, int(hint[1] / self.coarse_factor) - REFINE_PADDING)
+            region = gray[y0:y0 + h + 2 * REFINE_PADDING, x0:x0 + w + 2 * REFINE_PADDING]
+            with timer(f"match:{self.state}"):
+                res = shared.match_maps(region, [template])[0]
+            refined.append((name, template, x0, y0, res))
+        return self.best(refined)
+
+    @staticmethod
+    def best(results):
+        """(score, box, variant) of the highest peak over [(name, template, x0, y0, result map)]"""
+        best = (0.0, None, None)
+        for name, template, x0, y0, res in results:
+            if res is None:
+                continue
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            if max_val > best[0]:
+                h, w = template.shape
+                best = (max_val, (x0 + max_loc[0], y0 + max_loc[1], w, h), name)
+        return best
+
+    def rank_coarse(self, shared, frame, scales, timer=None):
+        """The REFINE_CANDIDATES best (name, full-size template, coarse top-left) on the coarse frame"""
+        timer = timer or no_timer
+        coarse_gray = shared.get_coarse(frame)
+        entries = [(name, full, coarse) for scale in scales for name, full, coarse in self.scaled(scale)
+                   if min(coarse.shape) >= 2]
+        with timer(f"match:{self.state}:coarse"):
+            maps = shared.match_maps(coarse_gray, [coarse for _, _, coarse in entries])
+        ranked = []
+        for (name, full, _), res in zip(entries, maps):
+            if res is not None:
+                _, max_val, _, max_loc = cv2.minMaxLoc(res)
+                ranked.append((max_val, name, full, max_loc))
+        ranked.sort(key=lambda r: r[0], reverse=True)
+        return [(name, full, loc) for _, name, full, loc in ranked[:REFINE_CANDIDATES]]
@@ -0,0 +1,23 @@
+import time
+import pytest
+
+
+class FakeClock:
+    """Stand-in for time.monotonic()/time.time() that only moves when told to"""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    monkeypatch.setattr(time, "time", fake)
+    return fake
@@ -0,0 +1,83 @@
+from action_scheduler import ActionScheduler
+
+LOCATION = (500, 300)
+
+
+def test_first_click_is_allowed(clock):
+    scheduler = ActionScheduler()
+    assert scheduler.check("PLAY_BALOOT", LOCATION) is None
+    assert scheduler.snapshot()["actions_allowed"] == 1
+
+
+def test_click_in_flight_while_button_stays_visible(clock):
+    scheduler = ActionScheduler(in_flight_timeout=4.0)
+    scheduler.started("PLAY_BALOOT", LOCATION)
+    clock.advance(3.0)
+    scheduler.observe([("PLAY_BALOOT", LOCATION)])
+
+    reason, remaining = scheduler.check("PLAY_BALOOT", LOCATION)
+    assert reason == "in_flight"
+    assert remaining == 1.0
+    assert scheduler.snapshot()["actions_dropped_in_flight"] == 1
+
+
+def test_in_flight_expires_after_timeout(clock):
+    scheduler = ActionScheduler(cooldowns={}, default_cooldown=2.0, in_flight_timeout=4.0)
+    scheduler.started("PLAY_BALOOT", LOCATION)
+    clock.advance(4.0)
+    scheduler.observe([("PLAY_BALOOT", LOCATION)])
+    assert scheduler.check("PLAY_BALOOT", LOCATION) is None
+    assert scheduler.snapshot()["actions_in_flight"] == 0
+
+
+def test_cooldown_after_button_disappears(clock):
+    scheduler = ActionScheduler(cooldowns={"CLAIM": 10.0})
+    scheduler.started("CLAIM", LOCATION)
+    clock.advance(1.0)
+    scheduler.observe([])
+    assert scheduler.snapshot()["actions_in_flight"] == 0
+
+    reason, remaining = scheduler.check("CLAIM", LOCATION)
+    assert reason == "cooldown"
+    assert remaining == 9.0
+    clock.advance(9.0)
+    assert scheduler.check("CLAIM", LOCATION) is None
+
+
+def test_default_cooldown_for_unlisted_state(clock):
+    scheduler = ActionScheduler(cooldowns={}, default_cooldown=2.0)
+    scheduler.started("AGREE", LOCATION)
+    scheduler.observe([])
+    clock.advance(1.5)
+    assert scheduler.check("AGREE", LOCATION)[0] == "cooldown"
+    clock.advance(0.5)
+    assert scheduler.check("AGREE", LOCATION) is None
+
+
+def test_jitter_stays_in_the_same_bucket(clock):
+    scheduler = ActionScheduler(bucket=40)
+    scheduler.started("PLAY_BALOOT", (481, 281))
+    assert scheduler.check("PLAY_BALOOT", (500, 300))[0] == "in_flight"
+
+
+def test_other_location_or_state_is_independent(clock):
+    scheduler = ActionScheduler(bucket=40)
+    scheduler.started("PLAY_BALOOT", LOCATION)
+    assert scheduler.check("PLAY_BALOOT", (900, 300)) is None
+    assert scheduler.check("LEAVE_GAME", LOCATION) is None
+
+
+def test_observe_keeps_only_visible_clicks_in_flight(clock):
+    scheduler = ActionScheduler()
+    scheduler.started("AGREE", (100, 100))
+    scheduler.started("BACK", (700, 100))
+    scheduler.observe([("BACK", (705, 102))])
+    assert scheduler.check("AGREE", (100, 100))[0] == "cooldown"
+    assert scheduler.check("BACK", (700, 100))[0] == "in_flight"
+
+
+def test_reset_forgets_clicks(clock):
+    scheduler = ActionScheduler()
+    scheduler.started("CLAIM", LOCATION)
+    scheduler.reset()
+    assert scheduler.check("CLAIM", LOCATION) is None
@@ -0,0 +1,58 @@
+import glob
+import os
+import cv2
+import numpy as np
+import pytest
+from buffer_pool import BufferPool
+from correlation_engine import FFTMatcher, OpenCVMatcher
+from detection_config import BUTTON_SCALES, GIFTBOX_SCALES, TEMPLATE_SCALES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# One lobby/gift frame and one agree-popup frame (test_3..5 repeat test.png)
+FRAMES = ["test.png", "Screenshot_v1.png"]
+# Every scale either bot matches at
+SCALES = sorted(set(TEMPLATE_SCALES) | set(BUTTON_SCALES) | set(GIFTBOX_SCALES))
+# Result maps must agree this closely wherever the window has texture
+MAP_TOLERANCE = 0.005
+# Windows flatter than this (gray levels squared per pixel) divide by a
+# near-zero variance in both backends, so their scores are noise
+MIN_VARIANCE = 1.0
+PEAK_TOLERANCE = 0.002
+
+
+def load_gray(name):
+    img = cv2.imread(os.path.join(ROOT, name), cv2.IMREAD_GRAYSCALE)
+    assert img is not None, name
+    return img
+
+
+def scaled_templates():
+    templates = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "*_template.png"))):
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        for scale in SCALES:
+            size = (int(gray.shape[1] * scale), int(gray.shape[0] * scale))
+            templates.append((f"{os.path.basename(path)}@{scale}", cv2.resize(gray, size)))
+    return templates
+
+
+@pytest.mark.parametrize("frame_name", FRAMES)
+def test_fft_maps_match_opencv(frame_name):
+    gray = load_gray(frame_name)
+    templates = scaled_templates()
+    assert templates
+    pool = BufferPool()
+    matcher = FFTMatcher()
+    fft_maps = matcher.match_maps(gray, [t for _, t in templates], pool)
+    cv_maps = OpenCVMatcher().match_maps(gray, [t for _, t in templates])
+    spectrum = matcher.frame(gray, pool)
+
+    for (name, template), fft_map, cv_map in zip(templates, fft_maps, cv_maps):
+        assert (fft_map is None) == (cv_map is None), name
+        if cv_map is None:
+            continue
+        h, w = template.shape
+        textured = spectrum.window_variance(h, w) > MIN_VARIANCE * h * w
+        diff = np.abs(fft_map - cv_map)
+        assert diff[textured].max() <= MAP_TOLERANCE, name
+        assert abs(float(fft_map.max()) - float(cv_map.max())) <= PEAK_TOLERANCE, name
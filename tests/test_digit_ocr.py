@@ -0,0 +1,81 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from digit_ocr import GLYPH_SIZE, GlyphBank, binarize, check_fields, glyph_vectors, load_fields, read_digits, \
+    read_number, segment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def fields():
+    return load_fields(os.path.join(ROOT, "glyph_fields.json"))
+
+
+@pytest.fixture(scope="module")
+def bank(fields):
+    return GlyphBank.from_fields(fields)
+
+
+def field_frame(field):
+    frame = cv2.imread(field["path"])
+    assert frame is not None, field["path"]
+    return frame, tuple(field["roi"])
+
+
+def field_vectors(field):
+    frame, (x, y, w, h) = field_frame(field)
+    binary = binarize(frame[y:y + h, x:x + w])
+    return glyph_vectors(binary, segment(binary))
+
+
+def test_margin_is_gap_to_best_other_label():
+    w, h = GLYPH_SIZE
+    a, b = np.zeros(w * h, np.float32), np.zeros(w * h, np.float32)
+    a[0], b[1] = 1.0, 1.0
+    bank = GlyphBank([a, b, a], ["1", "7", "1"])
+    query = (0.8 * a + 0.6 * b)[None, :]
+    labels, scores, margins = bank.classify(query)
+    assert labels.tolist() == ["1"]
+    assert scores[0] == pytest.approx(0.8)
+    assert margins[0] == pytest.approx(0.2)
+
+
+def test_single_label_bank_has_no_margin_limit():
+    w, h = GLYPH_SIZE
+    bank = GlyphBank(np.eye(1, w * h, dtype=np.float32), ["4"])
+    assert np.isinf(bank.classify(np.eye(1, w * h, dtype=np.float32))[2][0])
+
+
+def test_reads_a_harvested_field(fields, bank):
+    field = next(f for f in fields if f["text"] == "288")
+    frame, roi = field_frame(field)
+    assert read_digits(frame, roi, bank) == "288"
+    assert read_number(frame, roi, bank) == 288
+
+
+def test_ambiguous_glyph_is_rejected_not_guessed(fields, bank):
+    field = next(f for f in fields if f["text"] == "288")
+    frame, roi = field_frame(field)
+    # Every '8' of the bank also labelled '3': both labels score the same, so the margin is 0
+    eights = bank.vectors[bank.labels == "8"]
+    ambiguous = GlyphBank(np.vstack([bank.vectors, eights]), bank.labels.tolist() + ["3"] * len(eights))
+    assert read_digits(frame, roi, ambiguous) is None
+    assert read_number(frame, roi, ambiguous) is None
+
+
+def test_min_margin_threshold(fields, bank):
+    field = next(f for f in fields if f["text"] == "288")
+    frame, roi = field_frame(field)
+    margins = bank.classify(field_vectors(field))[2]
+    assert read_digits(frame, roi, bank, min_margin=float(margins.min())) == "288"
+    assert read_digits(frame, roi, bank, min_margin=float(margins.min()) + 1e-3) is None
+
+
+def test_leave_one_out_never_misreads(fields):
+    results = check_fields(fields)
+    misread = [(field["text"], text) for field, text in results if text is not None and text != field["text"]]
+    exact = sum(1 for field, text in results if text == field["text"])
+    assert not misread
+    assert exact >= 0.85 * len(results)
@@ -0,0 +1,128 @@
+import pytest
+from gift_scheduler import GiftScheduler, countdown_roi, parse_countdown
+
+CLAIM_BOX = (1500, 400, 200, 50)
+
+
+def scheduler(**kwargs):
+    gift = GiftScheduler(lead=3.0, recheck=60.0, retry=5.0, tolerance=3.0, confirm_retry=1.0, **kwargs)
+    gift.claim_seen(CLAIM_BOX)
+    return gift
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("05:30", 330),
+    ("1:02:03", 3723),
+    (" 0 : 4 5 ", 45),
+    ("0:45", 45),
+    ("12:75", None),
+    ("250", None),
+    ("", None),
+])
+def test_parse_countdown(text, seconds):
+    assert parse_countdown(text) == seconds
+
+
+def test_countdown_roi_pads_and_clips():
+    assert countdown_roi((100, 50, 200, 40), (1920, 1080)) == (80, 38, 240, 64)
+    assert countdown_roi((1800, 1060, 200, 40), (1920, 1080)) == (1780, 1048, 140, 32)
+
+
+def test_single_read_is_never_slept_on(clock):
+    gift = scheduler()
+    gift.update(600)
+    assert gift.confirming
+    assert gift.wait_time() == 0.0
+    assert gift.snapshot()["countdown_unconfirmed"] == 1
+
+
+def test_agreeing_second_read_confirms(clock):
+    gift = scheduler()
+    gift.update(600)
+    clock.advance(1.0)
+    assert gift.read_due()
+    gift.update(598)
+    assert not gift.confirming
+    # Idle until the next drift check, well before the gift is ready
+    assert gift.wait_time() == 60.0
+
+
+def test_disagreeing_second_read_stays_unconfirmed(clock):
+    gift = scheduler()
+    gift.update(600)
+    clock.advance(1.0)
+    gift.update(60)
+    assert gift.confirming
+    assert gift.wait_time() == 0.0
+    # The newer reading is now the one waiting for confirmation
+    clock.advance(1.0)
+    gift.update(59)
+    assert not gift.confirming
+    assert gift.wait_time() == pytest.approx(59 - 3.0)
+
+
+def test_confirming_reads_use_the_short_retry(clock):
+    gift = scheduler()
+    gift.update(600)
+    clock.advance(0.5)
+    assert not gift.read_due()
+    clock.advance(0.5)
+    assert gift.read_due()
+
+
+def test_recheck_corrects_drift(clock):
+    gift = scheduler()
+    gift.update(600)
+    clock.advance(1.0)
+    gift.update(599)
+    clock.advance(60.0)
+    assert gift.wait_time() == 0.0
+    assert gift.read_due()
+    # The page clock drifted by 2 s: still within tolerance, so the new read wins
+    gift.update(537)
+    assert not gift.confirming
+    assert gift.ready_at == pytest.approx(clock.now + 537)
+
+
+def test_recheck_that_disagrees_drops_the_prediction(clock):
+    gift = scheduler()
+    gift.update(600)
+    clock.advance(1.0)
+    gift.update(599)
+    clock.advance(60.0)
+    gift.update(300)
+    assert gift.ready_at is None
+    assert gift.confirming
+    assert gift.wait_time() == 0.0
+
+
+def test_wakes_lead_seconds_before_ready(clock):
+    gift = scheduler()
+    gift.update(30)
+    clock.advance(1.0)
+    gift.update(29)
+    assert gift.wait_time() == pytest.approx(26.0)
+
+
+def test_misread_and_claim_drop_the_prediction(clock):
+    gift = scheduler()
+    gift.update(600)
+    clock.advance(1.0)
+    gift.update(599)
+    gift.update(None)
+    assert gift.wait_time() == 0.0
+    assert gift.snapshot()["countdown_misreads"] == 1
+
+    gift.update(600)
+    clock.advance(1.0)
+    gift.update(599)
+    gift.claim_seen(CLAIM_BOX)
+    assert gift.wait_time() == 0.0
+    assert not gift.confirming
+
+
+def test_no_read_before_the_roi_is_known(clock):
+    gift = GiftScheduler()
+    assert not gift.read_due()
+    gift.fixed_roi = (10, 10, 100, 30)
+    assert gift.read_due()
@@ -0,0 +1,75 @@
+from screen_state_machine import ScreenStateMachine
+
+PRIORITY = ["PLAY_BALOOT", "GREEN_PARTICIPATE", "RETURN_GREEN", "RETURN_GREY", "LEAVE_GAME"]
+
+
+def test_unknown_screen_gets_a_full_scan(clock):
+    machine = ScreenStateMachine()
+    assert machine.next_detectors(PRIORITY) == (PRIORITY, True)
+
+
+def test_known_screen_checks_reachable_states_in_priority_order(clock):
+    machine = ScreenStateMachine()
+    machine.next_detectors(PRIORITY)
+    machine.observe("GREEN_PARTICIPATE")
+    # GREEN_PARTICIPATE -> IN_GAME (idle) -> RETURN_*/LEAVE_GAME
+    assert machine.next_detectors(PRIORITY) == (["GREEN_PARTICIPATE", "RETURN_GREEN", "RETURN_GREY", "LEAVE_GAME"], False)
+
+
+def test_transitions_through_a_hand(clock):
+    machine = ScreenStateMachine()
+    assert machine.observe("PLAY_BALOOT") == "PLAY_BALOOT"
+    assert machine.observe("GREEN_PARTICIPATE") == "GREEN_PARTICIPATE"
+    assert machine.observe("WAITING") == "IN_GAME"
+    assert machine.observe("WAITING") == "IN_GAME"
+    assert machine.observe("RETURN_GREEN") == "RETURN_GREEN"
+    assert machine.observe("WAITING") == "LOBBY"
+    assert machine.reachable_detectors() == {"PLAY_BALOOT", "GREEN_PARTICIPATE"}
+
+
+def test_empty_first_frame_means_a_table(clock):
+    machine = ScreenStateMachine()
+    assert machine.observe("WAITING") == "IN_GAME"
+
+
+def test_full_scan_every_n_frames(clock):
+    machine = ScreenStateMachine(full_scan_every=3)
+    machine.next_detectors(PRIORITY)
+    machine.observe("LEAVE_GAME")
+    scans = [machine.next_detectors(PRIORITY)[1] for _ in range(4)]
+    assert scans == [False, False, False, True]
+
+
+def test_full_scan_after_timeout_without_change(clock):
+    machine = ScreenStateMachine(full_scan_every=100, full_scan_timeout=30.0)
+    machine.next_detectors(PRIORITY)
+    machine.observe("LEAVE_GAME")
+    clock.advance(29.0)
+    assert machine.next_detectors(PRIORITY)[1] is False
+    clock.advance(2.0)
+    assert machine.next_detectors(PRIORITY) == (PRIORITY, True)
+    # The timeout scan is not repeated on every frame while the screen stays put
+    assert machine.next_detectors(PRIORITY)[1] is False
+
+
+def test_full_scan_resyncs_after_unexpected_jump(clock):
+    machine = ScreenStateMachine()
+    machine.observe("LEAVE_GAME")
+    # A full scan may find a button the current screen cannot lead to
+    assert machine.observe("RETURN_GREY") == "RETURN_GREY"
+    assert "LEAVE_GAME" in machine.reachable_detectors()
+    assert machine.snapshot()["screen_unexpected_jumps"] == 1
+    # Expected moves and repeats are not counted
+    machine.observe("LEAVE_GAME")
+    machine.observe("LEAVE_GAME")
+    assert machine.snapshot()["screen_unexpected_jumps"] == 1
+
+
+def test_reset_forces_a_full_scan(clock):
+    machine = ScreenStateMachine()
+    machine.next_detectors(PRIORITY)
+    machine.observe("PLAY_BALOOT")
+    machine.reset()
+    assert machine.screen is None
+    assert machine.next_detectors(PRIORITY)[1] is True
+    assert machine.snapshot()["screen_full_scans"] == 2
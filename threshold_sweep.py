@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from accuracy_harness import GOLDEN_LABELS, BALOOT_STATES, BALOOT_WORKING_WIDTH, load_labels, inside_box
+from synthetic_frames import SYNTHETIC_TEMPLATES
+from detection_config import TEMPLATE_SCALES, TEMPLATE_THRESHOLD, BUTTON_SCALES, BUTTON_THRESHOLD, GIFTBOX_SCALES, \
+    GIFTBOX_THRESHOLD
+
+SWEEP_TEMPLATES = dict(SYNTHETIC_TEMPLATES, BACK="return_grey_template.png")
+DEFAULT_SCALES = [0.8, 0.85, 0.9, 0.95, 1.0, 1.05, 1.1, 1.15, 1.2]
+DEFAULT_THRESHOLDS = [round(t, 2) for t in np.arange(0.5, 0.96, 0.01)]
+DEFAULT_CACHE = ".match_cache"
+DEFAULT_TARGET_RECALL = 0.95
+MAX_SET_SIZE = 5
+
+# What the bots use today, reported next to each recommendation
+CURRENT_CONFIGS = {
+    **{state: {"scales": list(TEMPLATE_SCALES), "threshold": TEMPLATE_THRESHOLD} for state in BALOOT_STATES},
+    **{btn: {"scales": list(BUTTON_SCALES), "threshold": BUTTON_THRESHOLD} for btn in ("CLAIM", "AGREE", "BACK")},
+    "GIFTBOX": {"scales": list(GIFTBOX_SCALES), "threshold": GIFTBOX_THRESHOLD},
+}
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+class MatchPeakCache:
+    """
+    matchTemplate peak for every (frame, template, scale), computed once and
+    kept in a JSON manifest with its location and the time matchTemplate took.
+    Scoring only needs the peaks, so the maps themselves are not stored.
+    """
+
+    def __init__(self, folder=DEFAULT_CACHE):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.manifest_path = os.path.join(folder, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self.computed = 0
+        self.reused = 0
+
+    def save(self):
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def entry(self, frame_key, gray, template_key, template, scale):
+        key = f"{frame_key}_{template_key}_{scale:.3f}"
+        cached = self.manifest.get(key)
+        if cached:
+            self.reused += 1
+            return cached
+
+        th, tw = template.shape
+        w, h = int(tw * scale), int(th * scale)
+        if w < 1 or h < 1 or h > gray.shape[0] or w > gray.shape[1]:
+            cached = {"peak": None, "seconds": 0.0}
+        else:
+            resized = cv2.resize(template, (w, h))
+            start = time.perf_counter()
+            result = cv2.matchTemplate(gray, resized, cv2.TM_CCOEFF_NORMED)
+            seconds = time.perf_counter() - start
+            _, peak, _, loc = cv2.minMaxLoc(result)
+            cached = {"peak": float(peak), "center": [loc[0] + w // 2, loc[1] + h // 2], "seconds": seconds}
+        self.manifest[key] = cached
+        self.computed += 1
+        return cached
+
+
+def build_table(entries, states, scales, cache):
+    """
+    Return {state: {"labels": [...], "peaks": array[frames, scales], "centers": [...], "seconds": [...]}}
+    """
+    templates = {}
+    for state in states:
+        img = cv2.imread(SWEEP_TEMPLATES[state], cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            print(f"⚠️ Template not found for {state}: {SWEEP_TEMPLATES[state]}")
+            continue
+        templates[state] = (img, _digest(img.tobytes()))
+
+    table = {state: {"labels": [], "peaks": [], "centers": [], "seconds": []} for state in templates}
+    for frame_path, label in entries:
+        with open(frame_path, "rb") as f:
+            frame_key = _digest(f.read())
+        gray = cv2.imread(frame_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            print(f"⚠️ Could not load frame: {frame_path}")
+            continue
+        working = gray[:, :int(gray.shape[1] * BALOOT_WORKING_WIDTH)]
+        for state, (template, template_key) in templates.items():
+            image, image_key = (working, frame_key + "w") if state in BALOOT_STATES else (gray, frame_key)
+            results = [cache.entry(image_key, image, template_key, template, s) for s in scales]
+            row = table[state]
+            row["labels"].append([o for o in label.get("objects", []) if o["state"] == state])
+            row["peaks"].append([r["peak"] if r["peak"] is not None else -1.0 for r in results])
+            row["centers"].append([r.get("center") for r in results])
+            row["seconds"].append([r["seconds"] for r in results])
+    cache.save()
+    for row in table.values():
+        row["peaks"] = np.asarray(row["peaks"], dtype=np.float32)
+        row["seconds"] = np.asarray(row["seconds"], dtype=np.float64).mean(axis=0)
+        row["objects"] = np.asarray([len(objects) for objects in row["labels"]])
+    return table
+
+
+def outcomes(row, scale_idx):
+    """
+    Per frame: best peak over these scales, whether that peak lies inside a
+    labelled box, and how many objects are labelled. Independent of the threshold.
+    """
+    peaks = row["peaks"][:, scale_idx]
+    best = peaks.argmax(axis=1)
+    best_peaks = peaks[np.arange(len(best)), best]
+    hits = np.zeros(len(best), dtype=bool)
+    for i, objects in enumerate(row["labels"]):
+        center = row["centers"][i][scale_idx[best[i]]]
+        hits[i] = center is not None and any(inside_box(center, o["box"]) for o in objects)
+    return best_peaks, hits, row["objects"]
+
+
+def score(best_peaks, hits, objects, threshold):
+    """Precision/recall of 'best peak >= threshold' for one template"""
+    detected = best_peaks >= threshold
+    tp = int(np.count_nonzero(detected & hits))
+    fp = int(np.count_nonzero(detected & ~hits))
+    fn = int(objects.sum()) - tp
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else None
+    return precision, recall, tp, fp, fn
+
+
+def sweep_state(row, scales, thresholds, target_recall, min_precision, max_set_size):
+    """
+    Cheapest (scale set, threshold) meeting the targets, plus the best recall seen.
+    Within a scale set the threshold is the middle of the passing range with the
+    best precision, leaving margin on both sides.
+    """
+    best, best_key = None, None
+    best_recall, best_recall_key = None, None
+    for size in range(1, min(max_set_size, len(scales)) + 1):
+        for scale_idx in itertools.combinations(range(len(scales)), size):
+            scale_idx = list(scale_idx)
+            cost_ms = float(row["seconds"][scale_idx].sum() * 1000)
+            frame_outcomes = outcomes(row, scale_idx)
+            passing = []
+            for threshold in thresholds:
+                precision, recall, tp, fp, fn = score(*frame_outcomes, threshold)
+                if recall is None:
+                    continue
+                candidate = {
+                    "scales": [scales[i] for i in scale_idx],
+                    "threshold": threshold,
+                    "cost_ms": round(cost_ms, 3),
+                    "precision": round(precision, 4),
+                    "recall": round(recall, 4),
+                    "tp": tp, "fp": fp, "fn": fn,
+                }
+                key = (recall, precision, -cost_ms)
+                if best_recall is None or key > best_recall_key:
+                    best_recall, best_recall_key = candidate, key
+                if recall >= target_recall and precision >= min_precision:
+                    passing.append(candidate)
+            if not passing:
+                continue
+            top = max(c["precision"] for c in passing)
+            passing = [c for c in passing if c["precision"] == top]
+            pick = passing[len(passing) // 2]
+            key = (cost_ms, -top)
+            if best is None or key < best_key:
+                best, best_key = pick, key
+    return best, best_recall
+
+
+def evaluate_current(row, scales, state):
+    current = CURRENT_CONFIGS.get(state)
+    if not current:
+        return None
+    scale_idx = [scales.index(s) for s in current["scales"] if s in scales]
+    if not scale_idx:
+        return None
+    precision, recall, tp, fp, fn = score(*outcomes(row, scale_idx), current["threshold"])
+    return {
+        "scales": current["scales"], "threshold": current["threshold"],
+        "cost_ms": round(float(row["seconds"][scale_idx].sum() * 1000), 3),
+        "precision": round(precision, 4), "recall": None if recall is None else round(recall, 4),
+    }
+
+
+def harness_config(recommendations):
+    """Fold per-template picks into bot attributes usable by accuracy_harness.py --configs"""
+    def merged(states):
+        picks = [recommendations[s]["recommended"] for s in states
+                 if recommendations.get(s, {}).get("recommended")]
+        if not picks:
+            return None, None
+        return sorted({s for p in picks for s in p["scales"]}), min(p["threshold"] for p in picks)
+
+    config = {}
+    scales, threshold = merged(BALOOT_STATES)
+    if scales:
+        config["baloot"] = {"template_scales": scales, "template_threshold": threshold}
+    gift = {}
+    scales, threshold = merged(["CLAIM", "AGREE", "BACK"])
+    if scales:
+        gift.update(button_scales=scales, button_threshold=threshold)
+    scales, threshold = merged(["GIFTBOX"])
+    if scales:
+        gift.update(giftbox_scales=scales, giftbox_threshold=threshold)
+    if gift:
+        config["gift"] = gift
+    return {"sweep": config}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep template thresholds and scale sets over cached match peaks")
+    parser.add_argument("--labels", default=GOLDEN_LABELS, help="Labels JSON (golden or synthetic)")
+    parser.add_argument("--states", nargs="*", help=f"Templates to tune ({', '.join(SWEEP_TEMPLATES)})")
+    parser.add_argument("--scales", nargs="*", type=float, default=DEFAULT_SCALES, help="Candidate scales")
+    parser.add_argument("--max-set-size", type=int, default=MAX_SET_SIZE, help="Largest scale set tried")
+    parser.add_argument("--target-recall", type=float, default=DEFAULT_TARGET_RECALL)
+    parser.add_argument("--min-precision", type=float, default=0.0)
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Folder for the match peak manifest")
+    parser.add_argument("--output", "-o", help="Write the sweep report as JSON")
+    parser.add_argument("--write-config", help="Write an accuracy_harness.py --configs file with the picks")
+    args = parser.parse_args()
+
+    entries = load_labels(args.labels)
+    states = args.states or [s for s in SWEEP_TEMPLATES
+                             if any(o["state"] == s for _, label in entries for o in label.get("objects", []))]
+    if not entries or not states:
+        print("❌ Nothing to sweep: no labelled frames or states")
+        sys.exit(2)
+
+    cache = MatchPeakCache(args.cache)
+    print(f"🗺️ Matching {len(states)} templates x {len(args.scales)} scales over {len(entries)} frames...")
+    table = build_table(entries, states, args.scales, cache)
+    print(f"   computed {cache.computed}, reused {cache.reused} cached peaks")
+
+    recommendations = {}
+    print(f"\n{'template':<18}{'scales':<28}{'thr':>6}{'cost ms':>9}{'recall':>8}{'prec':>7}   current")
+    for state, row in table.items():
+        best, best_recall = sweep_state(row, args.scales, DEFAULT_THRESHOLDS, args.target_recall,
+                                        args.min_precision, args.max_set_size)
+        current = evaluate_current(row, args.scales, state)
+        recommendations[state] = {"recommended": best, "best_recall": best_recall, "current": current}
+        shown = best or best_recall
+        marker = "" if best else "  ⚠️ target not met"
+        cur = f"{current['cost_ms']:.1f}ms r={current['recall']} p={current['precision']}" if current else "-"
+        if shown:
+            print(f"{state:<18}{str(shown['scales']):<28}{shown['threshold']:>6.2f}{shown['cost_ms']:>9.1f}"
+                  f"{shown['recall'] if shown['recall'] is not None else 0:>8.2f}{shown['precision']:>7.2f}   {cur}{marker}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"labels": args.labels, "target_recall": args.target_recall,
+                       "min_precision": args.min_precision, "templates": recommendations}, f, indent=2)
+        print(f"\n📄 Report saved to: {args.output}")
+    if args.write_config:
+        with open(args.write_config, "w") as f:
+            json.dump(harness_config(recommendations), f, indent=2)
+        print(f"📄 Harness config saved to: {args.write_config}")
+
+
+if __name__ == "__main__":
+    main()
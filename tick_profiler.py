@@ -0,0 +1,94 @@
+import cProfile
+import io
+import marshal
+import pstats
+from datetime import datetime
+
+PROFILE_TICKS = 50
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_SORT = "cumulative"
+
+
+class TickProfiler:
+    """
+    Run cProfile over the next N ticks of a bot loop, then hand a .pstats
+    file and a text summary to the debug artifact writer. Ticks are counted
+    by calling tick() once per loop iteration from the loop's own thread.
+    """
+
+    def __init__(self, writer, ticks=PROFILE_TICKS, top=PROFILE_TOP_FUNCTIONS, sort=PROFILE_SORT):
+        self.writer = writer
+        self.ticks = ticks
+        self.top = top
+        self.sort = sort
+        self.profile = None
+        self.remaining = 0
+        self.profiled_ticks = 0
+        self.reason = None
+
+    @property
+    def active(self):
+        return self.remaining > 0
+
+    def start(self, ticks=None, reason="manual"):
+        """Arm the profiler; profiling begins on the next tick(). False if already running."""
+        if self.active:
+            return False
+        self.remaining = ticks or self.ticks
+        self.profiled_ticks = 0
+        self.reason = reason
+        self.profile = None
+        return True
+
+    def tick(self):
+        """
+        Mark a loop iteration boundary.
+        Returns the output folder once the last requested tick has finished.
+        """
+        if not self.active:
+            return None
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError as e:
+                # Another profiler is already attached to this thread
+                print(f"⚠️ Profiler unavailable: {e}")
+                self.remaining = 0
+                self.profile = None
+            return None
+        self.profiled_ticks += 1
+        self.remaining -= 1
+        if self.remaining == 0:
+            return self.finish()
+        return None
+
+    def stop(self):
+        """Finish early (loop stopped) and write whatever was collected"""
+        if not self.active:
+            return None
+        self.remaining = 0
+        if self.profile is None:
+            return None
+        return self.finish()
+
+    def finish(self):
+        self.profile.disable()
+        summary = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=summary)
+        self.profile = None
+        if not stats.stats:
+            return None
+        summary.write(f"{self.profiled_ticks} ticks profiled ({self.reason}), sorted by {self.sort}\n\n")
+        stats.sort_stats(self.sort).print_stats(self.top)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        folder = f"profile_{timestamp}_{self.reason}"
+        files = [
+            # Same layout as pstats.Stats.dump_stats, loadable with pstats.Stats(path)
+            (f"{folder}/ticks.pstats", marshal.dumps(stats.stats)),
+            (f"{folder}/summary.txt", summary.getvalue().encode("utf-8")),
+        ]
+        if not self.writer.submit_files(files):
+            return None
+        return folder